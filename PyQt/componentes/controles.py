@@ -5,11 +5,28 @@ Script en Python. Contendrá los distintos componentes, controles o
 Button: QPushButton que forman cada uno de los dos botones que aparecen
     en la tabla de los listados de los archivos de imagen. Como parámetros
     recibe el nombre del icono, y el color del botón.
+
+ModeloArchivos: modelo (QAbstractTableModel) con los archivos de una
+    carpeta, para la tabla de los listados. Antes cada fila eran dos
+    'QTableWidgetItem' y un QWidget con tres 'Button', y una carpeta con
+    5.000 fotos eran decenas de miles de widgets. El modelo sólo guarda
+    la lista de nombres, rutas, tamaños y fechas; la tabla (QTableView)
+    pide los datos de las filas que se ven. Ordena y filtra la propia
+    lista ('sort' y 'filtrar'), que es mucho más rápido que un
+    'QSortFilterProxyModel'. Los archivos llegan por bloques ('agregar')
+    mientras se lee la carpeta: cada bloque se inserta al final, sin
+    rehacer la tabla, y al terminar se ordenan todos ('ordenar'). El
+    tamaño y la fecha salen en la ayuda del nombre.
+
+DelegadoAcciones: pinta en la columna 'Acción' los tres botones (copiar,
+    compartir y borrar) con el mismo aspecto que 'Button', sin crear
+    ningún widget. Al pulsar uno emite 'pulsado' con la acción y la fila.
 '''
 
-from PyQt5.QtWidgets import QPushButton
-from PyQt5.QtGui import QIcon, QCursor
-from PyQt5.QtCore import Qt, QSize
+from datetime import datetime
+from PyQt5.QtWidgets import QPushButton, QStyledItemDelegate, QToolTip
+from PyQt5.QtGui import QIcon, QCursor, QColor
+from PyQt5.QtCore import Qt, QSize, QRect, QEvent, QAbstractTableModel, QModelIndex, pyqtSignal
 
 assets = 'PyQt/assets/'
 
@@ -30,3 +47,183 @@ class Button(QPushButton):
             }}
         ''')
         self.setCursor(QCursor(Qt.PointingHandCursor))
+
+class ModeloArchivos(QAbstractTableModel):
+    cabeceras = ('Nombre de Archivo', 'Ruta', 'Acción')
+
+    def __init__(self):
+        super().__init__()
+        self.archivos = [] # (nombre, ruta completa, tamaño, fecha), en el orden actual.
+        self.visibles = [] # Los que pasan el filtro.
+        self.filtro = ''
+        self.orden = (0, Qt.AscendingOrder)
+
+    # Cambiamos de una vez todos los archivos del listado.
+    def cargar(self, archivos):
+        self.beginResetModel()
+        self.archivos = list(archivos)
+        self.ordenar_lista()
+        self.endResetModel()
+
+    # Añadimos un bloque de archivos (la carpeta se lee por bloques). Sus
+    #   filas se insertan al final, ordenadas entre ellas, así la tabla no
+    #   se rehace entera con cada bloque ni pierde la selección.
+    def agregar(self, archivos):
+        nuevos = self.ordenados(archivos)
+        self.archivos.extend(nuevos)
+        visibles = [a for a in nuevos if self.filtro in a[0].casefold()]
+        if visibles:
+            n = len(self.visibles)
+            self.beginInsertRows(QModelIndex(), n, n + len(visibles) - 1)
+            self.visibles.extend(visibles)
+            self.endInsertRows()
+
+    # Ordenamos el listado completo cuando ya han llegado todos los
+    #   bloques, moviendo las filas sin reiniciar el modelo.
+    def ordenar(self):
+        self.layoutAboutToBeChanged.emit()
+        indices = self.persistentIndexList()
+        archivos = [self.visibles[indice.row()] for indice in indices]
+        self.ordenar_lista()
+        filas = {id(archivo): fila for fila, archivo in enumerate(self.visibles)}
+        self.changePersistentIndexList(indices, [self.index(filas[id(archivo)], indice.column())
+                                                 for archivo, indice in zip(archivos, indices)])
+        self.layoutChanged.emit()
+
+    def ordenados(self, archivos):
+        columna, orden = self.orden
+        return sorted(archivos, key=lambda archivo: archivo[columna].casefold(), reverse=orden == Qt.DescendingOrder)
+
+    def ordenar_lista(self):
+        self.archivos = self.ordenados(self.archivos)
+        self.visibles = [a for a in self.archivos if self.filtro in a[0].casefold()]
+
+    # La tabla llama a 'sort' al pulsar en la cabecera. Ordenamos la lista
+    #   de una vez con 'sort' de Python, sin comparar fila a fila a través
+    #   del modelo como haría un 'QSortFilterProxyModel'.
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column >= 2:
+            return
+        self.beginResetModel()
+        self.orden = (column, order)
+        self.ordenar_lista()
+        self.endResetModel()
+
+    # Dejamos sólo los archivos cuyo nombre contiene el texto, sin
+    #   distinguir mayúsculas.
+    def filtrar(self, texto):
+        self.beginResetModel()
+        self.filtro = texto.casefold()
+        self.visibles = [a for a in self.archivos if self.filtro in a[0].casefold()]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.visibles)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cabeceras)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() == 2:
+            return None
+        archivo = self.visibles[index.row()]
+        if role == Qt.DisplayRole:
+            return archivo[index.column()]
+        if role == Qt.ToolTipRole:
+            return descripcion_archivo(archivo)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.cabeceras[section]
+        return None
+
+# Texto de ayuda de un archivo: el nombre, el tamaño y la fecha.
+def descripcion_archivo(archivo):
+    nombre, _, tamaño, fecha = archivo
+    if tamaño is None:
+        return nombre
+    return f'{nombre}\n{tamaño / 1024 / 1024:.1f} MB - {datetime.fromtimestamp(fecha):%d/%m/%Y %H:%M}'
+
+class DelegadoAcciones(QStyledItemDelegate):
+    pulsado = pyqtSignal(str, int) # acción, fila
+
+    # (acción, icono, color, texto de ayuda), como los 'Button' de antes.
+    acciones = (
+        ('copiar', 'copy', '#d3d3d3', 'Copiar Foto'),
+        ('compartir', 'share', '#add8e6', 'Compartir Foto'),
+        ('borrar', 'delete', '#f08080', 'Borrar Foto'),
+    )
+    lado = 24
+    separacion = 5
+
+    def __init__(self, vista):
+        super().__init__(vista)
+        self.vista = vista
+        self.iconos = {icono: QIcon(f'{assets}{icono}.png') for _, icono, _, _ in self.acciones}
+        self.color_encima = QColor('#ffc13b')
+        # Posición del ratón en la tabla, para pintar el botón que está debajo.
+        self.raton = None
+        self.celda = QRect()
+        vista.setMouseTracking(True)
+        vista.viewport().installEventFilter(self)
+
+    # Rectángulos de los botones, centrados en la celda.
+    def rectangulos(self, celda):
+        ancho = len(self.acciones) * self.lado + (len(self.acciones) - 1) * self.separacion
+        x = celda.x() + (celda.width() - ancho) // 2
+        y = celda.y() + (celda.height() - self.lado) // 2
+        return [QRect(x + i * (self.lado + self.separacion), y, self.lado, self.lado)
+                for i in range(len(self.acciones))]
+
+    # Botón que hay en una posición de la celda, o None.
+    def accion_en(self, celda, posicion):
+        for (accion, _, _, ayuda), rect in zip(self.acciones, self.rectangulos(celda)):
+            if rect.contains(posicion):
+                return accion, ayuda
+        return None
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        painter.save()
+        for (_, icono, color, _), rect in zip(self.acciones, self.rectangulos(option.rect)):
+            encima = self.raton is not None and rect.contains(self.raton)
+            painter.fillRect(rect, self.color_encima if encima else QColor(color))
+            self.iconos[icono].paint(painter, rect.adjusted(4, 4, -4, -4))
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        ancho = len(self.acciones) * (self.lado + self.separacion) + self.separacion
+        return QSize(ancho, self.lado + 6)
+
+    # Seguimos el ratón por la tabla: repintamos la celda de los botones
+    #   que tiene debajo (y la anterior) y ponemos la mano encima de ellos.
+    def eventFilter(self, objeto, event):
+        if event.type() in (QEvent.MouseMove, QEvent.Leave):
+            self.raton = event.pos() if event.type() == QEvent.MouseMove else None
+            index = self.vista.indexAt(self.raton) if self.raton is not None else QModelIndex()
+            celda = QRect()
+            if index.isValid() and self.vista.itemDelegateForColumn(index.column()) is self:
+                celda = self.vista.visualRect(index)
+
+            encima = celda.isValid() and self.accion_en(celda, self.raton)
+            self.vista.viewport().setCursor(Qt.PointingHandCursor if encima else Qt.ArrowCursor)
+            self.vista.viewport().update(self.celda)
+            self.vista.viewport().update(celda)
+            self.celda = celda
+        return False
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            encima = self.accion_en(option.rect, event.pos())
+            if encima:
+                self.pulsado.emit(encima[0], index.row())
+                return True
+        return super().editorEvent(event, model, option, index)
+
+    def helpEvent(self, event, view, option, index):
+        encima = self.accion_en(option.rect, event.pos())
+        if encima:
+            QToolTip.showText(event.globalPos(), encima[1], view)
+            return True
+        return super().helpEvent(event, view, option, index)
@@ -0,0 +1,122 @@
+'''
+Script en Python. Contiene el listador de las carpetas para la tabla de
+archivos de la ventana ('Bridge.recibirRuta' en 'main.py').
+
+Antes 'recibirRuta' hacía un 'os.listdir' en el hilo de la interfaz,
+llamado directamente desde el JavaScript del mapa. Con la biblioteca en
+un disco externo lento ('E:/BackupFotos') el mapa se quedaba parado
+hasta tener la carpeta entera.
+
+CLASE ListadorCarpetas:
+Lee la carpeta en otro hilo (un 'QThreadPool') con 'os.scandir', que da
+    a la vez el nombre de cada archivo y, en Windows, su tamaño y su fecha
+    de modificación, sin pedirlos uno a uno al disco. Los archivos llegan
+    a la tabla por bloques de 'tamaño_bloque' con la señal 'bloque', así
+    que los primeros se ven enseguida.
+Cada llamada a 'listar' cancela la anterior (al pulsar otra marca del
+    mapa): la tarea antigua se para en el siguiente archivo y sus bloques
+    ya no llegan a la tabla.
+Guarda los listados de las últimas 'carpetas_en_cache' carpetas con la
+    fecha de modificación de la carpeta, que cambia al añadir, borrar o
+    renombrar archivos. Si al volver a pedirla no ha cambiado, se usa el
+    listado guardado sin leerla otra vez.
+Si la carpeta no existe o no se puede leer, emite 'fallo' con la ruta.
+'''
+
+import os
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+tamaño_bloque = 500
+carpetas_en_cache = 64
+
+# (nombre, ruta completa, tamaño, fecha de modificación) de una entrada
+#   de 'os.scandir'.
+def leer_entrada(entrada):
+    try:
+        info = entrada.stat()
+        return entrada.name, entrada.path, info.st_size, info.st_mtime
+    except OSError:
+        return entrada.name, entrada.path, None, None
+
+class TareaListado(QRunnable):
+    def __init__(self, listador, ruta, generacion, anterior):
+        super().__init__()
+        self.listador = listador
+        self.ruta = ruta
+        self.generacion = generacion
+        self.anterior = anterior # (mtime, archivos) guardado, o None.
+
+    def cancelada(self):
+        return self.listador.generacion != self.generacion
+
+    def run(self):
+        try:
+            mtime = os.stat(self.ruta).st_mtime_ns
+            if self.anterior is not None and self.anterior[0] == mtime:
+                self.listador.leido.emit(self.generacion, self.anterior[1])
+                self.listador.terminado_interno.emit(self.generacion, self.ruta, mtime, self.anterior[1])
+                return
+
+            archivos, bloque = [], []
+            with os.scandir(self.ruta) as entradas:
+                for entrada in entradas:
+                    if self.cancelada():
+                        return
+                    bloque.append(leer_entrada(entrada))
+                    if len(bloque) >= tamaño_bloque:
+                        self.listador.leido.emit(self.generacion, bloque)
+                        archivos.extend(bloque)
+                        bloque = []
+            if bloque:
+                self.listador.leido.emit(self.generacion, bloque)
+                archivos.extend(bloque)
+            self.listador.terminado_interno.emit(self.generacion, self.ruta, mtime, archivos)
+
+        except OSError:
+            self.listador.fallido.emit(self.generacion, self.ruta)
+
+class ListadorCarpetas(QObject):
+    bloque = pyqtSignal(list)
+    terminado = pyqtSignal(str)
+    fallo = pyqtSignal(str)
+    # Señales internas: las emiten los hilos, con la generación de su tarea.
+    leido = pyqtSignal(int, list)
+    terminado_interno = pyqtSignal(int, str, object, list)
+    fallido = pyqtSignal(int, str)
+
+    def __init__(self):
+        super().__init__()
+        self.grupo = QThreadPool()
+        self.grupo.setMaxThreadCount(2)
+        self.generacion = 0
+        self.cache = OrderedDict() # ruta -> (mtime de la carpeta, archivos)
+        self.leido.connect(self.recibir_bloque)
+        self.terminado_interno.connect(self.guardar)
+        self.fallido.connect(self.recibir_fallo)
+
+    # Empezamos a leer una carpeta, cancelando la lectura anterior.
+    def listar(self, ruta):
+        self.generacion += 1
+        self.grupo.start(TareaListado(self, ruta, self.generacion, self.cache.get(ruta)))
+
+    def recibir_bloque(self, generacion, archivos):
+        if generacion == self.generacion:
+            self.bloque.emit(archivos)
+
+    def guardar(self, generacion, ruta, mtime, archivos):
+        self.cache[ruta] = (mtime, archivos)
+        self.cache.move_to_end(ruta)
+        while len(self.cache) > carpetas_en_cache:
+            self.cache.popitem(last=False)
+        if generacion == self.generacion:
+            self.terminado.emit(ruta)
+
+    def recibir_fallo(self, generacion, ruta):
+        self.cache.pop(ruta, None)
+        if generacion == self.generacion:
+            self.fallo.emit(ruta)
+
+    def cerrar(self):
+        self.generacion += 1
+        self.grupo.waitForDone()
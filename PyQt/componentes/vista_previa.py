@@ -0,0 +1,103 @@
+'''
+Script en Python. Contiene el cargador de las vistas previas de las fotos
+para el visor de la ventana ('labelVisor' de 'MapaWindow').
+
+Antes cada clic en la tabla creaba un 'QPixmap' con la foto entera (12 a
+50 megapíxeles) en el hilo de la interfaz, y el 'QLabel' la reducía al
+pintarla. La ventana se quedaba parada un momento con cada foto.
+
+CLASE CargadorVistas:
+Decodifica las fotos en un grupo de hilos ('QThreadPool'), ya al tamaño
+    en que se van a ver: con 'QImageReader.setScaledSize' el decodificador
+    JPEG reduce la imagen mientras la lee, sin decodificarla entera. Gira
+    la imagen según la orientación EXIF ('setAutoTransform').
+Guarda las últimas vistas previas en una caché LRU (las menos usadas
+    salen primero) limitada por memoria ('memoria_vistas'), así que volver
+    a una foto es inmediato.
+Con 'precargar' se piden por adelantado las fotos vecinas de la tabla, con
+    menos prioridad que la que se quiere ver. Las que ya no hacen falta y
+    aún no se han empezado se quitan de la cola.
+Cuando termina una imagen emite 'cargada' con la ruta, el tamaño pedido y
+    la imagen ('QImage', nula si no se ha podido leer).
+'''
+
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+memoria_vistas = 256 * 1024 * 1024 # Tamaño máximo de la caché, en bytes.
+hilos_vistas = 2
+
+# Decodificamos una foto al tamaño pedido, en un hilo del grupo.
+class TareaVista(QRunnable):
+    def __init__(self, cargador, ruta, tamaño):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.cargador = cargador
+        self.ruta = ruta
+        self.tamaño = tamaño
+
+    def run(self):
+        lector = QImageReader(self.ruta)
+        lector.setAutoTransform(True)
+        original = lector.size()
+        if original.isValid():
+            lector.setScaledSize(original.scaled(self.tamaño, Qt.KeepAspectRatio))
+        imagen = lector.read()
+        self.cargador.terminada.emit(self.ruta, self.tamaño, imagen if not imagen.isNull() else QImage())
+
+class CargadorVistas(QObject):
+    cargada = pyqtSignal(str, QSize, QImage)
+    # Señal interna: la emiten los hilos y llega al hilo de la interfaz.
+    terminada = pyqtSignal(str, QSize, QImage)
+
+    def __init__(self, memoria=memoria_vistas, hilos=hilos_vistas):
+        super().__init__()
+        self.memoria = memoria
+        self.grupo = QThreadPool()
+        self.grupo.setMaxThreadCount(hilos)
+        self.cache = OrderedDict() # (ruta, ancho, alto) -> QImage
+        self.ocupado = 0
+        self.pendientes = {} # (ruta, ancho, alto) -> TareaVista
+        self.terminada.connect(self.guardar)
+
+    # Vista previa de una foto, si ya está en la caché. Si no, la pedimos
+    #   al grupo de hilos y devolvemos None; llegará con 'cargada'.
+    def pedir(self, ruta, tamaño, prioridad=1):
+        clave = (ruta, tamaño.width(), tamaño.height())
+        if clave in self.cache:
+            self.cache.move_to_end(clave)
+            return self.cache[clave]
+        if clave not in self.pendientes:
+            tarea = TareaVista(self, ruta, tamaño)
+            self.pendientes[clave] = tarea
+            self.grupo.start(tarea, prioridad)
+        return None
+
+    # Pedimos por adelantado las fotos vecinas, y quitamos de la cola las
+    #   que se pidieron antes y ya no hacen falta.
+    def precargar(self, rutas, tamaño, actual=None):
+        queridas = {(ruta, tamaño.width(), tamaño.height()) for ruta in [actual, *rutas]}
+        for clave, tarea in list(self.pendientes.items()):
+            if clave not in queridas and self.grupo.tryTake(tarea):
+                del self.pendientes[clave]
+        for ruta in rutas:
+            self.pedir(ruta, tamaño, prioridad=0)
+
+    # Guardamos la imagen en la caché, sacando las menos usadas si pasamos
+    #   del límite de memoria, y avisamos a la ventana.
+    def guardar(self, ruta, tamaño, imagen):
+        clave = (ruta, tamaño.width(), tamaño.height())
+        self.pendientes.pop(clave, None)
+        if not imagen.isNull():
+            self.cache[clave] = imagen
+            self.ocupado += imagen.sizeInBytes()
+            while self.ocupado > self.memoria and len(self.cache) > 1:
+                _, antigua = self.cache.popitem(last=False)
+                self.ocupado -= antigua.sizeInBytes()
+        self.cargada.emit(ruta, tamaño, imagen)
+
+    # Esperamos a que terminen los hilos (al cerrar la ventana).
+    def cerrar(self):
+        self.grupo.clear()
+        self.grupo.waitForDone()
@@ -6,44 +6,73 @@ Cada directorio tiene el nombre '(ciudad)(pais)(año-mes)', así que cada
 marca será el nombre de la ciudad y el número de fotos que tiene ese
 directorio.
 
-Para crear las marcas en el mapa con la localización del lugar que sea
-el nombre del pueblo o ciudad y el pais, la hacemos con la librería
-'geopy'. Esta librería convierte nombres de lugares en coordenadas, 
-aptas para la geolocalización con 'Folium'.
-
-Así que dividimos el nombre del directorio en ciudad, pais y fecha, 
-dividiendo el nombre en 3 partes separadas por '), y posteriormente
-le quitaremos a cada parte el primer carácter que será '(', para
-quedarnos con el string que nos interesa (ciudad, pais y fecha).
-
-Posteriormente utilizaremos la ciudad y el pais para obtener la 
-geolocalización y poder colocar la marca, que contendrá el nombre de
-la ciudad y el número de fotos que tiene ese lugar.
-
-Al presionar sobre la marca, se abrirá un cuadro de diálogo con el 
+Las marcas las colocamos con el índice de carpetas del catálogo SQLite
+(ver 'catalogo.py'): al importar cada foto ya sabíamos sus coordenadas
+GPS exactas, así que cada carpeta guarda el número de archivos, el centro
+de sus fotos y sus límites. Lo leemos de una sola vez, sin volver a
+geocodificar el nombre de la carpeta con 'geopy' y sin recorrer con
+'os.listdir' los directorios de 'ruta_principal'. El mapa se ajusta a
+los límites de todas las carpetas.
+
+Del nombre del directorio sacamos la ciudad y el pais para la marca,
+dividiendo el nombre en 3 partes separadas por '), y quitando a cada
+parte el primer carácter que será '('.
+
+Al presionar sobre la marca, se abrirá un cuadro de diálogo con el
 listado de las fotos que hay dentro.
+
+Con 'modo_escalable' (por defecto) las carpetas se cargan desde archivos
+aparte y se agrupan según el zoom, sumando sus archivos (ver
+'mapa_escalable.py'), para que 'MapaWindow' abra rápido el mapa aunque
+haya miles de carpetas.
+
+Función (generar_mapa):
+Antes este script hacía el mapa entero al importarlo. Ahora es una
+    función, para que 'main.py' la llame en segundo plano después de
+    cada importación. Lee el catálogo en modo sólo lectura (sin crearlo
+    ni migrarlo, ver 'Catalogo'); si aún no existe, no hace nada. Junto al mapa guardamos su estado
+    ('mapa_fotos_estado.json'): la versión del índice de carpetas con la
+    que se hizo y la posición de cada carpeta. Si la versión del catálogo
+    no ha cambiado, no hace nada. Si ha cambiado, sólo se reescriben los
+    archivos de datos de las teselas donde estaban o están las carpetas
+    nuevas o con fotos nuevas. Devuelve el número de carpetas cambiadas.
+    Mide la lectura del catálogo y el mapa, y cuenta como acierto de la
+    caché cada vez que el mapa ya estaba al día (ver 'metricas.py').
+    Las rutas del mapa y del catálogo son relativas a este script, no al
+    directorio desde el que se lanza 'main.py'.
+La página tiene las funciones 'vistaMapa()' (centro y zoom del mapa) y
+    'ponerVista(lat, lon, zoom)', para que 'main.py' deje el mapa donde
+    estaba al recargarlo.
 '''
 
 import folium
 import os
-import time
-from geopy.geocoders import Nominatim
-
-ruta_mapas = './PyQt/mapas'
+import sys
+import json
+
+# El catálogo está en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metricas
+from catalogo import Catalogo
+from mapa_marca_directorios import limites_totales
+from mapa_escalable import añadir_capas
+
+directorio_pyqt = os.path.dirname(os.path.abspath(__file__))
+ruta_mapas = os.path.join(directorio_pyqt, 'mapas', '')
+ruta_html = f'{ruta_mapas}mapa_fotos.html'
 ruta_principal = 'E:/BackupFotos'
-
-# Iniciamos el geocodificador.
-geolocator = Nominatim(user_agent="copilot-mapa")
-
-# Función para obtener la lista de los directorios de la ruta principal.
-
-directorios = os.listdir(ruta_principal)
-
-# Inicializamos la localización inicial (Madrid, España).
-location = geolocator.geocode('Madrid, España', timeout=10)
-
-# Creamos un mapa centrado en España (Madrid).
-mapa = folium.Map(location=[location.latitude, location.longitude], zoom_start=10)
+ruta_catalogo = os.path.join(os.path.dirname(directorio_pyqt), 'catalogo.db')
+ubicacion_inicial = [40.4165, -3.70256] # Madrid, si aún no hay carpetas con GPS.
+modo_escalable = True
+
+# Popup de las carpetas en el modo escalable, con el botón que llama a PyQt.
+plantilla_popup = '''function (p) {
+    var ruta = p.ruta.replace(/&/g, '&amp;').replace(/"/g, '&quot;');
+    return '<div style="width:250px;" data-directorio="' + ruta + '">' +
+        '<b>' + p.nombre + ' - ' + p.archivos + ' archivos</b><br>' +
+        '<button data-ruta="' + ruta + '" onclick="enviarRuta(this.dataset.ruta)">Ver archivos</button>' +
+        '</div>';
+}'''
 
 # Función para extraer el nombre de la ciudad.
 def extraer_ciudad(nombre):
@@ -52,42 +81,136 @@ def extraer_ciudad(nombre):
     fecha = nombre.split(')')[2][1:]
     return ciudad, pais, fecha
 
-for directorio in directorios:
-    archivos = os.listdir(f'{ruta_principal}/{directorio}')
-    numero = len(archivos)
-
-    ciudad = extraer_ciudad(directorio)
-
-    nombre_carpeta = f'{ciudad[0]}, {ciudad[1]}'
-    location = geolocator.geocode(nombre_carpeta, timeout=10)
-
-    # HTML con botón que llama a PyQt
-    html = f"""
-    <div style="width:250px;" data-directorio="{ruta_principal}/{directorio}">
-    <b>{nombre_carpeta} - {numero} archivos</b><br>
-    <button onclick="enviarRuta('{ruta_principal}/{directorio}')">Ver archivos</button>
-    </div>
-    """
-
-    popup = folium.Popup(folium.Html(html, script=True), max_width=300)
-
-    folium.Marker(
-        [location.latitude, location.longitude],
-        popup=popup
-    ).add_to(mapa)
-    time.sleep(1) # Esperamos 1 segundo para dar tiempo al geolocalizador.
-
-# Agregar canal de comunicación con PyQt
-mapa.get_root().html.add_child(folium.Element("""
-<script src="qrc:///qtwebchannel/qwebchannel.js"></script>
-<script>
-new QWebChannel(qt.webChannelTransport, function(channel) {
-    window.bridge = channel.objects.bridge;
-});
-function enviarRuta(ruta) {
-    window.bridge.recibirRuta(ruta);
-}
-</script>
-"""))
-
-mapa.save(f'{ruta_mapas}mapa_fotos.html')
+# Estado del mapa de la última vez que se generó, o None si no hay.
+def cargar_estado(ruta_html):
+    ruta_estado = f'{os.path.splitext(ruta_html)[0]}_estado.json'
+    if not os.path.exists(ruta_html) or not os.path.exists(ruta_estado):
+        return None
+    with open(ruta_estado, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_estado(ruta_html, estado):
+    ruta_estado = f'{os.path.splitext(ruta_html)[0]}_estado.json'
+    with open(ruta_estado, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+
+# Creamos el mapa con las carpetas. Con 'cambiados' (posiciones de las
+#   carpetas cambiadas), en el modo escalable sólo se reescriben sus teselas.
+def crear_mapa(directorios, ruta_html, cambiados=None):
+    mapa = folium.Map(location=ubicacion_inicial, zoom_start=10)
+
+    if modo_escalable:
+        puntos = [
+            {
+                'latitud': indice['latitud'],
+                'longitud': indice['longitud'],
+                'peso': indice['numero'],
+                'archivos': indice['numero'],
+                'nombre': '{}, {}'.format(*extraer_ciudad(directorio)),
+                'ruta': f'{ruta_principal}/{directorio}'
+            }
+            for directorio, indice in directorios.items()
+        ]
+        añadir_capas(mapa, puntos, ruta_html, plantilla_popup, cambiados)
+    else:
+        for directorio, indice in directorios.items():
+            numero = indice['numero']
+            location = [indice['latitud'], indice['longitud']]
+
+            nombre_carpeta = '{}, {}'.format(*extraer_ciudad(directorio))
+
+            # HTML con botón que llama a PyQt
+            html = f"""
+            <div style="width:250px;" data-directorio="{ruta_principal}/{directorio}">
+            <b>{nombre_carpeta} - {numero} archivos</b><br>
+            <button onclick="enviarRuta('{ruta_principal}/{directorio}')">Ver archivos</button>
+            </div>
+            """
+
+            popup = folium.Popup(folium.Html(html, script=True), max_width=300)
+
+            folium.Marker(
+                list(location),
+                popup=popup
+            ).add_to(mapa)
+
+    # Ajustamos el mapa a los límites de todas las carpetas.
+    if directorios:
+        mapa.fit_bounds(limites_totales(directorios.values()))
+
+    # Agregar canal de comunicación con PyQt
+    mapa.get_root().html.add_child(folium.Element("""
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+    <script>
+    new QWebChannel(qt.webChannelTransport, function(channel) {
+        window.bridge = channel.objects.bridge;
+    });
+    function enviarRuta(ruta) {
+        window.bridge.recibirRuta(ruta);
+    }
+    </script>
+    """))
+
+    # Centro y zoom del mapa, para recuperarlos al recargar la página.
+    nombre = mapa.get_name()
+    mapa.get_root().html.add_child(folium.Element(f"""
+    <script>
+    function vistaMapa() {{
+        var centro = {nombre}.getCenter();
+        return [centro.lat, centro.lng, {nombre}.getZoom()];
+    }}
+    function ponerVista(lat, lon, zoom) {{
+        {nombre}.setView([lat, lon], zoom, {{animate: false}});
+    }}
+    </script>
+    """))
+
+    mapa.save(ruta_html)
+
+# Generamos o actualizamos el mapa. Con 'forzar' se rehace entero.
+def generar_mapa(ruta_catalogo=ruta_catalogo, ruta_html=ruta_html, forzar=False):
+    if not os.path.exists(ruta_catalogo):
+        return 0
+    catalogo = Catalogo(ruta_catalogo, solo_lectura=True)
+    version = catalogo.version_carpetas()
+    estado = None if forzar else cargar_estado(ruta_html)
+    if estado and estado['modo_escalable'] != modo_escalable:
+        estado = None
+    if estado and estado['version'] == version:
+        catalogo.cerrar()
+        metricas.cache('mapa', 1, 0)
+        return 0
+    metricas.cache('mapa', 0, 1)
+
+    # Directorios '(ciudad)(pais)(año-mes)' con su número de archivos, su
+    #   centro y sus límites. Los que no tienen fotos con GPS no se marcan.
+    with metricas.medir('catalogo', archivos=0):
+        directorios = {d: i for d, i in catalogo.indice_carpetas().items() if i['latitud'] is not None}
+    catalogo.cerrar()
+    posiciones = {d: [i['latitud'], i['longitud']] for d, i in directorios.items()}
+
+    if estado:
+        # Carpetas nuevas, con fotos nuevas o que ya no están (al
+        #   reconstruir el índice): su posición de antes y la de ahora.
+        anteriores = estado['carpetas']
+        cambiadas = {d for d, i in directorios.items() if i['version'] > estado['version'] or d not in anteriores}
+        cambiadas |= set(anteriores) - set(directorios)
+        cambiados = [posiciones[d] for d in cambiadas if d in posiciones]
+        cambiados += [anteriores[d] for d in cambiadas if d in anteriores]
+    else:
+        cambiadas = set(directorios)
+        cambiados = None
+
+    with metricas.medir('mapa', archivos=len(cambiadas)):
+        crear_mapa(directorios, ruta_html, cambiados)
+    metricas.contar('archivos', len(cambiadas))
+    guardar_estado(ruta_html, {'version': version, 'modo_escalable': modo_escalable, 'carpetas': posiciones})
+    return len(cambiadas)
+
+# Función principal.
+def main():
+    cambiadas = generar_mapa(forzar='--forzar' in sys.argv)
+    print(f'✅ Mapa {ruta_html} actualizado ({cambiadas} carpetas cambiadas)')
+
+if __name__ == '__main__':
+    metricas.ejecutar('generar_mapa', main)
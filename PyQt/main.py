@@ -17,13 +17,20 @@ CLASE Bridge:
 Es un puente entre JavaScript y Python.
 Con '@pyqtSlot(str)' indicamos que este método puede ser llamado desde
 JavaScript con un argumento tipo str.
-La lógica del método 'recibirRuta', es que primero verificamos si la
-    ruta recibida es un directorio válido. De ser así, obtenemos todos
-    los archivos que contiene ese directorio y los presentamos en una
-    ventana emergente, en una lista. Una vez cerrada esta ventana se
-    abre un cuadro de diálogo para seleccionar un archivos que esta en
-    esa ruta, filtrando por imágenes y videos. Por último mostramos el
-    archivo seleccionado en la consola (incluida la ruta completa).
+La lógica del método 'recibirRuta', es que vaciamos la tabla y pedimos
+    la carpeta a un 'ListadorCarpetas' (ver 'componentes/listado_carpetas.py'),
+    que la lee en otro hilo con 'os.scandir' y nos va dando los archivos
+    por bloques, así que el mapa no se queda parado. Si se pulsa otra
+    marca antes de terminar, la lectura anterior se cancela, y las
+    carpetas ya leídas que no han cambiado salen de una caché. Si la
+    ruta no es un directorio válido mostramos un aviso. La tabla es un
+    'QTableView' sobre un 'ModeloArchivos' (ver 'componentes/controles.py'),
+    y el tamaño y la fecha de cada archivo salen en su ayuda. Sólo se pintan las
+    filas que se ven, los botones de cada fila los pinta un delegado sin
+    crear widgets, y se puede ordenar por el nombre (pulsando en la
+    cabecera) y filtrar escribiendo en 'lineEditFiltro'. Los botones de
+    cada fila (copiar, compartir y borrar) muestran por ahora en la
+    consola el archivo de esa fila (con la ruta completa).
 
 CLASE MapaWindow:
 Hereda de 'QMainWindow', que es la ventana principal de la app.
@@ -33,22 +40,43 @@ Creamos un visor web (QwebEngineView) y cargamos el archivo HTML local
 Creamos un canal web 'QWebChannel' y un objeto 'Bridge', que lo registramos
     en el canal y que será accesible desde JavaScript como "bridge". Por
     último añadimos el canal web al visor web, para que haya comunicación.
+Al cambiar de fila en la tabla (con el ratón o con las flechas) se
+    muestra la foto en el visor. La decodifica un 'CargadorVistas' (ver
+    'componentes/vista_previa.py') en otros hilos y al tamaño del visor,
+    y se precargan las 'vecinos' filas de arriba y de abajo, así que
+    pasar de una foto a la siguiente es inmediato.
+El mapa se actualiza en segundo plano (un 'GeneradorMapa', en otro hilo)
+    al abrir la ventana y cuando cambia el catálogo, con 'generar_mapa()'
+    de 'generar_mapa.py'. Un 'QFileSystemWatcher' vigila 'catalogo.db'
+    (o su carpeta, si aún no existe): SQLite lo escribe al pasar su
+    diario WAL a la base de datos, y siempre al cerrarlo, así que al
+    terminar cada importación. Esperamos 'retardo_mapa' milisegundos sin
+    cambios antes de actualizarlo. Si el catálogo no ha cambiado
+    'generar_mapa()' no hace nada, y después de una importación sólo
+    reescribe las carpetas cambiadas. Cuando hay cambios recargamos el visor web,
+    guardando antes el centro y el zoom del mapa ('vistaMapa()') para
+    volver a ponerlos al terminar de cargar, así no se pierde la zona que
+    se estaba mirando.
 
 Finálmente creamos el layout y lanzamos la app.
 '''
 
 import sys, os
-import json
-from PyQt5.QtWidgets import QApplication, QMainWindow, QFrame, QVBoxLayout, QHBoxLayout, QWidget, QMessageBox, QFileDialog
+import sqlite3
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QMessageBox
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWebChannel import QWebChannel
-from PyQt5.QtCore import QObject, pyqtSlot, QUrl
-from PyQt5.QtWidgets import QTableWidgetItem
+from PyQt5.QtCore import Qt, QObject, pyqtSlot, QUrl, QThread, QTimer, QFileSystemWatcher, pyqtSignal
 from PyQt5 import uic
 from PyQt5.QtGui import QPixmap
-from componentes.controles import Button
-
-ruta_mapas = './PyQt/mapas/'
+from componentes.controles import ModeloArchivos, DelegadoAcciones
+from componentes.vista_previa import CargadorVistas
+from componentes.listado_carpetas import ListadorCarpetas
+import generar_mapa
+
+directorio = os.path.dirname(os.path.abspath(__file__))
+retardo_mapa = 2000 # Milisegundos sin cambios en el catálogo antes de actualizar el mapa.
+vecinos = 2 # Filas que se precargan por encima y por debajo de la foto actual.
 meses = ('Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre')
 
 class Bridge(QObject):
@@ -56,60 +84,44 @@ class Bridge(QObject):
         super().__init__()
         self.tabla = tableWidget
 
+        # La tabla es una vista sobre el modelo de archivos, con los
+        #   botones pintados por el delegado.
+        self.modelo = ModeloArchivos()
+        self.tabla.setModel(self.modelo)
+        self.tabla.sortByColumn(0, Qt.AscendingOrder)
+        self.delegado = DelegadoAcciones(self.tabla)
+        self.delegado.pulsado.connect(self.accion)
+        self.tabla.setItemDelegateForColumn(2, self.delegado)
+        self.tabla.setColumnWidth(0, 205)
+        self.tabla.setColumnWidth(2, 140)
+        self.tabla.setColumnHidden(1, True)
+        self.tabla.verticalHeader().setDefaultSectionSize(30)
+        fuente = self.tabla.horizontalHeader().font()
+        fuente.setBold(True)
+        self.tabla.horizontalHeader().setFont(fuente)
+
+        # La carpeta se lee en otro hilo y llega a la tabla por bloques.
+        self.listador = ListadorCarpetas()
+        self.listador.bloque.connect(self.modelo.agregar)
+        self.listador.terminado.connect(lambda ruta: self.modelo.ordenar())
+        self.listador.fallo.connect(self.carpeta_no_encontrada)
+
     @pyqtSlot(str)
     def recibirRuta(self, ruta):
-        if os.path.isdir(ruta):
-            archivos = os.listdir(ruta)
-            self.tabla.setRowCount(len(archivos))
-            self.tabla.setColumnCount(3)
-            self.tabla.setHorizontalHeaderLabels(['Nombre de Archivo', 'Ruta', 'Acción'])
-            self.tabla.setColumnWidth(0, 205)
-            self.tabla.setColumnWidth(2, 140)
-            self.tabla.setColumnHidden(1, True)
-
-            for i, nombre in enumerate(archivos):
-                ruta_completa = os.path.join(ruta, nombre)
-
-                # Insertar en la tabla.
-                self.tabla.setItem(i, 0, QTableWidgetItem(nombre))
-                self.tabla.setItem(i, 1, QTableWidgetItem(ruta_completa))
-                self.tabla.setCellWidget(i, 2, self.botones_accion(i))
-                self.tabla.setRowHeight(i, 30)
+        self.modelo.cargar([])
+        self.listador.listar(ruta)
+
+    def carpeta_no_encontrada(self, ruta):
+        QMessageBox.warning(None, "Error", f"No se encontró el directorio:\n{ruta}")
+
+    # Dejamos en el listado sólo los archivos cuyo nombre contiene el texto.
+    def filtrar(self, texto):
+        self.modelo.filtrar(texto)
+
+    # Botón pulsado en la columna 'Acción': 'copiar', 'compartir' o 'borrar'.
+    def accion(self, accion, row):
+        getattr(self, accion)(row)
 
-        else:
-            QMessageBox.warning(None, "Error", f"No se encontró el directorio:\n{ruta}")
-
-    def botones_accion(self, row):
-        widget = QWidget()
-        buttons_layout = QHBoxLayout()
-        buttons_layout.setContentsMargins(0, 0, 0, 0)
-        buttons_layout.setSpacing(5)
-
-        # Creamos los botones.
-        copiar_button = Button('copy', '#d3d3d3')
-        copiar_button.setToolTip('Copiar Foto')
-        compartir_button = Button('share','#add8e6')
-        compartir_button.setToolTip('Compartir Foto')
-        borrar_button = Button('delete', '#f08080')
-        borrar_button.setToolTip('Borrar Foto')
-
-        # Conectamos cada botón a su función
-        copiar_button.clicked.connect(lambda _, r=row: self.copiar(r))
-        compartir_button.clicked.connect(lambda _, r=row: self.compartir(r))
-        borrar_button.clicked.connect(lambda _, r=row: self.borrar(r))
-
-        # Creamos el layout y añadimos los botones
-        buttons_layout.addWidget(copiar_button)
-        buttons_layout.addWidget(compartir_button)
-        buttons_layout.addWidget(borrar_button)
-
-        # Creamos el frame que contendrá el layout
-        widget.setLayout(buttons_layout)
-
-        # Asignamos las señal a cada botón.
-
-        return widget
-    
     def copiar(self, row):
         archivo = self.obtener_archivo(row)
         print(f'Copiar: {archivo}')
@@ -126,16 +138,29 @@ class Bridge(QObject):
         ruta_id_index = self.tabla.model().index(row_index, 1)
         return self.tabla.model().data(ruta_id_index)        
 
+# Actualiza el mapa en otro hilo, para no bloquear la ventana. Emite el
+#   número de carpetas que han cambiado.
+class GeneradorMapa(QThread):
+    terminado = pyqtSignal(int)
+
+    def run(self):
+        try:
+            self.terminado.emit(generar_mapa.generar_mapa())
+        except (OSError, sqlite3.Error) as error:
+            print(f'No se pudo actualizar el mapa: {error}')
+
 class MapaWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.ui = uic.loadUi("./PyQt/ui_files/MainWindow.ui")
+        self.ui = uic.loadUi(os.path.join(directorio, 'ui_files', 'MainWindow.ui'))
         self.ui.showMaximized()
 
         # Visor web
         self.view = QWebEngineView()
-        self.view.load(QUrl.fromLocalFile(os.path.abspath(f"{ruta_mapas}mapa_fotos.html")))
+        self.view.load(QUrl.fromLocalFile(generar_mapa.ruta_html))
+        self.view.loadFinished.connect(self.mapa_cargado)
+        self.vista_mapa = None # (lat, lon, zoom) a recuperar tras recargar.
 
         # Canal web
         self.channel = QWebChannel()
@@ -147,19 +172,97 @@ class MapaWindow(QMainWindow):
         layout.setContentsMargins(5, 5, 5, 5)
         layout.addWidget(self.view)
 
+        # Actualización del mapa en segundo plano, cuando cambia el catálogo.
+        self.generador = GeneradorMapa()
+        self.generador.terminado.connect(self.mapa_actualizado)
+        self.temporizador = QTimer()
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(retardo_mapa)
+        self.temporizador.timeout.connect(self.actualizar_mapa)
+        self.vigilante = QFileSystemWatcher()
+        self.vigilante.fileChanged.connect(self.catalogo_cambiado)
+        self.vigilante.directoryChanged.connect(self.catalogo_cambiado)
+        self.vigilar_catalogo()
+        self.actualizar_mapa()
+
+        # Vistas previas de las fotos, decodificadas en otros hilos. La foto
+        #   ya sale al tamaño del visor, centrada y sin deformar.
+        self.vistas = CargadorVistas()
+        self.foto_actual = None
+        self.ui.labelVisor.setScaledContents(False)
+        self.ui.labelVisor.setAlignment(Qt.AlignCenter)
+
         self.signs_controls()
 
     def show(self):
         self.ui.show()
 
-    def mostrar_foto(self):
-        row = self.ui.tableWidget.currentRow()
-
-        ruta_archivo = self.ui.tableWidget.item(row, 1).text()
-        pixmap = QPixmap(ruta_archivo)
-        if not pixmap.isNull():
+    # Vigilamos el archivo del catálogo, o su carpeta si aún no existe.
+    #   Se vuelve a poner en cada cambio, porque si el archivo se
+    #   reemplaza el vigilante lo deja de seguir.
+    def vigilar_catalogo(self):
+        rutas = self.vigilante.files() + self.vigilante.directories()
+        if rutas:
+            self.vigilante.removePaths(rutas)
+        ruta = generar_mapa.ruta_catalogo
+        self.vigilante.addPath(ruta if os.path.exists(ruta) else os.path.dirname(ruta))
+
+    def catalogo_cambiado(self, ruta):
+        self.vigilar_catalogo()
+        self.temporizador.start()
+
+    def actualizar_mapa(self):
+        if self.generador.isRunning():
+            self.temporizador.start()
+        else:
+            self.generador.start()
+
+    def mapa_actualizado(self, cambiadas):
+        if cambiadas:
+            self.view.page().runJavaScript('typeof vistaMapa === "function" ? vistaMapa() : null',
+                                           self.recargar_mapa)
+
+    def recargar_mapa(self, vista):
+        self.vista_mapa = vista
+        self.view.reload()
+
+    def mapa_cargado(self, correcto):
+        if correcto and self.vista_mapa:
+            self.view.page().runJavaScript('ponerVista({}, {}, {})'.format(*self.vista_mapa))
+        self.vista_mapa = None
+
+    # Tamaño en píxeles reales del visor, para decodificar la foto a ese tamaño.
+    def tamaño_visor(self):
+        return self.ui.labelVisor.size() * self.ui.labelVisor.devicePixelRatioF()
+
+    # Mostramos la foto de la fila actual (con el ratón o con las flechas)
+    #   y pedimos por adelantado las de las filas vecinas.
+    def mostrar_foto(self, index):
+        if not index.isValid():
+            return
+
+        modelo = index.model()
+        ruta_archivo = modelo.index(index.row(), 1).data()
+        self.foto_actual = ruta_archivo
+        tamaño = self.tamaño_visor()
+        imagen = self.vistas.pedir(ruta_archivo, tamaño)
+        if imagen is not None:
+            self.poner_foto(ruta_archivo, imagen)
+
+        filas = [index.row() + d for d in range(-vecinos, vecinos + 1) if d != 0]
+        rutas = [modelo.index(f, 1).data() for f in filas if 0 <= f < modelo.rowCount()]
+        self.vistas.precargar(rutas, tamaño, ruta_archivo)
+
+    # Llega una vista previa decodificada; la ponemos si es la foto actual.
+    def foto_cargada(self, ruta_archivo, tamaño, imagen):
+        if ruta_archivo == self.foto_actual:
+            self.poner_foto(ruta_archivo, imagen)
+
+    def poner_foto(self, ruta_archivo, imagen):
+        if not imagen.isNull():
+            pixmap = QPixmap.fromImage(imagen)
+            pixmap.setDevicePixelRatio(self.ui.labelVisor.devicePixelRatioF())
             self.ui.labelVisor.setPixmap(pixmap)
-            self.ui.labelVisor.setScaledContents(True)
             self.obtener_fecha(ruta_archivo)
 
         else:
@@ -172,13 +275,18 @@ class MapaWindow(QMainWindow):
         self.ui.labelFechaListado.setText(f'{mes} de {ano}')
 
     def signs_controls(self):
-        self.ui.tableWidget.itemClicked.connect(self.mostrar_foto)
+        self.ui.tableWidget.selectionModel().currentRowChanged.connect(self.mostrar_foto)
+        self.vistas.cargada.connect(self.foto_cargada)
+        self.ui.lineEditFiltro.textChanged.connect(self.bridge.filtrar)
 
 def main():
     app = QApplication(sys.argv)
     ventana = MapaWindow()
     ventana.show()
-    sys.exit(app.exec_())
+    codigo = app.exec_()
+    ventana.vistas.cerrar()
+    ventana.bridge.listador.cerrar()
+    sys.exit(codigo)
 
 if __name__ == "__main__":
     main()
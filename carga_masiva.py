@@ -0,0 +1,266 @@
+'''
+Script en Python. Carga masiva en la copia ('ruta_final') de árboles de
+carpetas enteros: fotos y videos de móviles antiguos y de discos, con
+cientos de miles de archivos repartidos en subcarpetas.
+
+'copia_clasificador_fotos.py' sólo lee una carpeta (la del móvil o la
+de 'ruta_pc'), sin entrar en sus subcarpetas, y la tubería de hilos está
+pensada para un lote del móvil: leer el EXIF y calcular el hash en
+Python con hilos no aprovecha más de un núcleo.
+
+Función (cargar_arbol):
+1º Recorremos el árbol con 'os.scandir' (cada entrada trae ya su tamaño
+    y fecha de modificación) y nos quedamos con las fotos y videos. Con
+    el manifiesto del catálogo (origen 'masivo:<ruta>', con la ruta
+    relativa de cada archivo) nos saltamos los ya cargados que no han
+    cambiado, así que una carga cortada sigue donde se quedó.
+2º En un grupo de procesos ('procesos', uno por núcleo), cada archivo se
+    lee una vez para su hash completo y su huella rápida (ver 'huellas.py'),
+    y se leen sus metadatos (EXIF o cajas del MP4) sólo de la cabecera.
+3º En el proceso principal se geocodifica (con la caché de siempre, y las
+    consultas a Nominatim de una en una) y se decide la carpeta con las
+    mismas reglas: '(ciudad)(pais)(año-mes)'. Se descartan los duplicados
+    y eliminados del catálogo, y los repetidos dentro de la propia carga.
+4º Los archivos nuevos se colocan en 'hilos_copia' hilos con
+    'colocar_archivo' (enlace duro, reflink o copia, y renombrado atómico,
+    ver 'copia_directa.py'). Si en la carpeta ya hay otro archivo con el
+    mismo nombre, se añade '_1', '_2'... al nombre; si es el mismo archivo
+    (una carga anterior que se cortó antes de registrarlo), no se copia.
+5º Los registros se guardan en el catálogo por lotes de 'tamaño_lote',
+    cada lote en una sola transacción, junto con su manifiesto.
+
+Las fotos parecidas (ver 'similares.py') no se buscan en la carga
+masiva; su huella visual se completa en la siguiente importación.
+
+Como en la importación, al terminar se muestra y se guarda el resumen de
+las métricas de cada etapa (ver 'metricas.py'). El hash y los metadatos
+se miden dentro de cada proceso, y se suman en el principal.
+'''
+
+import os
+import sys
+import time
+import metricas
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import huellas
+import copia_clasificador_fotos as clasificador
+from catalogo import Catalogo
+from copia_directa import colocar_archivo, ruta_libre
+
+ruta_origen = 'E:\\FotosAntiguas'
+ruta_final = clasificador.ruta_final
+ruta_catalogo = clasificador.ruta_catalogo
+procesos = None # Número de procesos para el EXIF y el hash; None = uno por núcleo.
+hilos_copia = 2
+tamaño_lote = 500 # Registros por transacción del catálogo.
+extensiones = ('.jpg', '.jpeg', '.mp4')
+
+# Recorremos el árbol de carpetas. Genera (ruta, ruta relativa, (tamaño,
+#   mtime)) de cada foto o video. Nos saltamos las carpetas ocultas.
+def recorrer(raiz):
+    pendientes = [raiz]
+    while pendientes:
+        carpeta = pendientes.pop()
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    if entrada.name.startswith('.'):
+                        continue
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(entrada.path)
+                    elif entrada.name.lower().endswith(extensiones):
+                        info = entrada.stat()
+                        relativa = os.path.relpath(entrada.path, raiz).replace(os.sep, '/')
+                        yield entrada.path, relativa, (info.st_size, int(info.st_mtime))
+        except OSError as error:
+            print(f'⚠ No se puede leer {carpeta}: {error}')
+
+# Etapa de los procesos: huella, hash completo y metadatos de un archivo.
+#   Devuelve None si no se puede leer.
+def analizar(ruta):
+    inicio = time.perf_counter()
+    try:
+        tamaño, hash_parcial = huellas.huella_rapida(ruta)
+        hash_archivo = huellas.hash_completo(ruta)
+    except OSError:
+        return None
+    medio = time.perf_counter()
+
+    if ruta.lower().endswith(('.jpg', '.jpeg')):
+        gps_info, fecha = clasificador.obtener_datos_exif(ruta)
+    else:
+        gps_info, fecha = clasificador.obtener_datos_video(ruta)
+
+    return {
+        'tamaño': tamaño,
+        'hash_parcial': hash_parcial,
+        'hash': hash_archivo,
+        'gps_info': gps_info,
+        'fecha': fecha,
+        'segundos_hash': medio - inicio,
+        'segundos_metadatos': time.perf_counter() - medio
+    }
+
+# Guardamos un lote de registros y su manifiesto en una sola transacción.
+def guardar_lote(catalogo, origen, lote):
+    with metricas.medir('registro', archivos=len(lote)), catalogo.transaccion():
+        for registro, relativa, estado in lote:
+            if registro:
+                catalogo.añadir(registro)
+            catalogo.marcar_sincronizado(origen, relativa, *estado)
+
+# Cargamos un árbol de carpetas en la copia. Devuelve un diccionario con
+#   el número de archivos copiados, duplicados, ilegibles y sin cambios.
+def cargar_arbol(raiz, catalogo, ruta_final=ruta_final, procesos=procesos, hilos=hilos_copia):
+    origen = f'masivo:{os.path.abspath(raiz)}'
+    manifiesto = catalogo.manifiesto(origen)
+    inicio = time.perf_counter()
+    todos = list(recorrer(raiz))
+    metricas.anotar('listado', time.perf_counter() - inicio, archivos=len(todos))
+    archivos = [(ruta, relativa, estado) for ruta, relativa, estado in todos
+                if manifiesto.get(relativa) != estado]
+    resumen = {'copiados': 0, 'duplicados': 0, 'ilegibles': 0,
+               'sin_cambios': len(todos) - len(archivos), 'total': len(archivos)}
+    metricas.cache('manifiesto', resumen['sin_cambios'], len(archivos))
+    print(f'📂 {len(archivos)} archivos nuevos o cambiados en {raiz}')
+
+    antiguos = catalogo.algoritmos_sin_tamaño()
+    lote = []
+    en_copia = {} # Copias en curso: futuro -> registro.
+    repetidos = {} # Hash en copia -> [(ruta, relativa, estado)] de sus repetidos.
+    vistos = set() # Hashes ya copiados en esta carga.
+    reservadas = set() # Rutas de destino elegidas en esta carga.
+    inicio = time.perf_counter()
+
+    # Recogemos las copias terminadas y guardamos el lote si está lleno.
+    #   Los repetidos de una copia sólo se dan por duplicados cuando ha
+    #   salido bien; si falla, se intenta con el siguiente repetido, y si
+    #   no hay ninguno, el hash queda libre para otro archivo igual.
+    def recoger(esperar=False):
+        nonlocal lote
+        if en_copia:
+            hechas, _ = wait(en_copia, timeout=None if esperar else 0, return_when=FIRST_COMPLETED)
+            for futuro in hechas:
+                registro = en_copia.pop(futuro)
+                esperando = repetidos.pop(registro['hash'])
+                if futuro.result():
+                    vistos.add(registro['hash'])
+                    resumen['copiados'] += 1
+                    resumen['duplicados'] += len(esperando)
+                    lote.append(futuro.result())
+                    lote.extend((None, relativa, estado) for _, relativa, estado in esperando)
+                elif esperando:
+                    ruta, relativa, estado = esperando.pop(0)
+                    repetidos[registro['hash']] = esperando
+                    en_copia[copia.submit(colocar, ruta, registro['ruta'], registro, relativa, estado)] = registro
+        if len(lote) >= tamaño_lote or (esperar and not en_copia and lote):
+            guardar_lote(catalogo, origen, lote)
+            lote = []
+
+    copia = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='copia')
+    with ProcessPoolExecutor(max_workers=procesos) as analisis, copia:
+        resultados = analisis.map(analizar, [ruta for ruta, _, _ in archivos], chunksize=16)
+        for numero, ((ruta, relativa, estado), datos) in enumerate(zip(archivos, resultados), 1):
+            if datos is None:
+                resumen['ilegibles'] += 1
+                print(f'⚠ No se puede leer {ruta}')
+                recoger()
+                continue
+            metricas.anotar('hash', datos['segundos_hash'], datos['tamaño'])
+            metricas.anotar('exif', datos['segundos_metadatos'])
+
+            with metricas.medir('deduplicado'):
+                # El hash completo ya está calculado, así que también lo
+                #   comparamos con los registros antiguos sin tamaño.
+                candidatos = catalogo.candidatos(datos['tamaño'], datos['hash_parcial'])
+                hashes = clasificador.calcular_hashes(ruta, candidatos, datos['hash'], antiguos)
+                duplicado = datos['hash'] in vistos or any(
+                    catalogo.existe(h) or catalogo.eliminado(h) for h in hashes.values())
+            if datos['hash'] in repetidos:
+                repetidos[datos['hash']].append((ruta, relativa, estado))
+                recoger()
+                continue
+            if duplicado:
+                resumen['duplicados'] += 1
+                lote.append((None, relativa, estado))
+                recoger()
+                continue
+
+            # La carpeta de destino, con las mismas reglas que la importación.
+            if datos['gps_info']:
+                with metricas.medir('geocodificacion'):
+                    ubicacion, lat, lon = clasificador.obtener_ubicación(datos['gps_info'])
+            else:
+                ubicacion, lat, lon = '(Sin_GPS)', None, None
+            fecha = datos['fecha'].strftime('(%Y-%m)') if datos['fecha'] else '(Sin_Fecha)'
+            carpeta = os.path.join(ruta_final, f'{ubicacion}{fecha}')
+            os.makedirs(carpeta, exist_ok=True)
+
+            destino, ya_colocado = ruta_libre(carpeta, os.path.basename(ruta),
+                                              (datos['tamaño'], datos['hash_parcial']),
+                                              datos['hash'], reservadas)
+            reservadas.add(destino)
+            registro = {
+                'hash': datos['hash'],
+                'ruta': destino,
+                'ubicacion': ubicacion,
+                'fecha': fecha,
+                'latitud': float(lat) if lat is not None else None,
+                'longitud': float(lon) if lon is not None else None,
+                'tamaño': datos['tamaño'],
+                'hash_parcial': datos['hash_parcial']
+            }
+            if ya_colocado:
+                vistos.add(datos['hash'])
+                resumen['copiados'] += 1
+                lote.append((registro, relativa, estado))
+            else:
+                repetidos[datos['hash']] = []
+                en_copia[copia.submit(colocar, ruta, destino, registro, relativa, estado)] = registro
+            recoger()
+
+            if numero % 1000 == 0:
+                print(f'📦 {numero}/{len(archivos)} ({numero / (time.perf_counter() - inicio):.0f} archivos/s)')
+
+        while en_copia or lote:
+            recoger(esperar=True)
+
+    for clave in ('copiados', 'duplicados', 'ilegibles'):
+        metricas.contar(clave, resumen[clave])
+    return resumen
+
+# Etapa de los hilos de copia: ponemos el archivo en su sitio. Si no se
+#   puede, devolvemos None y no se apunta en el manifiesto, así que la
+#   siguiente carga lo vuelve a intentar.
+def colocar(ruta, destino, registro, relativa, estado):
+    try:
+        with metricas.medir('colocacion', registro['tamaño']):
+            colocar_archivo(ruta, destino)
+    except OSError as error:
+        print(f'❌ No se pudo copiar {ruta}: {error}')
+        return None
+    print(f'{os.path.basename(ruta)} ➡ {os.path.basename(os.path.dirname(destino))}')
+    metricas.contar('bytes', registro['tamaño'])
+    return registro, relativa, estado
+
+# Función principal. La ruta del árbol se puede pasar como argumento.
+def main():
+    clasificador.geolocalizador = clasificador.crear_geolocalizador()
+    raiz = sys.argv[1] if len(sys.argv) > 1 else ruta_origen
+
+    catalogo = Catalogo(ruta_catalogo)
+    catalogo.completar_huellas(huellas.huella_rapida)
+    inicio = time.perf_counter()
+    resumen = cargar_arbol(raiz, catalogo)
+    catalogo.cerrar()
+    metricas.contar('archivos', resumen['total'])
+    clasificador.medir_geolocalizador()
+    clasificador.geolocalizador.cache.cerrar()
+
+    duracion = time.perf_counter() - inicio
+    print(f'✅ {resumen["copiados"]} copiados, {resumen["duplicados"]} duplicados o eliminados, '
+          f'{resumen["ilegibles"]} ilegibles, {resumen["sin_cambios"]} sin cambios, en {duracion:.1f} s '
+          f'({resumen["total"] / duracion if duracion else 0:.0f} archivos/s)')
+
+if __name__ == '__main__':
+    metricas.ejecutar('carga_masiva', main)
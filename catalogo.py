@@ -0,0 +1,582 @@
+'''
+Script en Python. Contiene el catálogo del historial de archivos que ya
+hemos copiado a 'BackupFotos' y de los que hemos eliminado nosotros.
+
+Antes el historial vivía en 'duplicados.json' y 'eliminados.json': se
+leían enteros al empezar y se reescribían enteros al terminar 'main()'.
+Si el programa fallaba a mitad, se perdían todos los registros de esa
+ejecución, y el tiempo de carga y guardado crecía con el tamaño de la
+biblioteca, no con el del lote que importábamos.
+
+Ahora el historial se guarda en una base de datos SQLite embebida
+('catalogo.db'):
+- Tabla 'archivos': un registro por archivo copiado, con el hash como
+    clave primaria (indexado), y también índices por ruta, ubicación
+    '(ciudad)(pais)', fecha '(año-mes)' y carpeta '(ciudad)(pais)(año-mes)',
+    para que los scripts de los mapas puedan consultarlo sin recorrer
+    los directorios de 'ruta_final'.
+- Tabla 'eliminados': los hashes de los archivos que HEMOS ELIMINADO
+    NOSOTROS.
+- Tabla 'manifiesto': por cada origen (movil o carpeta del PC), el nombre,
+    tamaño y fecha de modificación de los archivos ya gestionados, para
+    la sincronización incremental.
+- Tabla 'carpetas': el índice de las carpetas '(ciudad)(pais)(año-mes)',
+    con su número de archivos, el centro (la media de las coordenadas de
+    sus fotos) y los límites (latitud y longitud mínimas y máximas). Se
+    actualiza con cada archivo añadido, así que los mapas lo leen de una
+    vez, sin geocodificar los nombres de las carpetas ni recorrerlas.
+    Si falta (catálogo antiguo), se reconstruye a partir de 'archivos'.
+    Cada cambio en una carpeta le pone una versión nueva (la mayor más
+    uno), para que los mapas sepan qué carpetas han cambiado desde la
+    última vez que se generaron.
+- Tabla 'diario': el diario de la importación en curso. Por cada archivo,
+    la última etapa que terminó ('descargado', 'hasheado', 'colocado' o
+    'catalogado') y los datos que ya calculamos (ruta temporal, huella,
+    hashes, ubicación...), en JSON. Se escribe al terminar cada etapa, así
+    que si la importación se corta (movil desconectado, disco lleno), la
+    siguiente sigue desde ahí sin repetir lo ya hecho.
+- Tabla 'verificaciones': la última verificación de cada archivo de
+    'archivos' (ver 'verificador.py'): el tamaño y la fecha de
+    modificación que tenía, cuándo se verificó y si su hash coincidía
+    ('correcto') o no ('corrupto').
+
+Cada inserción se confirma (commit) en el momento, así que un fallo a
+mitad de la importación no pierde lo ya copiado. Para insertar muchos
+registros de golpe usamos 'transaccion()', que los agrupa en una sola.
+
+Cada registro guarda también el tamaño y el hash parcial del archivo
+(ver 'huellas.py'), con un índice sobre los dos, para descartar los
+archivos nuevos sin calcular su hash completo. Los registros antiguos
+sin tamaño (eliminados de 'eliminados.json', o archivos que ya no están
+para completar su huella) no son candidatos de ningún archivo: se
+comprueban sólo por su hash completo, una vez calculado (ver
+'algoritmos_sin_tamaño'). Las fotos guardan además
+su huella visual (ver 'similares.py'), para encontrar las casi iguales;
+'' si no se pudo leer la foto.
+
+El catálogo se puede usar desde varios hilos a la vez (la tubería de
+importación): todas las operaciones pasan por un mismo bloqueo, y con
+'reservar' un hilo se queda con una huella (tamaño y hash parcial)
+mientras copia el archivo, para que otro hilo con un archivo idéntico
+espere y lo vea como duplicado.
+
+Con 'solo_lectura' el catálogo se abre sin poder escribir en él, y sin
+crear la base de datos, el esquema ni las migraciones: es lo que usan
+los mapas para consultarlo mientras una importación lo está escribiendo.
+
+La primera vez que se crea la base de datos se importan automáticamente
+los archivos JSON existentes. Con 'exportar_json' podemos volver a
+generar 'duplicados.json' y 'eliminados.json' a partir del catálogo.
+Ejecutando este script directamente se hace justo eso.
+'''
+
+import os
+import json
+import pathlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+ruta_catalogo = './catalogo.db'
+ruta_duplicados = './duplicados.json'
+ruta_eliminados = './eliminados.json'
+
+columnas = ('hash', 'ruta', 'ubicacion', 'fecha', 'latitud', 'longitud',
+            'tamaño', 'hash_parcial', 'huella_visual')
+
+esquema = '''
+CREATE TABLE IF NOT EXISTS archivos (
+    hash TEXT PRIMARY KEY,
+    ruta TEXT NOT NULL,
+    ubicacion TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    latitud REAL,
+    longitud REAL,
+    carpeta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS eliminados (
+    hash TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS manifiesto (
+    origen TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    tamaño INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    PRIMARY KEY (origen, nombre)
+);
+CREATE TABLE IF NOT EXISTS carpetas (
+    carpeta TEXT PRIMARY KEY,
+    numero INTEGER NOT NULL,
+    con_gps INTEGER NOT NULL,
+    suma_latitud REAL NOT NULL,
+    suma_longitud REAL NOT NULL,
+    latitud_min REAL,
+    latitud_max REAL,
+    longitud_min REAL,
+    longitud_max REAL
+);
+CREATE TABLE IF NOT EXISTS diario (
+    origen TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    tamaño INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    etapa TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (origen, nombre)
+);
+CREATE TABLE IF NOT EXISTS verificaciones (
+    hash TEXT PRIMARY KEY,
+    tamaño INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    fecha REAL NOT NULL,
+    estado TEXT NOT NULL,
+    hash_actual TEXT
+);
+'''
+
+# Columnas añadidas después de crear las tablas. Al abrir un catálogo
+#   antiguo se añaden las que falten.
+columnas_nuevas = {
+    'archivos': [('tamaño', 'INTEGER'), ('hash_parcial', 'TEXT'), ('huella_visual', 'TEXT')],
+    'eliminados': [('tamaño', 'INTEGER'), ('hash_parcial', 'TEXT')],
+    'carpetas': [('version', 'INTEGER')],
+}
+
+indices = '''
+CREATE INDEX IF NOT EXISTS idx_archivos_ruta ON archivos (ruta);
+CREATE INDEX IF NOT EXISTS idx_archivos_ubicacion ON archivos (ubicacion);
+CREATE INDEX IF NOT EXISTS idx_archivos_fecha ON archivos (fecha);
+CREATE INDEX IF NOT EXISTS idx_archivos_carpeta ON archivos (carpeta);
+CREATE INDEX IF NOT EXISTS idx_archivos_huella ON archivos (tamaño, hash_parcial);
+CREATE INDEX IF NOT EXISTS idx_eliminados_huella ON eliminados (tamaño, hash_parcial);
+CREATE INDEX IF NOT EXISTS idx_carpetas_version ON carpetas (version);
+'''
+
+# Leemos el archivo JSON, si existe.
+def cargar_json(ruta):
+    if os.path.exists(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return []
+
+# Guarda los datos en formato JSON.
+def guardar_json(data, ruta):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+class Catalogo:
+    def __init__(self, ruta_catalogo=ruta_catalogo, solo_lectura=False):
+        nueva = not os.path.exists(ruta_catalogo)
+
+        self.ruta_catalogo = ruta_catalogo
+        self.en_transaccion = False
+        self.bloqueo = threading.RLock()
+        self.cambio = threading.Condition(self.bloqueo)
+        # Huellas (tamaño, hash parcial) que algún hilo está copiando ahora.
+        self.en_curso = set()
+
+        if solo_lectura:
+            uri = f'{pathlib.Path(ruta_catalogo).absolute().as_uri()}?mode=ro'
+            self.conexion = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.conexion.row_factory = sqlite3.Row
+            return
+
+        self.conexion = sqlite3.connect(ruta_catalogo, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.executescript(esquema)
+        self.migrar()
+        self.conexion.executescript(indices)
+        self.reconstruir_indice_carpetas(solo_si_falta=True)
+
+        # Importación única de los JSON antiguos al crear la base de datos.
+        if nueva:
+            self.importar_json(ruta_duplicados, ruta_eliminados)
+
+    # Añadimos las columnas nuevas que le falten a un catálogo antiguo.
+    def migrar(self):
+        for tabla, nuevas in columnas_nuevas.items():
+            existentes = {fila['name'] for fila in self.conexion.execute(f'PRAGMA table_info({tabla})')}
+            for nombre, tipo in nuevas:
+                if nombre not in existentes:
+                    self.conexion.execute(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}')
+        self.conexion.commit()
+
+    # Agrupamos varias inserciones en una sola transacción.
+    @contextmanager
+    def transaccion(self):
+        with self.bloqueo:
+            self.en_transaccion = True
+            try:
+                with self.conexion:
+                    yield self
+            finally:
+                self.en_transaccion = False
+
+    # Confirmamos los cambios, salvo que estemos dentro de 'transaccion()'.
+    def confirmar(self):
+        if not self.en_transaccion:
+            self.conexion.commit()
+
+    # Comprobamos si el hash ya está en el historial de copiados.
+    def existe(self, hash_archivo):
+        with self.bloqueo:
+            fila = self.conexion.execute(
+                'SELECT 1 FROM archivos WHERE hash = ?', (hash_archivo,)).fetchone()
+        return fila is not None
+
+    # Comprobamos si el hash es de un archivo que HEMOS ELIMINADO NOSOTROS.
+    def eliminado(self, hash_archivo):
+        with self.bloqueo:
+            fila = self.conexion.execute(
+                'SELECT 1 FROM eliminados WHERE hash = ?', (hash_archivo,)).fetchone()
+        return fila is not None
+
+    # Añadimos un registro nuevo, si su hash no estaba ya en el historial,
+    #   y lo sumamos al índice de su carpeta.
+    def añadir(self, registro):
+        carpeta = nombre_carpeta(registro)
+        with self.bloqueo:
+            cursor = self.conexion.execute(
+                f'INSERT OR IGNORE INTO archivos ({", ".join(columnas)}, carpeta) '
+                f'VALUES ({", ".join("?" * (len(columnas) + 1))})',
+                (*(registro.get(c) for c in columnas), carpeta))
+            nuevo = cursor.rowcount == 1
+            if nuevo:
+                self.sumar_a_carpeta(carpeta, registro.get('latitud'), registro.get('longitud'))
+            self.confirmar()
+        return nuevo
+
+    # Sumamos un archivo al índice de su carpeta. Los archivos sin
+    #   coordenadas sólo cuentan en el número.
+    def sumar_a_carpeta(self, carpeta, lat, lon):
+        con_gps = lat is not None and lon is not None
+        if not con_gps:
+            lat = lon = None
+        self.conexion.execute('''
+            INSERT INTO carpetas (carpeta, numero, con_gps, suma_latitud, suma_longitud,
+                                  latitud_min, latitud_max, longitud_min, longitud_max, version)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, (SELECT coalesce(MAX(version), 0) + 1 FROM carpetas))
+            ON CONFLICT (carpeta) DO UPDATE SET
+                version = excluded.version,
+                numero = numero + 1,
+                con_gps = con_gps + excluded.con_gps,
+                suma_latitud = suma_latitud + excluded.suma_latitud,
+                suma_longitud = suma_longitud + excluded.suma_longitud,
+                latitud_min = min(coalesce(latitud_min, excluded.latitud_min), coalesce(excluded.latitud_min, latitud_min)),
+                latitud_max = max(coalesce(latitud_max, excluded.latitud_max), coalesce(excluded.latitud_max, latitud_max)),
+                longitud_min = min(coalesce(longitud_min, excluded.longitud_min), coalesce(excluded.longitud_min, longitud_min)),
+                longitud_max = max(coalesce(longitud_max, excluded.longitud_max), coalesce(excluded.longitud_max, longitud_max))
+        ''', (carpeta, int(con_gps), lat or 0.0, lon or 0.0, lat, lat, lon, lon))
+
+    # Volvemos a calcular el índice de las carpetas a partir de 'archivos'.
+    #   Con 'solo_si_falta', sólo si está vacío y hay archivos.
+    def reconstruir_indice_carpetas(self, solo_si_falta=False):
+        if solo_si_falta:
+            vacio = self.conexion.execute('SELECT 1 FROM carpetas LIMIT 1').fetchone() is None
+            hay_archivos = self.conexion.execute('SELECT 1 FROM archivos LIMIT 1').fetchone() is not None
+            if not (vacio and hay_archivos):
+                return
+
+        version = self.version_carpetas() + 1
+        self.conexion.execute('DELETE FROM carpetas')
+        self.conexion.execute('''
+            INSERT INTO carpetas (carpeta, numero, con_gps, suma_latitud, suma_longitud,
+                                  latitud_min, latitud_max, longitud_min, longitud_max, version)
+            SELECT carpeta, COUNT(*), COUNT(latitud), coalesce(SUM(latitud), 0), coalesce(SUM(longitud), 0),
+                   MIN(latitud), MAX(latitud), MIN(longitud), MAX(longitud), ?
+            FROM archivos GROUP BY carpeta
+        ''', (version,))
+        self.conexion.commit()
+
+    # Versión del índice de carpetas: la del último cambio en cualquiera.
+    def version_carpetas(self):
+        with self.bloqueo:
+            fila = self.conexion.execute(
+                'SELECT coalesce(MAX(version), 0) AS version FROM carpetas').fetchone()
+        return fila['version']
+
+    # Marcamos un hash como eliminado por nosotros. Si sabemos su tamaño y
+    #   su hash parcial, también los guardamos para el filtro rápido.
+    def añadir_eliminado(self, hash_archivo, tamaño=None, hash_parcial=None):
+        with self.bloqueo:
+            self.conexion.execute(
+                'INSERT OR IGNORE INTO eliminados (hash, tamaño, hash_parcial) VALUES (?, ?, ?)',
+                (hash_archivo, tamaño, hash_parcial))
+            self.confirmar()
+
+    # Hashes del catálogo (copiados y eliminados) que pueden ser el mismo
+    #   archivo que uno con este tamaño y hash parcial. Los registros
+    #   antiguos sin tamaño no salen aquí (ver 'algoritmos_sin_tamaño').
+    def candidatos(self, tamaño, hash_parcial):
+        consulta = '''
+            SELECT hash FROM archivos WHERE tamaño = ? AND hash_parcial = ?
+            UNION
+            SELECT hash FROM eliminados WHERE tamaño = ? AND hash_parcial = ?
+        '''
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                consulta, (tamaño, hash_parcial, tamaño, hash_parcial)).fetchall()
+        return {fila['hash'] for fila in filas}
+
+    # Algoritmos de los hashes de los registros antiguos sin tamaño ni hash
+    #   parcial. Como no pueden ser candidatos por su huella, un archivo
+    #   sólo se compara con ellos por su hash completo en estos algoritmos,
+    #   cuando ya lo tenemos (ver 'huellas.algoritmo_de': los MD5 van sin
+    #   prefijo).
+    def algoritmos_sin_tamaño(self):
+        consulta = '''
+            SELECT DISTINCT CASE WHEN instr(hash, ':') THEN substr(hash, 1, instr(hash, ':') - 1)
+                                 ELSE 'md5' END AS algoritmo
+            FROM (SELECT hash FROM archivos WHERE tamaño IS NULL
+                  UNION ALL
+                  SELECT hash FROM eliminados WHERE tamaño IS NULL)
+        '''
+        with self.bloqueo:
+            filas = self.conexion.execute(consulta).fetchall()
+        return {fila['algoritmo'] for fila in filas}
+
+    # Comprobamos el archivo y, si es nuevo, reservamos su huella para el
+    #   hilo que lo va a copiar. Si otro hilo está copiando un archivo con
+    #   la misma huella, esperamos a que lo registre antes de comprobar.
+    #   Devuelve:
+    #   - 'comprobar': no nos han dado hashes completos y la huella
+    #       coincide con algún candidato; hay que calcularlos y volver a
+    #       llamar con ellos.
+    #   - 'duplicado', 'eliminado' o 'nuevo'.
+    def reservar(self, huella, hashes=()):
+        hashes = list(hashes)
+        with self.cambio:
+            while huella in self.en_curso:
+                self.cambio.wait()
+
+            if not hashes and self.candidatos(*huella):
+                return 'comprobar'
+            if any(self.existe(h) for h in hashes):
+                return 'duplicado'
+            if any(self.eliminado(h) for h in hashes):
+                return 'eliminado'
+
+            self.en_curso.add(huella)
+            return 'nuevo'
+
+    # Liberamos la reserva una vez copiado (y registrado) el archivo.
+    def liberar(self, huella):
+        with self.cambio:
+            self.en_curso.discard(huella)
+            self.cambio.notify_all()
+
+    # Manifiesto de un origen (movil o carpeta del PC): los archivos que ya
+    #   se gestionaron en una sincronización, con su tamaño y fecha de
+    #   modificación de entonces. Diccionario nombre -> (tamaño, mtime).
+    def manifiesto(self, origen):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                'SELECT nombre, tamaño, mtime FROM manifiesto WHERE origen = ?', (origen,)).fetchall()
+        return {fila['nombre']: (fila['tamaño'], fila['mtime']) for fila in filas}
+
+    # Apuntamos en el manifiesto un archivo ya gestionado (copiado,
+    #   duplicado o eliminado).
+    def marcar_sincronizado(self, origen, nombre, tamaño, mtime):
+        with self.bloqueo:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO manifiesto (origen, nombre, tamaño, mtime) VALUES (?, ?, ?, ?)',
+                (origen, nombre, tamaño, mtime))
+            self.confirmar()
+
+    # Diario de la importación de un origen: los archivos que se quedaron
+    #   a medias, con el tamaño y la fecha de modificación que tenían en el
+    #   origen. Diccionario nombre -> {'estado_origen', 'etapa', 'datos'}.
+    def diario(self, origen):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                'SELECT nombre, tamaño, mtime, etapa, datos FROM diario WHERE origen = ?',
+                (origen,)).fetchall()
+        return {
+            fila['nombre']: {
+                'estado_origen': (fila['tamaño'], fila['mtime']),
+                'etapa': fila['etapa'],
+                'datos': json.loads(fila['datos'])
+            }
+            for fila in filas
+        }
+
+    # Apuntamos en el diario la etapa que acaba de terminar un archivo.
+    def anotar(self, origen, nombre, estado_origen, etapa, datos):
+        with self.bloqueo:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO diario (origen, nombre, tamaño, mtime, etapa, datos) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (origen, nombre, *estado_origen, etapa, json.dumps(datos, ensure_ascii=False)))
+            self.confirmar()
+
+    # Al terminar la importación borramos el diario del origen, salvo los
+    #   archivos que ya están en su carpeta final pero sin registrar.
+    def limpiar_diario(self, origen):
+        with self.bloqueo:
+            self.conexion.execute(
+                "DELETE FROM diario WHERE origen = ? AND etapa != 'colocado'", (origen,))
+            self.confirmar()
+
+    # Completamos el tamaño y el hash parcial de los registros antiguos
+    #   cuyo archivo sigue en su sitio. Sólo lee los que les falta.
+    def completar_huellas(self, calcular_huella):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                'SELECT hash, ruta FROM archivos WHERE tamaño IS NULL').fetchall()
+
+        for fila in filas:
+            if not os.path.exists(fila['ruta']):
+                continue
+            tamaño, hash_parcial = calcular_huella(fila['ruta'])
+            with self.bloqueo:
+                self.conexion.execute(
+                    'UPDATE archivos SET tamaño = ?, hash_parcial = ? WHERE hash = ?',
+                    (tamaño, hash_parcial, fila['hash']))
+                self.confirmar()
+
+    # Completamos la huella visual de las fotos que no la tienen (las
+    #   importadas antes de activar la búsqueda de parecidas).
+    #   'calcular_huellas' recibe una lista de rutas y devuelve sus
+    #   huellas en hexadecimal ('' si no se pudo leer la foto).
+    def completar_huellas_visuales(self, calcular_huellas):
+        with self.bloqueo:
+            filas = self.conexion.execute('''
+                SELECT hash, ruta FROM archivos
+                WHERE huella_visual IS NULL AND (lower(ruta) LIKE '%.jpg' OR lower(ruta) LIKE '%.jpeg')
+            ''').fetchall()
+        filas = [fila for fila in filas if os.path.exists(fila['ruta'])]
+        if not filas:
+            return 0
+
+        huellas = calcular_huellas([fila['ruta'] for fila in filas])
+        with self.transaccion():
+            self.conexion.executemany(
+                'UPDATE archivos SET huella_visual = ? WHERE hash = ?',
+                [(huella, fila['hash']) for fila, huella in zip(filas, huellas)])
+        return len(filas)
+
+    # Huellas visuales del catálogo, como lista de (hash, huella en hexadecimal).
+    def huellas_visuales(self):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                "SELECT hash, huella_visual FROM archivos WHERE huella_visual != ''").fetchall()
+        return [(fila['hash'], fila['huella_visual']) for fila in filas]
+
+    # Última verificación de cada archivo. Diccionario hash ->
+    #   {'tamaño', 'mtime', 'fecha', 'estado', 'hash_actual'}.
+    def verificaciones(self):
+        with self.bloqueo:
+            filas = self.conexion.execute('SELECT * FROM verificaciones').fetchall()
+        return {fila['hash']: dict(fila) for fila in filas}
+
+    # Guardamos de una vez el resultado de varias verificaciones, como
+    #   lista de (hash, tamaño, mtime, fecha, estado, hash_actual).
+    def anotar_verificaciones(self, verificaciones):
+        with self.transaccion():
+            self.conexion.executemany(
+                'INSERT OR REPLACE INTO verificaciones (hash, tamaño, mtime, fecha, estado, hash_actual) '
+                'VALUES (?, ?, ?, ?, ?, ?)', verificaciones)
+
+    # Devuelve los registros de la consulta como diccionarios, igual
+    #   que los teníamos en 'duplicados.json'.
+    def consultar(self, donde='', parametros=()):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                f'SELECT {", ".join(columnas)} FROM archivos {donde} ORDER BY rowid',
+                parametros).fetchall()
+        return [dict(fila) for fila in filas]
+
+    @property
+    def registros(self):
+        return self.consultar()
+
+    @property
+    def eliminados(self):
+        with self.bloqueo:
+            filas = self.conexion.execute('SELECT hash FROM eliminados ORDER BY hash').fetchall()
+        return [fila['hash'] for fila in filas]
+
+    def buscar_hash(self, hash_archivo):
+        registros = self.consultar('WHERE hash = ?', (hash_archivo,))
+        return registros[0] if registros else None
+
+    def buscar_ruta(self, ruta):
+        registros = self.consultar('WHERE ruta = ?', (ruta,))
+        return registros[0] if registros else None
+
+    def buscar_ubicacion(self, ubicacion):
+        return self.consultar('WHERE ubicacion = ?', (ubicacion,))
+
+    def buscar_fecha(self, fecha):
+        return self.consultar('WHERE fecha = ?', (fecha,))
+
+    def buscar_carpeta(self, carpeta):
+        return self.consultar('WHERE carpeta = ?', (carpeta,))
+
+    # Devuelve un diccionario '(ciudad)(pais)(año-mes)' -> número de archivos.
+    def carpetas(self):
+        with self.bloqueo:
+            filas = self.conexion.execute(
+                'SELECT carpeta, numero FROM carpetas ORDER BY carpeta').fetchall()
+        return {fila['carpeta']: fila['numero'] for fila in filas}
+
+    # Índice de las carpetas para los mapas. Diccionario
+    #   '(ciudad)(pais)(año-mes)' -> {'numero', 'latitud', 'longitud',
+    #   'limites', 'version'}, con el centro de sus fotos, los límites
+    #   [[lat_min, lon_min], [lat_max, lon_max]] y la versión de su último
+    #   cambio. Las carpetas sin ninguna foto con coordenadas tienen el
+    #   centro y los límites a None.
+    def indice_carpetas(self):
+        with self.bloqueo:
+            filas = self.conexion.execute('SELECT * FROM carpetas ORDER BY carpeta').fetchall()
+
+        indice = {}
+        for fila in filas:
+            con_gps = fila['con_gps'] > 0
+            indice[fila['carpeta']] = {
+                'numero': fila['numero'],
+                'latitud': fila['suma_latitud'] / fila['con_gps'] if con_gps else None,
+                'longitud': fila['suma_longitud'] / fila['con_gps'] if con_gps else None,
+                'limites': [[fila['latitud_min'], fila['longitud_min']],
+                            [fila['latitud_max'], fila['longitud_max']]] if con_gps else None,
+                'version': fila['version'] or 0
+            }
+        return indice
+
+    # Importamos los registros de los JSON antiguos en una sola transacción.
+    def importar_json(self, ruta_duplicados, ruta_eliminados):
+        with self.transaccion():
+            for registro in cargar_json(ruta_duplicados):
+                self.añadir(registro)
+            for hash_archivo in cargar_json(ruta_eliminados):
+                self.añadir_eliminado(hash_archivo)
+
+    # Volvemos a generar los JSON a partir del catálogo.
+    def exportar_json(self, ruta_duplicados, ruta_eliminados):
+        guardar_json(self.registros, ruta_duplicados)
+        guardar_json(self.eliminados, ruta_eliminados)
+
+    # Los registros ya están guardados; sólo confirmamos lo pendiente.
+    def guardar(self):
+        with self.bloqueo:
+            self.conexion.commit()
+
+    def cerrar(self):
+        with self.bloqueo:
+            self.conexion.commit()
+            self.conexion.close()
+
+# El nombre de la carpeta de destino es '(ciudad)(pais)(año-mes)'.
+def nombre_carpeta(registro):
+    return f"{registro['ubicacion']}{registro['fecha']}"
+
+# Función principal: exporta el catálogo a los JSON de siempre.
+def main():
+    catalogo = Catalogo(ruta_catalogo)
+    catalogo.exportar_json(ruta_duplicados, ruta_eliminados)
+    catalogo.cerrar()
+    print(f'✅ Catálogo exportado a {ruta_duplicados} y {ruta_eliminados}')
+
+if __name__ == '__main__':
+    main()
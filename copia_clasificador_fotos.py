@@ -7,85 +7,180 @@ nosotros usando hashes, y organiza los archivos por ubicación GPS y fecha.
 En la función principal 'main', tenemos el siguiente bloque de código
 que empieza con un bucle for, y es el encargado de gestionar todos los
 archivos seleccionados, ya sea desde el movil o del Pc.
+Con 'modo_incremental', antes de nada nos saltamos los archivos que ya
+se gestionaron en una ejecución anterior y no han cambiado (mismo nombre,
+tamaño y fecha de modificación), sin descargarlos ni calcular su hash.
 1º Comprobamos que el archivo sea una imagen o un video.
 2º Creamos las rutas de origen del archivo (movil o pc), y la ruta 
     temporal (pc).
 3º Descargamos el archivo desde el movil o lo copiamos desde el pc a
-    la ruta temporal.
+    la ruta temporal. Los del movil se descargan todos por lotes con un
+    solo proceso 'adb' (ver 'transporte_adb.py'), y cada uno entra en la
+    tubería en cuanto llega.
 4º Si el archivo es una imagen:
     - Obtenemos los datos del gps y la fecha a través de los metadatos.
     - Obtenemos la ubicación 'ciudad_pais' de los datos gps.
     - Convertimos la fecha en un string con el formato 'año_mes'
     Si el archivo es un video:
-    - Sólamente se puede extraer la fecha del video, pero además si es
-        desde el movil, si la obtendremos verdadera, pero desde el pc puede
-        ser la fecha al haberlo copiado o movido, así que es mejor no
-        obtenerla si es un archivo desde el pc.
+    - Obtenemos la fecha de grabación y los datos del gps de las cajas
+        del MP4 (ver 'lector_mp4.py'), sin leer el video en sí, y la
+        ubicación igual que en las imágenes.
 5º Creamos la carpeta de destino a través de las variables de ubicación
     '(ciudad)(pais)' y de la fecha '(año_mes)'.
 6º Comprobamos que el archivo que se encuentra en la carpeta temporal y 
     que estamos gestionando, no tiene su hash-mh5, ni en el historial
     de existentes, con lo cual estaríamos duplicándolo, ni en el eliminados,
     que serán los que hallamos borrado nosotros porque no nos interesa.
+    La comprobación es por niveles (ver 'huellas.py'): primero el tamaño
+    y un hash parcial, y el hash completo sólo si coinciden con alguno.
     - Si no esta ni duplicado y eliminado, se copia.
-
-Una vez finalizado el bucle, se actualiza los archivos .json de duplicados
-y eliminados, es decir, se actualizan las listas.
+    Con 'detectar_similares' buscamos además fotos casi iguales (ráfagas,
+    copias recomprimidas por WhatsApp o reducidas) por su huella visual
+    (ver 'similares.py'): las que están a 'distancia_saltar' o menos de
+    una foto ya copiada no se copian, y las que están a
+    'distancia_informar' o menos se copian pero se apuntan en
+    'ruta_similares', junto a la foto a la que se parecen.
+
+Estos pasos se ejecutan como una tubería (ver 'pipeline.py'): mientras
+un archivo se descarga, otro se está leyendo y otro se está copiando.
+Las etapas son transferencia (3º), metadatos (4º), hash y colocación
+(5º y 6º), cada una con su número de hilos en 'trabajadores'. La
+colocación es la única que escribe en el catálogo, y al terminar con
+cada archivo borra su copia temporal.
+
+Cada archivo copiado se registra en el momento en el catálogo SQLite
+('catalogo.db'), así que si el programa falla a mitad no se pierde lo
+ya copiado.
+Además, cada archivo apunta en el diario del catálogo la última etapa
+que ha terminado: descargado, hasheado, colocado (ya en su carpeta
+final) y catalogado. Si la importación se corta a mitad (movil
+desconectado, disco lleno...), la siguiente ejecución sigue cada archivo
+desde donde se quedó: reutiliza la copia temporal si su tamaño y su
+hash parcial siguen siendo los mismos, y registra los que ya estaban
+colocados sin volver a copiarlos.
 Por último se borra el directorio temporal con todos sus archivos.
+
+Con 'modo_copia_directa' no se usa la carpeta temporal: los archivos del
+PC se leen en su sitio y se enlazan o copian una sola vez a su carpeta
+final, y los del movil se descargan a 'ruta_final/.parciales' y después
+sólo se renombran (ver 'copia_directa.py').
+
+Para cargar árboles de carpetas enteros (móviles antiguos, discos), con
+sus subcarpetas y en varios procesos, está 'carga_masiva.py'.
+
+Al terminar se muestra un resumen con el tiempo, los archivos y los MB/s
+de cada etapa (listado, transferencia, exif, geocodificacion, hash,
+deduplicado, colocacion y registro), los aciertos de las cachés y el
+rendimiento total, y se guarda en 'metricas.json' (ver 'metricas.py').
+Con '--perfil' se ejecuta además con 'cProfile'.
 '''
 
-import subprocess # Ejecuta comandos externos como 'adb'.
 import os # Gestiona rutas y archivos.
+import time # Mide lo que tarda la descarga del movil.
+import threading # Protege las rutas de destino elegidas por los hilos de colocación.
 import shutil # Copia y elimina archivos.
-import hashlib # Calcula hashes MD5 para detectar duplicados o eliminados.
-import json # Carga y guarda datos en formato JSON.
+import metricas # Tiempos, contadores y perfil de cada etapa.
+import huellas # Hashes por niveles (tamaño, parcial y completo) para detectar duplicados o eliminados.
+import similares # Huella visual para detectar fotos casi iguales.
 from PIL import Image # Abre imágenes y extrae metadatos EXIF.
+from lector_exif import leer_exif # Lee los metadatos EXIF sólo de la cabecera del JPEG.
+from lector_mp4 import leer_mp4 # Lee la fecha y el GPS de los videos MP4.
 from datetime import datetime # Maneja fechas.
-from geopy.geocoders import Nominatim # Convierte coordenadas GPS en nombres de lugares.
-
-ruta_movil = '\\sdcard\\DCIM\\Camera'
+from functools import partial # Fija parámetros de las funciones de cada etapa.
+from geocodificador import Geocodificador # Convierte coordenadas GPS en nombres de lugares (con caché).
+from nomenclator import Nomenclator # Nomenclátor local para geocodificar sin conexión.
+from copia_directa import colocar_archivo, ruta_libre # Copia sin carpeta temporal, y nombres sin pisar otros archivos.
+from transporte_adb import TransporteAdb # Descargas del movil por lotes.
+from catalogo import Catalogo, cargar_json, guardar_json # Catálogo SQLite del historial de duplicados y eliminados.
+from pipeline import Etapa, ejecutar_pipeline # Etapas de la importación en paralelo.
+
+ruta_movil = '/sdcard/DCIM/Camera'
 ruta_pc = 'C:\\Movil_Jesus_A33\\Camera'
 ruta_temporal = 'E:\\FotosTemp'
 ruta_final = 'E:\\BackupFotos'
-ruta_adb = 'C:\\adb\\platform-tools\\adb'
+ruta_adb = 'C:\\adb\\platform-tools\\adb' # O [sys.executable, 'pruebas/adb_falso.py'] para probar sin movil.
 ruta_historial = './historial.json'
-ruta_duplicados = './duplicados.json'
-ruta_eliminados = './eliminados.json'
+ruta_catalogo = './catalogo.db'
+
+# Número de hilos de cada etapa de la importación, y tamaño máximo de las
+#   colas entre etapas (archivos en espera en la carpeta temporal).
+trabajadores = {
+    'transferencia': 2,
+    'metadatos': 2,
+    'hash': 2,
+    'colocacion': 1
+}
+tamaño_cola = 8
+
+# Geocodificación sin conexión: nomenclátor local con el formato de GeoNames
+#   y TSV con los nombres de los países. Si 'usar_nominatim' es False, no
+#   se hace ninguna consulta por la red (lo que no esté en el nomenclátor
+#   queda como '(Sin_GPS)').
+ruta_nomenclator = None # Por ejemplo './pruebas/datos/nomenclator_prueba.tsv'
+ruta_paises = None # Por ejemplo './pruebas/datos/paises.tsv'
+usar_nominatim = True
+
+# Copia directa: sin pasar por 'ruta_temporal', cada archivo se escribe
+#   una sola vez (o ninguna, si ya está en el catálogo). Ver 'copia_directa.py'.
+modo_copia_directa = False
+
+# Descarga del movil: 'tar' (un solo 'adb exec-out' por lote) o 'pull' (un
+#   'adb pull' con varios archivos por lote).
+modo_transporte_adb = 'tar'
+
+# Sincronización incremental: sólo se gestionan los archivos nuevos o que
+#   han cambiado (tamaño o fecha de modificación) desde la última vez, según
+#   el manifiesto de cada origen guardado en el catálogo.
+modo_incremental = True
+
+# Fotos parecidas: distancias en bits entre las huellas visuales (de 0 a
+#   64). Con 'distancia_saltar' a None no se salta ninguna, sólo se informa.
+detectar_similares = False
+distancia_saltar = 3
+distancia_informar = 10
+ruta_similares = './similares.json'
 
 # Inicializamos el servicio de Geolocalizador para convertir coordenadas
-#   GPS en nombres de lugares.
-geolocalizador = Nominatim(user_agent='clasificador_fotos')
+#   GPS en nombres de lugares. Las respuestas se guardan en la caché
+#   compartida, y las consultas a Nominatim se hacen de una en una.
+#   Se crea en 'main()', una vez configuradas las rutas.
+geolocalizador = None
+
+# Índice de las huellas visuales del catálogo, y fotos parecidas
+#   encontradas en esta importación. Se crean en 'main()'.
+indice_similares = None
+informe_similares = []
+
+# Algoritmos de los registros antiguos del catálogo sin tamaño (ver
+#   'Catalogo.algoritmos_sin_tamaño'). Se leen en 'main()'.
+algoritmos_antiguos = set()
+
+# Rutas de destino elegidas por los archivos que se están colocando, para
+#   que dos archivos distintos con el mismo nombre no elijan la misma.
+rutas_reservadas = set()
+bloqueo_rutas = threading.Lock()
+
+# Crea el geocodificador, con el nomenclátor local si lo tenemos.
+def crear_geolocalizador():
+    nomenclator = Nomenclator(ruta_nomenclator, ruta_paises) if ruta_nomenclator else None
+    return Geocodificador(user_agent='clasificador_fotos',
+                          nomenclator=nomenclator,
+                          usar_red=usar_nominatim)
+
+# Pasamos a las métricas los aciertos de la caché y del nomenclátor, y
+#   las consultas a Nominatim.
+def medir_geolocalizador():
+    metricas.cache('geocodificacion', geolocalizador.cache.aciertos, geolocalizador.cache.fallos)
+    if geolocalizador.nomenclator is not None:
+        metricas.cache('nomenclator', geolocalizador.aciertos_nomenclator, geolocalizador.fallos_nomenclator)
+    metricas.contar('consultas_nominatim', geolocalizador.consultas_red)
+    metricas.contar('consultas_coalescidas', geolocalizador.coalescidas)
 
 # Convierte coordenadas GPS en formato º, m y s, a grados decimales.
 def convertir_a_grados(valor):
     d, m, s = valor
     return d + m / 60 + s / 3600
 
-# Leemos el archivo JSON, si existe.
-def cargar_json(ruta):
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-# Añadimos un hash a la lista de duplicados si no esta ya presente.
-def añadir_hash(hash_nuevo, lista_hashes):
-    if any(r['hash'] == hash_nuevo for r in lista_hashes):
-        return False
-    
-    else:
-        return True
-
-# Comprobamos que un hash no esta en la lista de los archivos que
-#   HEMOS ELIMINADO NOSOTROS.
-def añadir_hash_eliminado(has_nuevo, lista_hashes):
-    lista_hashes.append(has_nuevo)
-
-# Guarda los datos en formato JSON.
-def guardar_json(data, ruta):
-    with open(ruta, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
 '''
 Extraemos los metadatos EXIF de la fecha original y de las coordenadas
 GPS, y devolvemos ambos datos.
@@ -98,8 +193,18 @@ Dentro de GPSInfo, los sub_IDs relevantes son:
 3: 'GPSLongitudeRef' - Este o West (Oeste)
 4: 'GPSLongitude'
 29: 'GPSDateStamp' (fecha sin hora)
+
+Los leemos con 'lector_exif.py', que sólo lee la cabecera del archivo
+(el segmento APP1), y si su estructura no se entiende, con PIL como antes.
 '''
 def obtener_datos_exif(imagen_path):
+    try:
+        return leer_exif(imagen_path)
+    except Exception:
+        return obtener_datos_exif_pil(imagen_path)
+
+# Lectura de los metadatos EXIF con PIL, abriendo la imagen completa.
+def obtener_datos_exif_pil(imagen_path):
     try:
         imagen = Image.open(imagen_path)
         exif_data = imagen._getexif()
@@ -133,8 +238,11 @@ def obtener_datos_exif(imagen_path):
 Conversión de coordenadas a ubicación.
 1º Convertimos latitud y longitud a grados decimales.
 2º Ajustamos el signo según el hemisferio.
-3º Usamos 'geopy' para obtener ciudad y país.
-4º Devolvemos una cadena como 'Madrid_España'.
+3º Buscamos la ciudad y el país en el nomenclátor local, si lo tenemos
+    (modo sin conexión), y si no preguntamos a Nominatim a través de la
+    caché de 'geocodificador.py' (las fotos de la misma zona no repiten
+    consulta).
+4º Devolvemos una cadena como '(Madrid)(España)'.
 '''
 def obtener_ubicación(gps_info):
     try:
@@ -146,135 +254,497 @@ def obtener_ubicación(gps_info):
         if gps_info['GPSLongitudeRef'] != 'E':
             lon = -lon
 
-        ubicacion = geolocalizador.reverse((lat, lon), language='es')
+        ubicacion = geolocalizador.ubicacion(lat, lon)
 
         if ubicacion:
-            partes = ubicacion.address.split(', ')
-            ciudad = f'({partes[-4]})' # El nombre de la ciudad tendrá el será (ciudad)
-            pais = f'({partes[-1]})' # El nombre del país será (pais)
-            return f'{ciudad}{pais}', lat, lon
+            return ubicacion, lat, lon
         
     except:
         pass
 
-    return 'Sin_GPS'
+    return '(Sin_GPS)', None, None
 
-# Usamos 'adb' para ejecutar 'stat' y obtener la fecha de creación del video.
-def obtener_fecha_video(ruta_archivo, nombre_archivo):
+# Obtenemos la fecha de grabación y los datos del gps de un video, con
+#   la misma forma que 'obtener_datos_exif' (ver 'lector_mp4.py').
+def obtener_datos_video(ruta_video):
     try:
-        resultado = subprocess.run(
-            [ruta_adb, 'shell', f'stat -c &y {ruta_archivo}/{nombre_archivo}'],
-            capture_output=True, text=True
-        )
-        fecha_raw = resultado.stdout.strip()
-        fecha_obj = datetime.strptime(fecha_raw[:10], '%Y-%m-%d')
-        return fecha_obj
-    except:
-        return None
+        return leer_mp4(ruta_video)
+    except Exception as e:
+        print(f'Error al leer los metadatos del video: {e}')
+        return {}, None
     
 # Comprobar archivos duplicados a través de su hash.
 def calcular_hash_md5(ruta_archivo):
     try:
-        hash_md5 = hashlib.md5()
-        with open(ruta_archivo, 'rb') as f:
-            for bloque in iter(lambda: f.read(4096), b''):
-                hash_md5.update(bloque)
-        return hash_md5.hexdigest()
+        return huellas.hash_completo(ruta_archivo, 'md5')
     except:
         return None
 
-# Ejecuta 'adb devices' y verifica si hay algún dispositivo conectado.
-def hay_dispositivo_adb():
-    dispositivos = subprocess.run([ruta_adb, 'devices'], capture_output=True, text=True)
-    lineas = dispositivos.stdout.strip().split('\n')
-    # Ignora la cabecera y busca líneas con 'device' al final.
-    dispositivos = [l for l in lineas[1:] if l.strip().endswith('device')]
-    return len(dispositivos) > 0
+# Calculamos los hashes completos necesarios para comparar el archivo con
+#   los candidatos del catálogo: el del algoritmo configurado, y además el
+#   de cada algoritmo de los candidatos (por ejemplo los MD5 antiguos).
+#   'conocido' es un hash ya calculado durante la descarga, y 'algoritmos'
+#   otros algoritmos que hagan falta (los de los registros sin tamaño).
+def calcular_hashes(ruta_archivo, candidatos, conocido=None, algoritmos=()):
+    hashes = {}
+    if conocido:
+        hashes[huellas.algoritmo_de(conocido)] = conocido
+
+    for algoritmo in {huellas.algoritmo_hash, *algoritmos} | {huellas.algoritmo_de(c) for c in candidatos}:
+        if algoritmo not in hashes:
+            hashes[algoritmo] = huellas.hash_completo(ruta_archivo, algoritmo)
+
+    return hashes
+
+# Datos de cada archivo que guardamos en el diario de la importación.
+claves_diario = ('ruta_local', 'hash', 'tamaño', 'hash_parcial', 'hashes', 'ubicacion',
+                 'latitud', 'longitud', 'fecha', 'nombre_carpeta', 'ruta_destino', 'huella_visual')
+
+# Apuntamos en el diario la etapa que acaba de terminar el archivo.
+def anotar(datos, etapa, catalogo):
+    datos['etapa'] = etapa
+    catalogo.anotar(datos['origen'], datos['archivo'], datos['estado_origen'], etapa,
+                    {clave: datos[clave] for clave in claves_diario if clave in datos})
+
+# Comprobamos que un archivo sigue en 'ruta' con el mismo tamaño y hash parcial.
+def misma_huella(ruta, tamaño, hash_parcial):
+    return os.path.exists(ruta) and huellas.huella_rapida(ruta) == (tamaño, hash_parcial)
+
+# Recuperamos del diario lo que ya se hizo con un archivo en una
+#   importación que se cortó, si el archivo no ha cambiado en el origen:
+#   - 'colocado': si sigue en su carpeta final, sólo falta registrarlo.
+#   - 'descargado' o 'hasheado': si la copia temporal sigue igual, no se
+#       vuelve a descargar (ni a calcular su hash).
+#   Devuelve True si el archivo se reanuda.
+def reanudar(datos, entrada):
+    if not entrada or entrada['estado_origen'] != tuple(datos['estado_origen']):
+        return False
 
-# Función principal.
-def main():
-    # Crear carpeta temporal.
-    os.makedirs(ruta_temporal, exist_ok=True)
+    anotado = entrada['datos']
+    tamaño, hash_parcial = anotado.get('tamaño'), anotado.get('hash_parcial')
+    if entrada['etapa'] == 'colocado' and misma_huella(anotado['ruta_destino'], tamaño, hash_parcial):
+        datos.update(anotado)
+        datos['descargado'] = True
+        datos['etapa'] = 'colocado'
+        return True
 
-    # Cargamos el historial de duplicados y eliminados.
-    duplicados = cargar_json(ruta_duplicados)
-    eliminados = cargar_json(ruta_eliminados)
+    if anotado.get('ruta_local') == datos['ruta_local'] and misma_huella(datos['ruta_local'], tamaño, hash_parcial):
+        anotado.pop('ruta_destino', None)
+        datos.update(anotado)
+        datos['descargado'] = True
+        datos['etapa'] = 'descargado' if entrada['etapa'] == 'descargado' else 'hasheado'
+        return True
 
-    # Listar archivos desde el movil o pc.    
-    if hay_dispositivo_adb():
-        ruta_archivos = ruta_movil
-        resultado = subprocess.run([ruta_adb, 'shell', f'ls {ruta_archivos}'],
-                                capture_output=True,
-                                text=True)
-        archivos = resultado.stdout.strip().split('\n')
-    else:    
-        print('💻 No se puedo desde el movil, probar desde el PC...')
-        ruta_archivos = ruta_pc
-        archivos = os.listdir(ruta_archivos)
-
-    # Descargar, comprobar duplicados y clasificar.
-    for archivo in archivos[:15]:
-        if archivo.lower().endswith(('.jpg', '.jpeg', '.mp4')):
-            ruta_origen = f'{ruta_archivos}/{archivo}'
-            ruta_local = os.path.join(ruta_temporal, archivo)
-
-            # Descargar archivo desde el movil o copiarlo desde el pc al directorio temporal.
-            if hay_dispositivo_adb():
-                subprocess.run([ruta_adb, 'pull', ruta_origen, ruta_local])
-
-            else:
-                if os.path.exists(ruta_origen):
-                    shutil.copy2(ruta_origen, ruta_local)
-
-            # Obtención de los metadatos del gps y fecha.
-            if archivo.lower().endswith(('.jpg', '.jpeg')):
-                gps_info, fecha = obtener_datos_exif(ruta_local)
-                ubicacion, lat, lon = obtener_ubicación(gps_info) if gps_info else '(Sin_GPS)'
-                # El string de la fecha será (año-mes)
-                fecha_str = fecha.strftime('(%Y-%m)') if fecha else '(Sin_Fecha)'
-
-            else: # .mp4
-                fecha = obtener_fecha_video(archivo)
-                ubicacion = '(Sin_GPS)'
-                # El string de la fecha será (año-mes)
-                fecha_str = fecha.strftime('(%Y-%m)') if fecha else '(Sin_Fecha)'
-
-            # Crear carpeta destino.            
-            nombre_carpeta = f'{ubicacion}{fecha_str}'
-            ruta_destino = os.path.join(ruta_final, nombre_carpeta)
-            os.makedirs(ruta_destino, exist_ok=True)
-
-            # Función archivo duplicado.
-            hash_archivo = calcular_hash_md5(ruta_local)
-            if añadir_hash(hash_archivo, duplicados):
-                # Comprobamos que el archivo NO este elimnado por nosotros.
-                if hash_archivo not in eliminados:
-                    # Copiar archivo del directorio temporal al definitivo.
-                    shutil.copy2(ruta_local, ruta_destino)
-                    # Añadimos los datos al historial.
-                    duplicados.append({
-                        'hash': hash_archivo,
-                        'ruta': os.path.join(ruta_destino, archivo),
-                        'ubicacion': ubicacion,
-                        'fecha': fecha_str,
-                        'latitud': float(lat),
-                        'longitud': float(lon)
-                    })
-                    print(f'{archivo} ➡ {nombre_carpeta}')
+    return False
+
+# Listamos una carpeta del PC con 'os.scandir', que nos da el tamaño y la
+#   fecha de modificación en la misma llamada. Diccionario
+#   nombre -> (tamaño, mtime).
+def listar_local(ruta):
+    listado = {}
+    with os.scandir(ruta) as entradas:
+        for entrada in entradas:
+            if entrada.is_file():
+                info = entrada.stat()
+                listado[entrada.name] = (info.st_size, int(info.st_mtime))
+    return listado
+
+# Descargamos del movil todos los archivos de golpe (por lotes), y los
+#   vamos entregando a la tubería según llegan, con su hash completo ya
+#   calculado durante la descarga. Los que ya se descargaron en una
+#   importación anterior se entregan primero, sin descargarlos.
+def descargar_desde_movil(transporte, elementos, carpeta, catalogo):
+    por_nombre = {}
+    for datos in elementos:
+        if datos.get('descargado'):
+            yield datos
+        else:
+            por_nombre[datos['archivo']] = datos
+
+    def progreso(nombre, numero, total, tamaño):
+        print(f'⬇ {numero}/{total} {nombre} ({tamaño / 1024 / 1024:.1f} MB)')
+
+    # El tiempo de cada descarga es el que pasa hasta que llega el
+    #   archivo, sin contar la espera de la tubería.
+    inicio = time.perf_counter()
+    for nombre, ruta_local, hash_archivo in transporte.traer(
+            ruta_movil, list(por_nombre), carpeta, progreso=progreso):
+        datos = por_nombre[nombre]
+        datos['ruta_local'] = ruta_local
+        datos['descargado'] = True
+        if hash_archivo:
+            datos['hash'] = hash_archivo
+        datos['tamaño'], datos['hash_parcial'] = huellas.huella_rapida(ruta_local)
+        anotar(datos, 'descargado', catalogo)
+        metricas.anotar('transferencia', time.perf_counter() - inicio, datos['tamaño'])
+        yield datos
+        inicio = time.perf_counter()
+
+# Etapa 1 - Copiar el archivo desde el pc al directorio temporal. Los del
+#   movil ya llegan descargados, y en la copia directa desde el PC no se
+#   transfiere nada.
+def transferir(datos, catalogo):
+    if datos.get('descargado') or not datos['temporal']:
+        return datos
+
+    if os.path.exists(datos['ruta_origen']):
+        with metricas.medir('transferencia', datos['estado_origen'][0]):
+            shutil.copy2(datos['ruta_origen'], datos['ruta_local'])
+        datos['tamaño'], datos['hash_parcial'] = huellas.huella_rapida(datos['ruta_local'])
+        anotar(datos, 'descargado', catalogo)
+
+    return datos
+
+# Etapa 2 - Obtención de los metadatos del gps y fecha, y de la carpeta destino.
+#   Los archivos reanudados desde el diario ya la tienen.
+def leer_metadatos(datos):
+    if 'nombre_carpeta' in datos:
+        return datos
+
+    archivo = datos['archivo']
+    with metricas.medir('exif'):
+        if archivo.lower().endswith(('.jpg', '.jpeg')):
+            gps_info, fecha = obtener_datos_exif(datos['ruta_local'])
+        else: # .mp4
+            gps_info, fecha = obtener_datos_video(datos['ruta_local'])
+
+    if gps_info:
+        with metricas.medir('geocodificacion'):
+            ubicacion, lat, lon = obtener_ubicación(gps_info)
+    else:
+        ubicacion, lat, lon = '(Sin_GPS)', None, None
+
+    # El string de la fecha será (año-mes)
+    fecha_str = fecha.strftime('(%Y-%m)') if fecha else '(Sin_Fecha)'
+
+    datos.update({
+        'ubicacion': ubicacion,
+        'latitud': lat,
+        'longitud': lon,
+        'fecha': fecha_str,
+        'nombre_carpeta': f'{ubicacion}{fecha_str}'
+    })
+    return datos
+
+# Etapa 3 - Huella del archivo para detectar duplicados: tamaño y hash
+#   parcial, y el hash completo sólo si coinciden con algún archivo del
+#   catálogo (o si ya lo calculamos durante la descarga). Si buscamos
+#   fotos parecidas, también su huella visual.
+def hashear(datos, catalogo):
+    if (detectar_similares and 'huella_visual' not in datos and datos.get('etapa') != 'colocado'
+            and datos['archivo'].lower().endswith(('.jpg', '.jpeg'))):
+        with metricas.medir('huella_visual'):
+            datos['huella_visual'] = similares.huella_texto(datos['ruta_local'])
+
+    if datos.get('etapa') in ('hasheado', 'colocado'):
+        return datos
+
+    inicio = time.perf_counter()
+    if 'hash_parcial' not in datos:
+        datos['tamaño'], datos['hash_parcial'] = huellas.huella_rapida(datos['ruta_local'])
+    candidatos = catalogo.candidatos(datos['tamaño'], datos['hash_parcial'])
+
+    if candidatos or 'hash' in datos:
+        datos['hashes'] = calcular_hashes(datos['ruta_local'], candidatos, datos.get('hash'))
+    # Los bytes son sólo los de los archivos que se leen enteros.
+    metricas.anotar('hash', time.perf_counter() - inicio, datos['tamaño'] if candidatos else 0)
+    anotar(datos, 'hasheado', catalogo)
+    return datos
+
+# Etapa 4 - Comprobar duplicados/eliminados, copiar a la carpeta destino y
+#   registrar en el catálogo. La comprobación y la reserva del hash se
+#   hacen a la vez en el catálogo, así que dos archivos idénticos que
+#   llegan a la vez no se copian los dos.
+def colocar(datos, catalogo):
+    archivo = datos['archivo']
+    # Ya se copió en una importación anterior, pero no llegó a registrarse.
+    if datos.get('etapa') == 'colocado':
+        registrar(datos, catalogo)
+        print(f'{archivo} ➡ {datos["nombre_carpeta"]} (reanudado)')
+        metricas.contar('reanudados')
+        return datos
+
+    huella = (datos['tamaño'], datos['hash_parcial'])
+    with metricas.medir('deduplicado'):
+        estado = catalogo.reservar(huella, datos.get('hashes', {}).values())
+
+        # Otro archivo con la misma huella se ha registrado mientras tanto.
+        if estado == 'comprobar':
+            candidatos = catalogo.candidatos(*huella)
+            datos['hashes'] = calcular_hashes(datos['ruta_local'], candidatos, datos.get('hash'))
+            estado = catalogo.reservar(huella, datos['hashes'].values())
+
+    if estado != 'nuevo':
+        descartar(datos, estado, catalogo)
+        borrar_temporal(datos)
+        return None
 
+    ruta_archivo = None
+    try:
+        if saltar_parecida(datos, catalogo):
+            return None
+
+        # Crear carpeta destino.
+        ruta_destino = os.path.join(ruta_final, datos['nombre_carpeta'])
+        os.makedirs(ruta_destino, exist_ok=True)
+
+        # Si en la carpeta ya hay otro archivo con el mismo nombre, se
+        #   añade '_1', '_2'... (ver 'ruta_libre'). Si es este mismo
+        #   archivo (copiado por una importación que se cortó antes de
+        #   apuntarlo), no se vuelve a copiar. Sólo entonces hace falta
+        #   el hash completo antes de copiar.
+        hash_archivo = datos.get('hashes', {}).get(huellas.algoritmo_hash)
+        if not hash_archivo and os.path.exists(os.path.join(ruta_destino, archivo)):
+            hash_archivo = huellas.hash_completo(datos['ruta_local'])
+        with bloqueo_rutas:
+            ruta_archivo, ya_colocado = ruta_libre(ruta_destino, archivo, huella, hash_archivo, rutas_reservadas)
+            rutas_reservadas.add(ruta_archivo)
+
+        # Copiar archivo del directorio temporal al definitivo. En la copia
+        #   directa, la descarga parcial sólo se renombra, y el archivo del
+        #   PC se enlaza o se copia con un renombrado atómico al final.
+        #   Si aún no tenemos el hash completo (archivo nuevo seguro), se
+        #   calcula en la misma lectura de la copia.
+        if not ya_colocado:
+            with metricas.medir('colocacion', datos['tamaño']):
+                if not modo_copia_directa:
+                    if hash_archivo:
+                        shutil.copy2(datos['ruta_local'], ruta_archivo)
+                    else:
+                        hash_archivo = huellas.copiar_con_hash(datos['ruta_local'], ruta_archivo)
+                elif datos['temporal']:
+                    if not hash_archivo:
+                        hash_archivo = huellas.hash_completo(datos['ruta_local'])
+                    os.replace(datos['ruta_local'], ruta_archivo)
                 else:
-                    print(f'❌ Archivo eliminado: {archivo} - no se copia...')
+                    hash_archivo = colocar_archivo(datos['ruta_local'], ruta_archivo,
+                                                   con_hash=not hash_archivo) or hash_archivo
+        datos['hash'], datos['ruta_destino'] = hash_archivo, ruta_archivo
+
+        # Con el hash completo ya calculado, lo comparamos con los
+        #   registros antiguos sin tamaño, que no eran candidatos.
+        estado = comprobar_antiguos(datos, catalogo)
+        if estado:
+            if not ya_colocado:
+                os.remove(ruta_archivo)
+            descartar(datos, estado, catalogo)
+            return None
+        anotar(datos, 'colocado', catalogo)
+
+        registrar(datos, catalogo)
+        print(f'{archivo} ➡ {datos["nombre_carpeta"]}')
+        metricas.contar('copiados')
+        metricas.contar('bytes', datos['tamaño'])
+    finally:
+        with bloqueo_rutas:
+            rutas_reservadas.discard(ruta_archivo)
+        catalogo.liberar(huella)
+        borrar_temporal(datos)
+
+    return datos
+
+# Damos por gestionado un archivo duplicado o eliminado, sin copiarlo.
+def descartar(datos, estado, catalogo):
+    archivo = datos['archivo']
+    if estado == 'duplicado':
+        print(f'🔁 Archivo duplicado o eliminado: {archivo} - no se copia...')
+        metricas.contar('duplicados')
+    else:
+        print(f'❌ Archivo eliminado: {archivo} - no se copia...')
+        metricas.contar('eliminados')
+    with catalogo.transaccion():
+        catalogo.marcar_sincronizado(datos['origen'], archivo, *datos['estado_origen'])
+        anotar(datos, 'catalogado', catalogo)
+
+# Comparamos un archivo ya colocado con los registros antiguos sin tamaño,
+#   por su hash completo (y el de sus algoritmos, si es otro). Devuelve
+#   'duplicado', 'eliminado' o None si no es ninguno de ellos.
+def comprobar_antiguos(datos, catalogo):
+    if not algoritmos_antiguos:
+        return None
+    hashes = calcular_hashes(datos['ruta_destino'], (), datos['hash'], algoritmos_antiguos)
+    if any(catalogo.existe(h) for h in hashes.values()):
+        return 'duplicado'
+    if any(catalogo.eliminado(h) for h in hashes.values()):
+        return 'eliminado'
+    return None
+
+# Buscamos en el catálogo fotos casi iguales a la del archivo. Si la más
+#   parecida está a 'distancia_saltar' bits o menos, el archivo no se
+#   copia y se da por gestionado, como un duplicado; si está a
+#   'distancia_informar' o menos, se copia pero se apunta en el informe.
+#   Un archivo más grande que todos los parecidos (el original, si antes
+#   llegó la copia de WhatsApp) siempre se copia. Devuelve True si el
+#   archivo se salta.
+def saltar_parecida(datos, catalogo):
+    if indice_similares is None or not datos.get('huella_visual'):
+        return False
 
-            else:
-                print(f'🔁 Archivo duplicado o eliminado: {archivo} - no se copia...')
+    radio = max(distancia_informar, distancia_saltar or 0)
+    parecidas = indice_similares.buscar(similares.de_texto(datos['huella_visual']), radio)
+    if not parecidas:
+        return False
 
-    # Guardamos la lista de duplicados y eliminados.
-    guardar_json(duplicados, ruta_duplicados)
-    guardar_json(eliminados, ruta_eliminados)
+    parecidas = [(d, catalogo.buscar_hash(h)) for d, h in parecidas]
+    parecidas = [(d, registro) for d, registro in parecidas if registro]
+    if not parecidas:
+        return False
+
+    # Nos la saltamos si alguna de las más parecidas es igual o más grande.
+    mejores = [(d, registro) for d, registro in parecidas
+               if distancia_saltar is not None and d <= distancia_saltar
+               and not (registro['tamaño'] and datos['tamaño'] > registro['tamaño'])]
+    saltar = bool(mejores)
+    distancia, registro = mejores[0] if saltar else parecidas[0]
+    ruta_parecida = registro['ruta']
+    informe_similares.append({
+        'archivo': datos['archivo'],
+        'origen': datos['origen'],
+        'parecida': ruta_parecida,
+        'distancia': distancia,
+        'copiada': not saltar
+    })
+
+    archivo = datos['archivo']
+    if not saltar:
+        print(f'🪞 {archivo} se parece a {ruta_parecida} (distancia {distancia})')
+        return False
+
+    print(f'🪞 Archivo parecido a {ruta_parecida}: {archivo} - no se copia...')
+    metricas.contar('parecidas')
+    with catalogo.transaccion():
+        catalogo.marcar_sincronizado(datos['origen'], archivo, *datos['estado_origen'])
+        anotar(datos, 'catalogado', catalogo)
+    return True
+
+# Añadimos los datos al historial y al manifiesto, y cerramos el archivo
+#   en el diario, todo en una sola transacción.
+def registrar(datos, catalogo):
+    with metricas.medir('registro'), catalogo.transaccion():
+        catalogo.añadir({
+            'hash': datos['hash'],
+            'ruta': datos['ruta_destino'],
+            'ubicacion': datos['ubicacion'],
+            'fecha': datos['fecha'],
+            'latitud': float(datos['latitud']) if datos['latitud'] is not None else None,
+            'longitud': float(datos['longitud']) if datos['longitud'] is not None else None,
+            'tamaño': datos['tamaño'],
+            'hash_parcial': datos['hash_parcial'],
+            'huella_visual': datos.get('huella_visual')
+        })
+        catalogo.marcar_sincronizado(datos['origen'], datos['archivo'], *datos['estado_origen'])
+        anotar(datos, 'catalogado', catalogo)
+
+    # Las siguientes fotos de la importación ya se comparan con ésta.
+    if indice_similares is not None and datos.get('huella_visual'):
+        indice_similares.añadir(similares.de_texto(datos['huella_visual']), datos['hash'])
+
+# Borramos la copia temporal de un archivo ya gestionado (nunca el
+#   archivo original del PC en la copia directa).
+def borrar_temporal(datos):
+    if datos['temporal'] and os.path.exists(datos['ruta_local']):
+        os.remove(datos['ruta_local'])
+
+# Función principal.
+def main():
+    global geolocalizador, indice_similares, algoritmos_antiguos
+    geolocalizador = crear_geolocalizador()
+
+    # Crear carpeta temporal. En la copia directa, las descargas parciales
+    #   van dentro de 'ruta_final', para que colocarlas sea sólo renombrar.
+    carpeta_temporal = os.path.join(ruta_final, '.parciales') if modo_copia_directa else ruta_temporal
+    os.makedirs(carpeta_temporal, exist_ok=True)
+
+    # Cargamos el historial de duplicados y eliminados una sola vez, y
+    #   completamos la huella rápida de los registros antiguos.
+    catalogo = Catalogo(ruta_catalogo)
+    catalogo.completar_huellas(huellas.huella_rapida)
+    algoritmos_antiguos = catalogo.algoritmos_sin_tamaño()
+
+    # Huellas visuales de las fotos del catálogo, completando las que falten.
+    if detectar_similares:
+        completadas = catalogo.completar_huellas_visuales(similares.calcular_huellas)
+        if completadas:
+            print(f'🪞 Huella visual calculada para {completadas} fotos del catálogo')
+        indice_similares = similares.IndiceSimilares(
+            (similares.de_texto(huella), hash_archivo) for hash_archivo, huella in catalogo.huellas_visuales())
+
+    # Listar archivos desde el movil o pc, con su tamaño y fecha de
+    #   modificación. Comprobamos una sola vez si hay un movil conectado.
+    inicio = time.perf_counter()
+    transporte = TransporteAdb(ruta_adb, modo_transporte_adb)
+    desde_movil = transporte.conectado
+    if desde_movil:
+        ruta_archivos = ruta_movil
+        origen = f'movil:{transporte.dispositivo}:{ruta_archivos}'
+        listado = transporte.listar_con_stat(ruta_archivos)
+    else:    
+        print('💻 No se puedo desde el movil, probar desde el PC...')
+        ruta_archivos = ruta_pc
+        origen = f'pc:{os.path.abspath(ruta_archivos)}'
+        listado = listar_local(ruta_archivos)
+    metricas.anotar('listado', time.perf_counter() - inicio, archivos=len(listado))
+
+    # Sincronización incremental: nos saltamos los archivos que no han
+    #   cambiado desde la última vez que se gestionaron.
+    if modo_incremental:
+        manifiesto = catalogo.manifiesto(origen)
+        total = len(listado)
+        listado = {n: v for n, v in listado.items() if manifiesto.get(n) != v}
+        print(f'🔄 {total - len(listado)} archivos sin cambios desde la última sincronización')
+        metricas.cache('manifiesto', total - len(listado), len(listado))
+
+    # Sólo gestionamos imágenes y videos.
+    #   En la copia directa desde el PC, se lee directamente el original.
+    directo_pc = modo_copia_directa and not desde_movil
+    elementos = [
+        {
+            'archivo': archivo,
+            'ruta_origen': f'{ruta_archivos}/{archivo}',
+            'ruta_local': f'{ruta_archivos}/{archivo}' if directo_pc else os.path.join(carpeta_temporal, archivo),
+            'temporal': not directo_pc,
+            'origen': origen,
+            'estado_origen': estado_origen
+        }
+        for archivo, estado_origen in sorted(listado.items())
+        if archivo.lower().endswith(('.jpg', '.jpeg', '.mp4'))
+    ]
+    metricas.contar('archivos', len(elementos))
+
+    # Reanudamos los archivos que se quedaron a medias la última vez.
+    diario = catalogo.diario(origen)
+    reanudados = sum(reanudar(datos, diario.get(datos['archivo'])) for datos in elementos)
+    if reanudados:
+        print(f'♻ {reanudados} archivos se reanudan desde la importación anterior')
+
+    if desde_movil:
+        elementos = descargar_desde_movil(transporte, elementos, carpeta_temporal, catalogo)
+
+    # Descargar, comprobar duplicados y clasificar, con las etapas a la vez.
+    #   La colocación tiene un solo trabajador: es la que escribe en el catálogo.
+    ejecutar_pipeline(elementos, [
+        Etapa('transferencia', partial(transferir, catalogo=catalogo), trabajadores['transferencia']),
+        Etapa('metadatos', leer_metadatos, trabajadores['metadatos']),
+        Etapa('hash', partial(hashear, catalogo=catalogo), trabajadores['hash']),
+        Etapa('colocacion', partial(colocar, catalogo=catalogo), trabajadores['colocacion'])
+    ], tamaño_cola)
+
+    medir_geolocalizador()
+    geolocalizador.cache.cerrar()
+
+    # Confirmamos los últimos cambios del catálogo. El diario ya no hace
+    #   falta: la carpeta temporal se borra a continuación.
+    catalogo.limpiar_diario(origen)
+    catalogo.cerrar()
+
+    # Añadimos las fotos parecidas de esta importación al informe.
+    if informe_similares:
+        guardar_json(cargar_json(ruta_similares) + informe_similares, ruta_similares)
+        print(f'🪞 {len(informe_similares)} fotos parecidas, ver {ruta_similares}')
 
     # Limpiar carpeta temporal
-    shutil.rmtree(ruta_temporal)
+    shutil.rmtree(carpeta_temporal)
 
-# Ejecutamos el script.
+# Ejecutamos el script, con el resumen de sus métricas al terminar.
 if __name__ == '__main__':
-    main()
+    metricas.ejecutar('copia_clasificador_fotos', main)
@@ -0,0 +1,110 @@
+'''
+Script en Python. Contiene las funciones de la copia directa (sin pasar
+por la carpeta temporal) de 'copia_clasificador_fotos.py'.
+
+Antes cada archivo se escribía dos veces: primero del movil o de
+'ruta_pc' a 'ruta_temporal', y después otra vez de ahí a 'ruta_destino'.
+Con videos de varios GB eso es el doble de escrituras en disco, y hacía
+falta tanto espacio libre como ocupaba el lote.
+
+Con la copia directa:
+- Desde el PC: leemos los metadatos y la huella del archivo original,
+    sin copiarlo. Si es nuevo, lo ponemos en su carpeta final con un
+    enlace duro o una copia 'reflink' (si origen y destino están en el
+    mismo disco y el sistema de archivos lo permite) o con una copia
+    normal, que calcula a la vez el hash completo si aún no lo tenemos.
+    Si ya está en el catálogo, no se escribe nada.
+- Desde el movil: descargamos el archivo una sola vez (ver
+    'transporte_adb.py'), calculando el hash mientras se escribe en una
+    carpeta de descargas parciales dentro de 'ruta_final'. Al estar en el
+    mismo disco que el destino, colocarlo es sólo renombrarlo.
+En los dos casos el archivo aparece en la carpeta final con un
+    renombrado atómico ('os.replace'), así nunca queda un archivo a medias
+    con su nombre definitivo.
+
+Función (ruta_libre):
+Elige el nombre del archivo en su carpeta final sin pisar otro archivo
+    distinto con el mismo nombre (dos móviles con 'IMG_0001.jpg'): le
+    añade '_1', '_2'... La usan la importación y 'carga_masiva.py'.
+'''
+
+import os
+import shutil
+import huellas
+
+FICLONE = 0x40049409 # ioctl de Linux para las copias 'reflink'.
+
+# Ruta libre para el archivo en su carpeta: el mismo nombre, o con '_1',
+#   '_2'... si ya hay otro archivo. Devuelve (ruta, ya_colocado), con
+#   'ya_colocado' a True si en esa ruta ya está este mismo archivo: la
+#   huella rápida sólo lo descarta, y se confirma con el hash completo.
+#   Las rutas de 'reservadas' (elegidas para otros archivos que aún se
+#   están copiando) no se usan.
+def ruta_libre(carpeta, archivo, huella, hash_archivo, reservadas=()):
+    nombre, extension = os.path.splitext(archivo)
+    numero = 0
+    while True:
+        ruta = os.path.join(carpeta, f'{nombre}_{numero}{extension}' if numero else archivo)
+        if ruta not in reservadas:
+            if not os.path.exists(ruta):
+                return ruta, False
+            if huellas.huella_rapida(ruta) == huella and huellas.hash_completo(ruta) == hash_archivo:
+                return ruta, True
+        numero += 1
+
+# Comprobamos si dos rutas están en el mismo sistema de archivos.
+def mismo_sistema_archivos(ruta_a, ruta_b):
+    try:
+        return os.stat(ruta_a).st_dev == os.stat(ruta_b).st_dev
+    except OSError:
+        return False
+
+# Intentamos una copia 'reflink' (comparte los bloques del disco, no
+#   escribe los datos). Sólo funciona en Linux con Btrfs, XFS...
+def copiar_reflink(origen, destino):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+            fcntl.ioctl(f_destino.fileno(), FICLONE, f_origen.fileno())
+        shutil.copystat(origen, destino)
+        return True
+    except OSError:
+        if os.path.exists(destino):
+            os.remove(destino)
+        return False
+
+# Ponemos el archivo de origen en su ruta final, escribiendo lo mínimo:
+#   en el mismo disco, enlace duro o reflink (y si no se puede, copia);
+#   en otro disco, copia. Después, renombrado atómico. Con 'con_hash'
+#   devuelve el hash completo del archivo: en la copia se calcula en la
+#   misma lectura, y con enlace o reflink (que no leen los datos) se lee
+#   una sola vez para el hash.
+def colocar_archivo(origen, destino, con_hash=False):
+    parcial = f'{destino}.parcial'
+    if os.path.exists(parcial):
+        os.remove(parcial)
+
+    hash_archivo = None
+    if mismo_sistema_archivos(origen, os.path.dirname(destino)):
+        try:
+            os.link(origen, parcial)
+            enlazado = True
+        except OSError:
+            enlazado = copiar_reflink(origen, parcial)
+    else:
+        enlazado = False
+
+    if enlazado:
+        if con_hash:
+            hash_archivo = huellas.hash_completo(parcial)
+    elif con_hash:
+        hash_archivo = huellas.copiar_con_hash(origen, parcial)
+    else:
+        shutil.copy2(origen, parcial)
+
+    os.replace(parcial, destino)
+    return hash_archivo
@@ -0,0 +1,210 @@
+'''
+Script en Python. Contiene el geocodificador compartido por
+'copia_clasificador_fotos.py', 'mapa_marca_directorios.py' y
+'PyQt/generar_mapa.py', con una caché en disco de las respuestas de
+Nominatim.
+
+Antes cada foto hacía una consulta 'reverse' a Nominatim, y cada
+directorio una consulta 'geocode', aunque casi todas las fotos de un
+carrete están hechas en los mismos pocos sitios. Eran viajes por la red
+repetidos, y Nominatim nos limitaba enseguida.
+
+CLASE CacheGeocodificacion:
+Guarda las respuestas en una base de datos SQLite ('cache_geo.db').
+    - Las consultas inversas (coordenadas -> lugar) se guardan con la
+        latitud y longitud redondeadas a una rejilla de 'resolucion'
+        grados (0.01º son aproximadamente 1 km), así que todas las fotos
+        de la misma zona comparten la misma entrada.
+    - Las consultas directas (lugar -> coordenadas) se guardan por el
+        texto buscado.
+    - Cada entrada caduca a los 'caducidad_dias' días.
+    - Si hay más de 'max_entradas', se borran las usadas hace más tiempo
+        (LRU). El momento de uso de cada acierto se apunta en memoria y
+        se escribe con la siguiente respuesta nueva que se guarda, cada
+        'max_usados' aciertos o al cerrar la caché; así una importación
+        que sale entera de la caché no confirma una escritura por foto.
+    También se guardan las respuestas vacías, para no volver a preguntar
+    por un sitio que Nominatim no conoce.
+
+CLASE Geocodificador:
+Consulta primero la caché y sólo si no está pregunta a Nominatim, con
+    un 'GeocodificadorAsincrono' (ver 'geocodificador_asincrono.py') que
+    corre en su propio hilo con un bucle de asyncio. Así todas las
+    consultas por la red del programa pasan por el mismo limitador de la
+    política de Nominatim, se reintentan si nos contesta 429, y si dos
+    hilos de la importación piden a la vez la misma zona sólo sale una
+    consulta ('coalescidas'). Para el resto del programa sigue siendo una
+    llamada normal, que espera la respuesta.
+    Con la caché caliente, un lote de fotos de una zona conocida no hace
+    ninguna consulta por la red. Con 'url' se puede apuntar a otro
+    servidor, como el falso de 'pruebas/nominatim_falso.py'.
+Con 'ubicacion' obtenemos directamente el '(ciudad)(pais)' de unas
+    coordenadas. Si le pasamos un 'Nomenclator' (ver 'nomenclator.py'),
+    lo busca primero sin conexión, y sólo si no lo encuentra pregunta a
+    Nominatim, salvo que 'usar_red' sea False.
+    Cuenta los aciertos del nomenclátor y las consultas por la red, para
+    el resumen de la importación (ver 'metricas.py').
+'''
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+
+ruta_cache = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_geo.db')
+resolucion = 0.01 # Grados de la rejilla para las consultas inversas.
+caducidad_dias = 180
+max_entradas = 50000
+max_usados = 500 # Aciertos cuyo momento de uso se escriben de una vez.
+
+esquema = '''
+CREATE TABLE IF NOT EXISTS cache (
+    clave TEXT PRIMARY KEY,
+    valor TEXT,
+    creado REAL NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_usado ON cache (usado);
+'''
+
+class CacheGeocodificacion:
+    def __init__(self, ruta=ruta_cache, resolucion=resolucion,
+                 caducidad_dias=caducidad_dias, max_entradas=max_entradas):
+        self.resolucion = resolucion
+        self.caducidad = caducidad_dias * 24 * 3600
+        self.max_entradas = max_entradas
+        self.bloqueo = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.usados = {} # Clave -> momento de su último acierto, sin escribir aún.
+
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.executescript(esquema)
+
+    # Clave de una consulta inversa: la celda de la rejilla.
+    def clave_inversa(self, lat, lon, idioma):
+        celda_lat = round(lat / self.resolucion)
+        celda_lon = round(lon / self.resolucion)
+        return f'inversa:{idioma}:{self.resolucion}:{celda_lat}:{celda_lon}'
+
+    # Clave de una consulta directa: el texto en minúsculas.
+    def clave_directa(self, lugar, idioma):
+        return f'directa:{idioma}:{lugar.strip().lower()}'
+
+    # Devuelve (encontrado, valor). El valor puede ser None si guardamos
+    #   una respuesta vacía.
+    def obtener(self, clave, contar=True):
+        ahora = time.time()
+        with self.bloqueo:
+            fila = self.conexion.execute(
+                'SELECT valor, creado FROM cache WHERE clave = ?', (clave,)).fetchone()
+
+            if fila is None or ahora - fila[1] > self.caducidad:
+                self.fallos += contar
+                return False, None
+
+            self.usados[clave] = ahora
+            if len(self.usados) >= max_usados:
+                self.escribir_usados()
+                self.conexion.commit()
+            self.aciertos += contar
+            return True, json.loads(fila[0])
+
+    def guardar(self, clave, valor):
+        ahora = time.time()
+        with self.bloqueo:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO cache (clave, valor, creado, usado) VALUES (?, ?, ?, ?)',
+                (clave, json.dumps(valor, ensure_ascii=False), ahora, ahora))
+            self.usados.pop(clave, None)
+            self.escribir_usados()
+            self.recortar()
+            self.conexion.commit()
+
+    # Escribimos los momentos de uso apuntados en memoria (sin confirmar).
+    def escribir_usados(self):
+        if self.usados:
+            self.conexion.executemany('UPDATE cache SET usado = ? WHERE clave = ?',
+                                      [(usado, clave) for clave, usado in self.usados.items()])
+            self.usados.clear()
+
+    # Borramos las entradas menos usadas si nos pasamos del máximo.
+    def recortar(self):
+        total = self.conexion.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total > self.max_entradas:
+            self.conexion.execute(
+                'DELETE FROM cache WHERE clave IN '
+                '(SELECT clave FROM cache ORDER BY usado LIMIT ?)',
+                (total - self.max_entradas,))
+
+    def cerrar(self):
+        with self.bloqueo:
+            self.escribir_usados()
+            self.conexion.commit()
+            self.conexion.close()
+
+class Geocodificador:
+    def __init__(self, user_agent, cache=None, idioma='es', nomenclator=None, usar_red=True, url=None):
+        # 'geocodificador_asincrono' usa la caché de este módulo.
+        from geocodificador_asincrono import GeocodificadorAsincrono
+
+        self.cache = cache if cache is not None else CacheGeocodificacion()
+        self.asincrono = GeocodificadorAsincrono(user_agent, cache=self.cache, idioma=idioma, url=url)
+        self.nomenclator = nomenclator
+        self.usar_red = usar_red
+        self.bloqueo = threading.Lock()
+        self.bucle = None
+        self.aciertos_nomenclator = 0
+        self.fallos_nomenclator = 0
+
+    @property
+    def consultas_red(self):
+        return self.asincrono.consultas_red
+
+    @property
+    def coalescidas(self):
+        return self.asincrono.coalescidas
+
+    # Ejecutamos una consulta en el bucle del geocodificador asíncrono y
+    #   esperamos su respuesta. El bucle se arranca con la primera.
+    def ejecutar(self, corutina):
+        with self.bloqueo:
+            if self.bucle is None:
+                self.bucle = asyncio.new_event_loop()
+                threading.Thread(target=self.bucle.run_forever, name='geocodificador', daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(corutina, self.bucle).result()
+
+    # Coordenadas -> '(ciudad)(pais)', o None si no lo encontramos.
+    def ubicacion(self, lat, lon):
+        if self.nomenclator is not None:
+            ubicacion = self.nomenclator.ubicacion(lat, lon)
+            if ubicacion:
+                self.aciertos_nomenclator += 1
+                return ubicacion
+            self.fallos_nomenclator += 1
+
+        if not self.usar_red:
+            return None
+
+        return ubicacion_desde_direccion(self.inversa(lat, lon))
+
+    # Coordenadas -> dirección completa ('calle, ..., ciudad, ..., país').
+    def inversa(self, lat, lon):
+        return self.ejecutar(self.asincrono.inversa(lat, lon))
+
+    # Nombre de lugar -> (latitud, longitud).
+    def directa(self, lugar):
+        return self.ejecutar(self.asincrono.directa(lugar))
+
+# De la dirección de Nominatim sacamos '(ciudad)(pais)'.
+def ubicacion_desde_direccion(direccion):
+    if not direccion:
+        return None
+
+    partes = direccion.split(', ')
+    ciudad = f'({partes[-4]})' # El nombre de la ciudad tendrá el será (ciudad)
+    pais = f'({partes[-1]})' # El nombre del país será (pais)
+    return f'{ciudad}{pais}'
@@ -0,0 +1,189 @@
+'''
+Script en Python. Contiene el geocodificador asíncrono (asyncio) que
+hace las consultas a Nominatim de todo el programa: 'Geocodificador'
+(ver 'geocodificador.py') le pasa las que no encuentra en el
+nomenclátor ni en la caché, y 'geocodificar_lugares' sirve para pedir
+muchos lugares de golpe.
+
+Antes 'Geocodificador' preguntaba con 'geopy' de uno en uno, detrás de
+un bloqueo: cada consulta esperaba a que terminara la anterior y además
+al segundo de cortesía de Nominatim, y si varios hilos de la
+importación pedían la misma zona, cada uno esperaba su turno para
+acabar encontrándola en la caché.
+
+CLASE LimitadorTokens:
+Un cubo de tokens ('token bucket'): se rellena a razón de 'tasa' tokens
+    por segundo, hasta 'capacidad'. Cada consulta a Nominatim gasta un
+    token, y si no queda ninguno espera al siguiente. Con la política de
+    Nominatim (una consulta por segundo como mucho, sin ráfagas) es
+    tasa=1 y capacidad=1: las consultas salen exactamente cada segundo,
+    aunque la anterior todavía no haya contestado. Por defecto todos los
+    geocodificadores comparten el mismo ('limitador_nominatim').
+
+CLASE GeocodificadorAsincrono:
+Usa la misma caché en disco ('CacheGeocodificacion') y las mismas claves
+    que 'Geocodificador', así que lo que uno guarda lo aprovecha el otro.
+Si se pide un lugar que ya se está consultando, no se repite la
+    consulta: se espera la respuesta de la primera ('coalescencia').
+Las consultas se hacen con 'urllib' en un hilo aparte
+    ('asyncio.to_thread'), a la dirección 'url' (por defecto
+    'url_nominatim'), así que para las pruebas se puede apuntar al servidor
+    falso de 'pruebas/nominatim_falso.py'.
+Si Nominatim contesta 429 (demasiadas consultas) o 503, se reintenta
+    más tarde. Los errores no se guardan en la caché.
+
+Función (geocodificar_lugares):
+Para usarlo desde código normal (sin asyncio): recibe una lista de
+    lugares y devuelve un diccionario lugar -> (latitud, longitud), o
+    None si no se encontró.
+'''
+
+import json
+import time
+import asyncio
+import urllib.parse
+import urllib.request
+import urllib.error
+from geocodificador import CacheGeocodificacion, ubicacion_desde_direccion
+
+url_nominatim = 'https://nominatim.openstreetmap.org'
+consultas_por_segundo = 1.0 # Política de uso de Nominatim.
+reintentos = 3
+espera_reintento = 5.0 # Segundos, se dobla en cada reintento.
+
+class LimitadorTokens:
+    def __init__(self, tasa=consultas_por_segundo, capacidad=1):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultima_recarga = time.monotonic()
+        # El bloqueo es de un bucle de asyncio: se crea uno por bucle.
+        self.bloqueo = None
+        self.bucle = None
+
+    def recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultima_recarga) * self.tasa)
+        self.ultima_recarga = ahora
+
+    # Esperamos a tener un token y lo gastamos. Los que esperan se
+    #   atienden por orden de llegada.
+    async def adquirir(self):
+        bucle = asyncio.get_running_loop()
+        if self.bucle is not bucle:
+            self.bloqueo, self.bucle = asyncio.Lock(), bucle
+        async with self.bloqueo:
+            self.recargar()
+            # asyncio puede despertar un poco antes de tiempo.
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+                self.recargar()
+            self.tokens -= 1
+
+# Limitador compartido por todos los geocodificadores del programa: la
+#   política de Nominatim cuenta las consultas de la aplicación, no de
+#   cada objeto.
+limitador_nominatim = LimitadorTokens()
+
+class GeocodificadorAsincrono:
+    def __init__(self, user_agent, cache=None, idioma='es', url=None,
+                 limitador=None, timeout=10):
+        self.user_agent = user_agent
+        self.cache = cache if cache is not None else CacheGeocodificacion()
+        self.idioma = idioma
+        self.url = (url or url_nominatim).rstrip('/')
+        self.limitador = limitador if limitador is not None else limitador_nominatim
+        self.timeout = timeout
+        # Consultas en curso: clave de la caché -> tarea.
+        self.en_curso = {}
+        self.consultas_red = 0
+        self.coalescidas = 0
+
+    # Nombre de lugar -> (latitud, longitud).
+    async def directa(self, lugar):
+        clave = self.cache.clave_directa(lugar, self.idioma)
+        coordenadas = await self.consultar(clave, self.pedir_directa, lugar)
+        return tuple(coordenadas) if coordenadas else None
+
+    # Coordenadas -> dirección completa ('calle, ..., ciudad, ..., país').
+    async def inversa(self, lat, lon):
+        clave = self.cache.clave_inversa(lat, lon, self.idioma)
+        return await self.consultar(clave, self.pedir_inversa, lat, lon)
+
+    # Coordenadas -> '(ciudad)(pais)', o None si no lo encontramos.
+    async def ubicacion(self, lat, lon):
+        return ubicacion_desde_direccion(await self.inversa(lat, lon))
+
+    # Varios lugares a la vez. Diccionario lugar -> coordenadas (o None).
+    #   Los repetidos no se piden dos veces: se juntan en 'consultar'.
+    async def directas(self, lugares):
+        lugares = list(lugares)
+        resultados = await asyncio.gather(*(self.directa(l) for l in lugares), return_exceptions=True)
+
+        coordenadas = {}
+        for lugar, resultado in zip(lugares, resultados):
+            if isinstance(resultado, Exception):
+                print(f'Error al geocodificar {lugar}: {resultado}')
+                resultado = None
+            coordenadas[lugar] = resultado
+        return coordenadas
+
+    # Caché, consulta en curso o consulta nueva.
+    async def consultar(self, clave, pedir, *argumentos):
+        encontrado, valor = self.cache.obtener(clave)
+        if encontrado:
+            return valor
+
+        tarea = self.en_curso.get(clave)
+        if tarea is not None:
+            self.coalescidas += 1
+            return await asyncio.shield(tarea)
+
+        tarea = asyncio.ensure_future(pedir(*argumentos))
+        self.en_curso[clave] = tarea
+        try:
+            valor = await tarea
+            self.cache.guardar(clave, valor)
+            return valor
+        finally:
+            del self.en_curso[clave]
+
+    async def pedir_directa(self, lugar):
+        respuesta = await self.pedir('search', q=lugar, limit=1)
+        if not respuesta:
+            return None
+        return float(respuesta[0]['lat']), float(respuesta[0]['lon'])
+
+    async def pedir_inversa(self, lat, lon):
+        respuesta = await self.pedir('reverse', lat=lat, lon=lon)
+        if not respuesta or 'error' in respuesta:
+            return None
+        return respuesta.get('display_name')
+
+    # Una consulta HTTP a Nominatim, esperando antes nuestro turno.
+    async def pedir(self, servicio, **parametros):
+        parametros.update({'format': 'jsonv2', 'accept-language': self.idioma})
+        url = f'{self.url}/{servicio}?{urllib.parse.urlencode(parametros)}'
+
+        espera = espera_reintento
+        for intento in range(reintentos + 1):
+            await self.limitador.adquirir()
+            self.consultas_red += 1
+            try:
+                return await asyncio.to_thread(self.descargar, url)
+            except urllib.error.HTTPError as e:
+                if e.code not in (429, 503) or intento == reintentos:
+                    raise
+            await asyncio.sleep(espera)
+            espera *= 2
+
+    def descargar(self, url):
+        peticion = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            return json.loads(respuesta.read().decode('utf-8'))
+
+# Coordenadas de varios lugares, desde código sin asyncio.
+def geocodificar_lugares(lugares, user_agent, **opciones):
+    async def geocodificar():
+        return await GeocodificadorAsincrono(user_agent, **opciones).directas(lugares)
+    return asyncio.run(geocodificar())
@@ -0,0 +1,105 @@
+'''
+Script en Python. Contiene las funciones de hash (huellas) de los
+archivos para la comprobación de duplicados por niveles.
+
+Antes se leía cada archivo entero, en bloques de 4 KB, para calcular su
+MD5 antes de saber si era un duplicado. Ahora la comprobación se hace
+por niveles, de más barato a más caro:
+1º El tamaño del archivo (no hay que leer nada).
+2º Un hash parcial del primer y el último 'mb_parcial' MB.
+3º El hash completo del contenido, sólo si los dos anteriores coinciden
+    con algún archivo del catálogo.
+Si el tamaño y el hash parcial no coinciden con ninguno, el archivo es
+nuevo seguro, y su hash completo se calcula mientras se copia (una sola
+lectura), con 'copiar_con_hash'.
+
+El hash completo se calcula con bloques grandes, o con 'mmap' en los
+archivos grandes, y el algoritmo se puede elegir: 'md5', 'blake2b' o
+'xxhash' (si está instalado el paquete 'xxhash').
+
+Para que los registros MD5 que ya tenemos en el catálogo se sigan
+pudiendo comparar, los hashes MD5 se guardan tal cual, y los de otros
+algoritmos con su nombre delante ('blake2b:...'). Así, si un archivo
+coincide con un registro antiguo, se calcula también su MD5.
+'''
+
+import os
+import mmap
+import shutil
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+algoritmos = {
+    'md5': hashlib.md5,
+    'blake2b': hashlib.blake2b,
+}
+if xxhash is not None:
+    algoritmos['xxhash'] = xxhash.xxh3_128
+
+algoritmo_hash = 'md5' # Algoritmo del hash completo de los archivos nuevos.
+mb_parcial = 1 # MB del principio y del final para el hash parcial.
+tamaño_bloque = 1024 * 1024
+tamaño_mmap = 64 * 1024 * 1024 # A partir de este tamaño usamos 'mmap'.
+
+# Hash guardado en el catálogo: MD5 tal cual, el resto con el algoritmo delante.
+def clave_hash(algoritmo, hexadecimal):
+    return hexadecimal if algoritmo == 'md5' else f'{algoritmo}:{hexadecimal}'
+
+# Algoritmo con el que se calculó un hash del catálogo.
+def algoritmo_de(clave):
+    return clave.split(':', 1)[0] if ':' in clave else 'md5'
+
+# Nivel 2: hash del primer y el último 'mb_parcial' MB (y del tamaño).
+def hash_parcial(ruta, tamaño=None):
+    tamaño = os.path.getsize(ruta) if tamaño is None else tamaño
+    n = mb_parcial * 1024 * 1024
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(tamaño).encode())
+
+    with open(ruta, 'rb') as f:
+        h.update(f.read(n))
+        if tamaño > n:
+            f.seek(max(n, tamaño - n))
+            h.update(f.read(n))
+
+    return f'{mb_parcial}:{h.hexdigest()}'
+
+# Niveles 1 y 2 juntos: (tamaño, hash parcial).
+def huella_rapida(ruta):
+    tamaño = os.path.getsize(ruta)
+    return tamaño, hash_parcial(ruta, tamaño)
+
+# Nivel 3: hash completo del contenido, con bloques grandes o 'mmap'.
+def hash_completo(ruta, algoritmo=None):
+    algoritmo = algoritmo or algoritmo_hash
+    h = algoritmos[algoritmo]()
+
+    with open(ruta, 'rb') as f:
+        tamaño = os.fstat(f.fileno()).st_size
+        if tamaño >= tamaño_mmap:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                with memoryview(datos) as vista:
+                    for inicio in range(0, tamaño, tamaño_bloque * 16):
+                        h.update(vista[inicio:inicio + tamaño_bloque * 16])
+        else:
+            for bloque in iter(lambda: f.read(tamaño_bloque), b''):
+                h.update(bloque)
+
+    return clave_hash(algoritmo, h.hexdigest())
+
+# Copiamos el archivo calculando su hash completo en la misma lectura.
+def copiar_con_hash(origen, destino, algoritmo=None):
+    algoritmo = algoritmo or algoritmo_hash
+    h = algoritmos[algoritmo]()
+
+    with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+        for bloque in iter(lambda: f_origen.read(tamaño_bloque), b''):
+            h.update(bloque)
+            f_destino.write(bloque)
+    shutil.copystat(origen, destino)
+
+    return clave_hash(algoritmo, h.hexdigest())
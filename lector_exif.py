@@ -0,0 +1,168 @@
+'''
+Script en Python. Contiene un lector ligero de los metadatos EXIF de las
+fotos JPEG, que sólo lee la cabecera del archivo.
+
+Antes usábamos 'Image.open(...)._getexif()' de PIL sobre la copia
+temporal completa, así que el archivo tenía que estar entero en el disco
+antes de poder clasificarlo.
+
+Los metadatos EXIF de un JPEG están en el segmento APP1, al principio
+del archivo (en los primeros KB, y como mucho 64 KB). Dentro hay una
+estructura TIFF con varios directorios (IFD) de etiquetas:
+    IFD0 -> 34665 (0x8769): puntero al IFD de EXIF
+        -> 36867 (0x9003): 'DateTimeOriginal'
+    IFD0 -> 34853 (0x8825): puntero al IFD de GPSInfo
+        -> 1, 2, 3, 4 y 29 (ver 'obtener_datos_exif')
+
+Función (leer_exif):
+Recibe una ruta local, unos bytes o un archivo abierto, y devuelve
+    (gps_info, fecha) con la misma forma que 'obtener_datos_exif' de
+    'copia_clasificador_fotos.py'.
+Si el archivo no es un JPEG o no tiene EXIF, devuelve ({}, None). Si la
+    estructura está mal, lanza 'ErrorExif'.
+'''
+
+import struct
+from datetime import datetime
+
+bytes_cabecera = 128 * 1024 # Lo máximo que leemos del principio del archivo.
+
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_FECHA_ORIGINAL = 0x9003
+TAGS_GPS = {
+    1: 'GPSLatitudeRef',
+    2: 'GPSLatitude',
+    3: 'GPSLongitudeRef',
+    4: 'GPSLongitude',
+    29: 'GPSDateStamp',
+}
+
+# Tamaño en bytes de cada tipo de dato TIFF.
+tamaños_tipo = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+class ErrorExif(Exception):
+    pass
+
+# Lee (gps_info, fecha) de una ruta, unos bytes o un archivo abierto.
+def leer_exif(origen):
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        cabecera = bytes(origen)
+    elif hasattr(origen, 'read'):
+        cabecera = origen.read(bytes_cabecera)
+    else:
+        with open(origen, 'rb') as f:
+            cabecera = f.read(bytes_cabecera)
+
+    tiff = buscar_app1(cabecera)
+    if tiff is None:
+        return {}, None
+    return leer_tiff(tiff)
+
+# Recorremos los segmentos del JPEG hasta el APP1 con 'Exif'. Devuelve
+#   los bytes de la estructura TIFF, o None.
+def buscar_app1(datos):
+    if datos[:2] != b'\xff\xd8':
+        return None
+
+    posicion = 2
+    while posicion + 4 <= len(datos):
+        if datos[posicion] != 0xFF:
+            raise ErrorExif(f'Marcador JPEG no válido en la posición {posicion}')
+
+        marcador = datos[posicion + 1]
+        # Relleno entre marcadores.
+        if marcador == 0xFF:
+            posicion += 1
+            continue
+        # Comienzo de la imagen comprimida o fin: ya no hay más cabeceras.
+        if marcador in (0xDA, 0xD9):
+            return None
+
+        longitud = struct.unpack('>H', datos[posicion + 2:posicion + 4])[0]
+        if marcador == 0xE1 and datos[posicion + 4:posicion + 10] == b'Exif\x00\x00':
+            fin = posicion + 2 + longitud
+            if fin > len(datos):
+                raise ErrorExif('El segmento APP1 está incompleto en la cabecera leída')
+            return datos[posicion + 10:fin]
+
+        posicion += 2 + longitud
+
+    return None
+
+# Leemos la fecha original y el GPS de la estructura TIFF.
+def leer_tiff(tiff):
+    if tiff[:2] == b'II':
+        orden = '<'
+    elif tiff[:2] == b'MM':
+        orden = '>'
+    else:
+        raise ErrorExif('Orden de bytes TIFF no válido')
+
+    if struct.unpack(f'{orden}H', tiff[2:4])[0] != 42:
+        raise ErrorExif('Cabecera TIFF no válida')
+
+    ifd0 = leer_ifd(tiff, orden, struct.unpack(f'{orden}I', tiff[4:8])[0])
+
+    fecha = None
+    if TAG_EXIF_IFD in ifd0:
+        exif = leer_ifd(tiff, orden, ifd0[TAG_EXIF_IFD])
+        if TAG_FECHA_ORIGINAL in exif:
+            fecha = datetime.strptime(exif[TAG_FECHA_ORIGINAL], '%Y:%m:%d %H:%M:%S')
+
+    gps_info = {}
+    if TAG_GPS_IFD in ifd0:
+        gps = leer_ifd(tiff, orden, ifd0[TAG_GPS_IFD])
+        gps_info = {nombre: gps.get(tag) for tag, nombre in TAGS_GPS.items()}
+
+    return gps_info, fecha
+
+# Leemos un IFD: diccionario etiqueta -> valor.
+def leer_ifd(tiff, orden, inicio):
+    if inicio + 2 > len(tiff):
+        raise ErrorExif(f'IFD fuera de la cabecera: {inicio}')
+
+    numero = struct.unpack(f'{orden}H', tiff[inicio:inicio + 2])[0]
+    etiquetas = {}
+    for i in range(numero):
+        entrada = inicio + 2 + i * 12
+        if entrada + 12 > len(tiff):
+            raise ErrorExif('Entrada de IFD incompleta')
+
+        tag, tipo, cuenta = struct.unpack(f'{orden}HHI', tiff[entrada:entrada + 8])
+        if tipo not in tamaños_tipo:
+            continue
+
+        tamaño = tamaños_tipo[tipo] * cuenta
+        if tamaño <= 4:
+            posicion = entrada + 8
+        else:
+            posicion = struct.unpack(f'{orden}I', tiff[entrada + 8:entrada + 12])[0]
+        if posicion + tamaño > len(tiff):
+            continue
+
+        etiquetas[tag] = leer_valor(tiff[posicion:posicion + tamaño], orden, tipo, cuenta)
+
+    return etiquetas
+
+# Convertimos el valor de una etiqueta al tipo de Python que corresponda.
+def leer_valor(datos, orden, tipo, cuenta):
+    if tipo == 2: # ASCII
+        return datos.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+
+    if tipo in (5, 10): # RATIONAL y SRATIONAL
+        formato = 'I' if tipo == 5 else 'i'
+        numeros = struct.unpack(f'{orden}{2 * cuenta}{formato}', datos)
+        valores = tuple(n / d if d else float('nan') for n, d in zip(numeros[::2], numeros[1::2]))
+    elif tipo in (3, 8):
+        valores = struct.unpack(f'{orden}{cuenta}{"H" if tipo == 3 else "h"}', datos)
+    elif tipo in (4, 9):
+        valores = struct.unpack(f'{orden}{cuenta}{"I" if tipo == 4 else "i"}', datos)
+    elif tipo == 11:
+        valores = struct.unpack(f'{orden}{cuenta}f', datos)
+    elif tipo == 12:
+        valores = struct.unpack(f'{orden}{cuenta}d', datos)
+    else: # BYTE, SBYTE y UNDEFINED
+        return datos
+
+    return valores[0] if cuenta == 1 else valores
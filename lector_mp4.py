@@ -0,0 +1,178 @@
+'''
+Script en Python. Contiene un lector de los metadatos de los videos MP4
+y QuickTime (.mov), que sólo lee las cajas ('atoms') que necesita.
+
+Antes, la fecha de los videos se sacaba con 'adb shell stat', que sólo
+funciona con el movil conectado (y da la fecha del archivo, no la de la
+grabación), y los videos siempre quedaban como '(Sin_GPS)'.
+
+Un MP4 es una sucesión de cajas: 4 bytes de tamaño, 4 bytes de tipo y su
+contenido, y algunas cajas contienen otras. Lo que nos interesa está en
+la caja 'moov', que es pequeña; el video en sí está en 'mdat', que puede
+ocupar varios GB y nos saltamos con 'seek' sin leerlo:
+    moov/mvhd: fecha de creación (segundos desde el 1 de enero de 1904, UTC).
+    moov/udta/©xyz: coordenadas en formato ISO 6709 ('+40.2311-003.5944/'),
+        que es donde las guardan los móviles Android.
+    moov/meta (keys + ilst): las claves de QuickTime
+        'com.apple.quicktime.location.ISO6709' y
+        'com.apple.quicktime.creationdate', que es donde las guardan los iPhone.
+También nos saltamos las pistas ('trak'), que tienen las tablas de
+muestras y pueden ser grandes.
+
+Función (leer_mp4):
+Recibe una ruta local o un archivo abierto (con 'seek') y devuelve
+    (gps_info, fecha) con la misma forma que 'obtener_datos_exif', así
+    los videos se clasifican por ubicación y fecha igual que las fotos.
+    Las coordenadas van en grados decimales en el primer elemento de
+    'GPSLatitude' y 'GPSLongitude' (minutos y segundos a 0), y el signo
+    en la referencia ('N'/'S', 'E'/'W').
+'''
+
+import re
+import struct
+from datetime import datetime, timedelta
+
+epoca_mp4 = datetime(1904, 1, 1)
+# Cajas con otras cajas dentro, por las que bajamos.
+contenedores = {b'moov', b'udta'}
+max_caja_leida = 1024 * 1024 # Las cajas que leemos enteras son pequeñas.
+
+patron_iso6709 = re.compile(r'([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)')
+
+# Lee (gps_info, fecha) de una ruta o de un archivo abierto.
+def leer_mp4(origen):
+    if hasattr(origen, 'read'):
+        return leer_cajas(origen)
+    with open(origen, 'rb') as f:
+        return leer_cajas(f)
+
+def leer_cajas(f):
+    f.seek(0, 2)
+    fin = f.tell()
+    datos = {}
+    recorrer(f, 0, fin, datos)
+
+    fecha = datos.get('fecha_quicktime') or datos.get('fecha_mvhd')
+    gps_info = {}
+    if 'coordenadas' in datos:
+        lat, lon = datos['coordenadas']
+        gps_info = {
+            'GPSLatitudeRef': 'N' if lat >= 0 else 'S',
+            'GPSLatitude': (abs(lat), 0, 0),
+            'GPSLongitudeRef': 'E' if lon >= 0 else 'W',
+            'GPSLongitude': (abs(lon), 0, 0),
+            'GPSDateStamp': fecha.strftime('%Y:%m:%d') if fecha else None
+        }
+    return gps_info, fecha
+
+# Cabeceras de las cajas entre 'inicio' y 'fin': (tipo, inicio del contenido, fin).
+def cajas(f, inicio, fin):
+    posicion = inicio
+    while posicion + 8 <= fin:
+        f.seek(posicion)
+        cabecera = f.read(8)
+        if len(cabecera) < 8:
+            return
+        tamaño, tipo = struct.unpack('>I4s', cabecera)
+        contenido = posicion + 8
+
+        if tamaño == 1: # Tamaño de 64 bits a continuación.
+            tamaño = struct.unpack('>Q', f.read(8))[0]
+            contenido += 8
+        elif tamaño == 0: # La caja llega hasta el final.
+            tamaño = fin - posicion
+
+        if tamaño < contenido - posicion:
+            return
+        yield tipo, contenido, min(posicion + tamaño, fin)
+        posicion += tamaño
+
+def recorrer(f, inicio, fin, datos):
+    for tipo, contenido, final in cajas(f, inicio, fin):
+        if tipo in contenedores:
+            recorrer(f, contenido, final, datos)
+
+        elif tipo == b'mvhd':
+            leer_mvhd(leer(f, contenido, final), datos)
+
+        elif tipo == b'\xa9xyz':
+            leer_xyz(leer(f, contenido, final), datos)
+
+        elif tipo == b'meta':
+            leer_meta(f, contenido, final, datos)
+
+# Leemos el contenido de una caja pequeña.
+def leer(f, inicio, fin):
+    f.seek(inicio)
+    return f.read(min(fin - inicio, max_caja_leida))
+
+def leer_mvhd(contenido, datos):
+    version = contenido[0]
+    if version == 1:
+        segundos = struct.unpack('>Q', contenido[4:12])[0]
+    else:
+        segundos = struct.unpack('>I', contenido[4:8])[0]
+    if segundos:
+        datos['fecha_mvhd'] = epoca_mp4 + timedelta(seconds=segundos)
+
+def leer_xyz(contenido, datos):
+    # 2 bytes de longitud y 2 de idioma, y después el texto ISO 6709.
+    longitud = struct.unpack('>H', contenido[:2])[0]
+    coordenadas = iso6709(contenido[4:4 + longitud].decode('utf-8', errors='replace'))
+    if coordenadas:
+        datos['coordenadas'] = coordenadas
+
+def iso6709(texto):
+    encontrado = patron_iso6709.match(texto.strip())
+    if encontrado:
+        return float(encontrado.group(1)), float(encontrado.group(2))
+    return None
+
+# Caja 'meta' de QuickTime: 'keys' con los nombres de las claves e
+#   'ilst' con sus valores, por el índice de la clave (empezando en 1).
+def leer_meta(f, inicio, fin, datos):
+    # En los MP4 (ISO) la caja 'meta' lleva 4 bytes de versión y flags.
+    f.seek(inicio)
+    if f.read(4) == b'\x00\x00\x00\x00':
+        inicio += 4
+
+    claves, valores = {}, {}
+    for tipo, contenido, final in cajas(f, inicio, fin):
+        if tipo == b'keys':
+            claves = leer_keys(leer(f, contenido, final))
+        elif tipo == b'ilst':
+            for indice, contenido_valor, final_valor in cajas(f, contenido, final):
+                valores[struct.unpack('>I', indice)[0]] = leer_data(f, contenido_valor, final_valor)
+
+    for indice, clave in claves.items():
+        valor = valores.get(indice)
+        if not isinstance(valor, str):
+            continue
+        if clave == 'com.apple.quicktime.location.ISO6709':
+            coordenadas = iso6709(valor)
+            if coordenadas:
+                datos['coordenadas'] = coordenadas
+        elif clave == 'com.apple.quicktime.creationdate':
+            try:
+                # Nos quedamos con la hora local de la grabación.
+                datos['fecha_quicktime'] = datetime.fromisoformat(valor[:19])
+            except ValueError:
+                pass
+
+def leer_keys(contenido):
+    numero = struct.unpack('>I', contenido[4:8])[0]
+    claves, posicion = {}, 8
+    for indice in range(1, numero + 1):
+        tamaño = struct.unpack('>I', contenido[posicion:posicion + 4])[0]
+        claves[indice] = contenido[posicion + 8:posicion + tamaño].decode('utf-8', errors='replace')
+        posicion += tamaño
+    return claves
+
+# Valor de la caja 'data' de una entrada de 'ilst' (sólo los de texto).
+def leer_data(f, inicio, fin):
+    for tipo, contenido, final in cajas(f, inicio, fin):
+        if tipo == b'data':
+            valor = leer(f, contenido, final)
+            if struct.unpack('>I', valor[:4])[0] == 1: # 1 = texto UTF-8
+                return valor[8:].decode('utf-8', errors='replace')
+    return None
@@ -0,0 +1,299 @@
+'''
+Script en Python. Contiene el modo escalable de los mapas de Folium, para
+bibliotecas con decenas de miles de fotos ('mapa_marca_fotos.py' y
+'PyQt/generar_mapa.py').
+
+Antes cada foto (o carpeta) era un 'folium.Marker' escrito dentro del
+HTML, y Leaflet tenía que crearlos todos al abrir la página. Con unos
+miles de marcas la página tardaba en cargar y moverse por el mapa era
+muy lento.
+
+En el modo escalable el HTML no lleva ninguna marca. Los puntos se
+escriben en archivos aparte, en la carpeta '<mapa>_datos' junto al HTML:
+    - Por debajo de 'zoom_detalle', los puntos agrupados para cada nivel
+        de zoom, en una rejilla de celdas de unos 'pixeles_celda' píxeles
+        de pantalla. Las celdas de un nivel son exactamente 4 del nivel
+        siguiente, así que se calculan todas a partir de las del nivel
+        más detallado. Cada grupo lleva el número de puntos, su peso (por
+        ejemplo las fotos de una carpeta), su centro y sus límites.
+    - Desde 'zoom_detalle', los puntos sueltos.
+Cada nivel se reparte en teselas ('z<zoom>_<i>_<j>.js'), de
+'celdas_tesela' celdas de lado para los grupos y de 'grados_tesela'
+grados para los puntos sueltos. Para actualizar un mapa se le pueden
+pasar las posiciones que han cambiado, y sólo se reescriben las teselas
+de cada nivel donde caen; el resto se quedan como estaban.
+Son GeoJSON envueltos en una llamada 'cargarCapa(nombre, datos)', porque
+los navegadores (y 'QWebEngineView') no dejan leer con 'fetch' archivos
+locales ('file://'), pero sí cargar scripts.
+
+En la página, un script carga sólo lo que hace falta para el zoom y la
+zona que se están viendo, cada vez que se mueve el mapa: las teselas
+visibles del nivel que corresponde al zoom. Los grupos se pintan
+como los de 'Leaflet.markercluster' y al pulsarlos el mapa se acerca a
+sus límites. Los puntos sueltos van en un 'markerClusterGroup', para
+separar los que están en el mismo sitio. El contenido de los 'popup' lo
+crea una función de JavaScript ('plantilla_popup') a partir de las
+propiedades de cada punto, sólo al abrirlo.
+'''
+
+import os
+import math
+import json
+import time
+import shutil
+from collections import defaultdict
+from branca.element import MacroElement, Template
+from folium.elements import JSCSSMixin
+from folium.plugins import MarkerCluster
+
+zoom_minimo = 2
+zoom_detalle = 13 # Desde este zoom se ven los puntos sueltos.
+pixeles_celda = 80 # Tamaño de las celdas de los grupos en la pantalla.
+celdas_tesela = 32 # Lado de las teselas de grupos, en celdas (unos 2500 píxeles).
+grados_tesela = 0.25 # Lado de las teselas de puntos sueltos.
+decimales = 6 # Precisión de las coordenadas en los archivos (unos 10 cm).
+
+class CapasEscalables(JSCSSMixin, MacroElement):
+    _template = Template('''
+        {% macro script(this, kwargs) %}
+        (function () {
+            var mapa = {{ this._parent.get_name() }};
+            var base = {{ this.base|tojson }};
+            var sello = {{ this.sello }};
+            var zoomDetalle = {{ this.zoom_detalle }};
+            var popup = {{ this.plantilla_popup }};
+            // Nivel de zoom -> tamaño de sus teselas en grados y teselas con puntos.
+            var niveles = {{ this.niveles|tojson }};
+            var zooms = Object.keys(niveles).map(Number).sort(function (a, b) { return a - b; });
+            for (var z in niveles) { niveles[z].teselas = new Set(niveles[z].teselas); }
+
+            // Capas ya cargadas y funciones que esperan a cada una.
+            var datos = {}, esperando = {};
+            window.cargarCapa = function (nombre, geojson) {
+                datos[nombre] = geojson;
+                (esperando[nombre] || []).forEach(function (listo) { listo(geojson); });
+                delete esperando[nombre];
+            };
+            function cargar(nombre, listo) {
+                if (datos[nombre]) { listo(datos[nombre]); return; }
+                if (esperando[nombre]) { esperando[nombre].push(listo); return; }
+                esperando[nombre] = [listo];
+                var script = document.createElement('script');
+                script.charset = 'utf-8';
+                script.src = base + '/' + nombre + '.js?v=' + sello;
+                document.head.appendChild(script);
+            }
+
+            var grupos = L.featureGroup().addTo(mapa);
+            var sueltos = L.markerClusterGroup({chunkedLoading: true}).addTo(mapa);
+            var nivelActual = null, puestas = {}, version = 0;
+
+            function marcador(f) {
+                var c = f.geometry.coordinates;
+                return L.marker([c[1], c[0]]).bindPopup(function () { return popup(f.properties); });
+            }
+            function grupo(f) {
+                var c = f.geometry.coordinates, p = f.properties;
+                if (p.elementos === 1) { return marcador(f); }
+                var clase = p.peso < 10 ? 'small' : (p.peso < 100 ? 'medium' : 'large');
+                var icono = L.divIcon({
+                    html: '<div><span>' + p.peso + '</span></div>',
+                    className: 'marker-cluster marker-cluster-' + clase,
+                    iconSize: L.point(40, 40)
+                });
+                return L.marker([c[1], c[0]], {icon: icono}).on('click', function () {
+                    mapa.fitBounds(p.limites);
+                });
+            }
+
+            function actualizar() {
+                var zoom = mapa.getZoom(), v = ++version;
+                var nivel = zooms[0];
+                zooms.forEach(function (z) { if (z <= zoom) { nivel = z; } });
+                if (nivel !== nivelActual) {
+                    grupos.clearLayers();
+                    sueltos.clearLayers();
+                    puestas = {};
+                    nivelActual = nivel;
+                }
+
+                var grados = niveles[nivel].grados, teselas = niveles[nivel].teselas;
+                var b = mapa.getBounds().pad(0.2);
+                for (var i = Math.floor(b.getSouth() / grados); i <= Math.floor(b.getNorth() / grados); i++) {
+                    for (var j = Math.floor(b.getWest() / grados); j <= Math.floor(b.getEast() / grados); j++) {
+                        var clave = i + '_' + j;
+                        if (!teselas.has(clave) || puestas[clave]) { continue; }
+                        puestas[clave] = v;
+                        (function (clave, v) {
+                            cargar('z' + nivel + '_' + clave, function (geojson) {
+                                if (puestas[clave] !== v) { return; }
+                                if (nivel >= zoomDetalle) {
+                                    sueltos.addLayers(geojson.features.map(marcador));
+                                } else {
+                                    geojson.features.forEach(function (f) { grupos.addLayer(grupo(f)); });
+                                }
+                            });
+                        })(clave, v);
+                    }
+                }
+            }
+
+            mapa.on('moveend', actualizar);
+            actualizar();
+        })();
+        {% endmacro %}
+    ''')
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, base, niveles, plantilla_popup):
+        super().__init__()
+        self._name = 'CapasEscalables'
+        self.base = base
+        self.niveles = niveles
+        self.plantilla_popup = plantilla_popup
+        self.zoom_detalle = zoom_detalle
+        # Cambia en cada versión del mapa, para no usar teselas antiguas de la caché.
+        self.sello = time.time_ns() // 1000000
+
+# Tamaño en grados de las celdas de los grupos para un nivel de zoom
+#   (a ese zoom, el mundo entero mide 256 * 2^zoom píxeles).
+def tamaño_celda(zoom):
+    return 360 / 2 ** zoom * pixeles_celda / 256
+
+# Clave 'i_j' de la tesela en la que cae un punto en un nivel de zoom.
+def clave_tesela(zoom, lat, lon):
+    if zoom >= zoom_detalle:
+        return f'{math.floor(lat / grados_tesela)}_{math.floor(lon / grados_tesela)}'
+    celda = tamaño_celda(zoom)
+    return f'{math.floor(lat / celda) // celdas_tesela}_{math.floor(lon / celda) // celdas_tesela}'
+
+# Agrupamos los puntos en celdas para cada nivel de zoom entre
+#   'zoom_minimo' y 'zoom_detalle'. Diccionario zoom -> {(i, j) de la
+#   celda: grupo}, y cada grupo es una lista [elementos, peso, suma_lat,
+#   suma_lon, lat_min, lon_min, lat_max, lon_max, propiedades del punto
+#   si es uno solo].
+def agrupar(puntos):
+    zoom = zoom_detalle - 1
+    celda = tamaño_celda(zoom)
+    celdas = {}
+    for lat, lon, peso, propiedades in puntos:
+        clave = (math.floor(lat / celda), math.floor(lon / celda))
+        g = celdas.get(clave)
+        if g is None:
+            celdas[clave] = [1, peso, lat, lon, lat, lon, lat, lon, propiedades]
+        else:
+            sumar_grupo(g, [1, peso, lat, lon, lat, lon, lat, lon, None])
+
+    niveles = {zoom: celdas}
+    for zoom in range(zoom_detalle - 2, zoom_minimo - 1, -1):
+        superiores = {}
+        for (i, j), g in niveles[zoom + 1].items():
+            clave = (i // 2, j // 2)
+            if clave in superiores:
+                sumar_grupo(superiores[clave], g)
+            else:
+                superiores[clave] = list(g)
+        niveles[zoom] = superiores
+
+    return niveles
+
+def sumar_grupo(g, otro):
+    g[0] += otro[0]
+    g[1] += otro[1]
+    g[2] += otro[2]
+    g[3] += otro[3]
+    g[4], g[5] = min(g[4], otro[4]), min(g[5], otro[5])
+    g[6], g[7] = max(g[6], otro[6]), max(g[7], otro[7])
+    g[8] = None
+
+def punto_geojson(lat, lon, propiedades):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(lon, decimales), round(lat, decimales)]},
+        'properties': propiedades
+    }
+
+def grupo_geojson(g):
+    elementos, peso, suma_lat, suma_lon, lat_min, lon_min, lat_max, lon_max, propiedades = g
+    return punto_geojson(suma_lat / elementos, suma_lon / elementos, {
+        **(propiedades or {}),
+        'elementos': elementos,
+        'peso': peso,
+        'limites': [[lat_min, lon_min], [lat_max, lon_max]]
+    })
+
+# Escribimos una capa como GeoJSON dentro de 'cargarCapa(...)'. Con un
+#   nombre temporal y un renombrado atómico, porque el mapa puede estar
+#   abierto mientras se actualiza.
+def escribir_capa(carpeta, nombre, entidades):
+    geojson = json.dumps({'type': 'FeatureCollection', 'features': entidades},
+                         ensure_ascii=False, separators=(',', ':'))
+    destino = os.path.join(carpeta, f'{nombre}.js')
+    with open(f'{destino}.parcial', 'w', encoding='utf-8') as f:
+        f.write(f'cargarCapa({json.dumps(nombre)},{geojson});')
+    os.replace(f'{destino}.parcial', destino)
+
+# Separamos de cada punto (diccionario con 'latitud', 'longitud' y
+#   opcionalmente 'peso') sus propiedades para el popup.
+def preparar_puntos(puntos):
+    preparados = []
+    for punto in puntos:
+        propiedades = {k: v for k, v in punto.items() if k not in ('latitud', 'longitud', 'peso')}
+        preparados.append((punto['latitud'], punto['longitud'], punto.get('peso', 1), propiedades))
+    return preparados
+
+def entidad_punto(punto):
+    lat, lon, _, propiedades = punto
+    return punto_geojson(lat, lon, propiedades)
+
+# Repartimos cada nivel en teselas. Diccionario zoom -> (lado de las
+#   teselas en grados, {clave: grupos o puntos}, función que los pasa a
+#   GeoJSON).
+def repartir(puntos):
+    niveles = {}
+    for zoom, celdas in agrupar(puntos).items():
+        teselas = defaultdict(list)
+        for (i, j), g in celdas.items():
+            teselas[f'{i // celdas_tesela}_{j // celdas_tesela}'].append(g)
+        niveles[zoom] = (tamaño_celda(zoom) * celdas_tesela, teselas, grupo_geojson)
+
+    teselas = defaultdict(list)
+    for punto in puntos:
+        teselas[clave_tesela(zoom_detalle, punto[0], punto[1])].append(punto)
+    niveles[zoom_detalle] = (grados_tesela, teselas, entidad_punto)
+    return niveles
+
+# Escribimos los archivos de datos junto a 'ruta_html' y añadimos al mapa
+#   el script que los carga. 'plantilla_popup' es una función de
+#   JavaScript que recibe las propiedades de un punto y devuelve el HTML.
+#   Con 'cambiados', una lista de posiciones (lat, lon) donde se han
+#   añadido, movido o quitado puntos desde la última vez, sólo se
+#   reescriben (o se borran, si se han quedado vacías) las teselas que
+#   las contienen. Devuelve el número de teselas escritas o borradas.
+def añadir_capas(mapa, puntos, ruta_html, plantilla_popup, cambiados=None):
+    puntos = preparar_puntos(puntos)
+    carpeta = f'{os.path.splitext(ruta_html)[0]}_datos'
+    parcial = cambiados is not None and os.path.isdir(carpeta)
+    if not parcial:
+        if os.path.isdir(carpeta):
+            shutil.rmtree(carpeta)
+        os.makedirs(carpeta)
+
+    escritas = 0
+    teselas_niveles = {}
+    for zoom, (grados, teselas, entidad) in repartir(puntos).items():
+        afectadas = {clave_tesela(zoom, lat, lon) for lat, lon in cambiados} if parcial else teselas
+        for clave in afectadas:
+            if clave in teselas:
+                escribir_capa(carpeta, f'z{zoom}_{clave}', [entidad(e) for e in teselas[clave]])
+            elif os.path.exists(os.path.join(carpeta, f'z{zoom}_{clave}.js')):
+                os.remove(os.path.join(carpeta, f'z{zoom}_{clave}.js'))
+            else:
+                continue
+            escritas += 1
+        teselas_niveles[zoom] = {'grados': grados, 'teselas': sorted(teselas)}
+
+    mapa.add_child(CapasEscalables(os.path.basename(carpeta), teselas_niveles, plantilla_popup))
+    return escritas
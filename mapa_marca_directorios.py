@@ -6,22 +6,22 @@ Cada directorio tiene el nombre '(ciudad)(pais)(año-mes)', así que cada
 marca será el nombre de la ciudad y el número de fotos que tiene ese
 directorio.
 
-Para crear las marcas en el mapa con la localización del lugar que sea
-el nombre del pueblo o ciudad y el pais, la hacemos con la librería
-'geopy'. Esta librería convierte nombres de lugares en coordenadas, 
-aptas para la geolocalización con 'Folium'.
-
-Así que dividimos el nombre del directorio en ciudad, pais y fecha, 
-dividiendo el nombre en 3 partes separadas por '), y posteriormente
-le quitaremos a cada parte el primer carácter que será '(', para
-quedarnos con el string que nos interesa (ciudad, pais y fecha).
-
-Posteriormente utilizaremos la ciudad y el pais para obtener la 
-geolocalización y poder colocar la marca, que contendrá el nombre de
-la ciudad y el número de fotos que tiene ese lugar.
+Las marcas las colocamos con el índice de carpetas del catálogo SQLite
+(ver 'catalogo.py'): al importar cada foto ya sabíamos sus coordenadas
+GPS exactas, así que cada carpeta guarda el número de archivos, el centro
+de sus fotos y sus límites. Lo leemos de una sola vez, sin volver a
+geocodificar el nombre de la carpeta con 'geopy' y sin recorrer con
+'os.listdir' los directorios de 'ruta_principal'. El mapa se ajusta a
+los límites de todas las carpetas.
+
+Del nombre del directorio sólo sacamos la ciudad para la marca,
+dividiendo el nombre en 3 partes separadas por '), y quitando a cada
+parte el primer carácter que será '('.
 
 Al presionar sobre la marca, se abrirá un cuadro de diálogo con el 
 listado de las fotos que hay dentro.
+
+Al terminar se muestra el resumen de las métricas (ver 'metricas.py').
 '''
 
 import folium
@@ -29,43 +29,52 @@ import os
 import webbrowser
 import json
 import re
-import time
-from geopy.geocoders import Nominatim
+import metricas
+from catalogo import Catalogo
 
 ruta_mapas = './modulo_folium/'
 ruta_principal = 'E:/BackupFotos'
-
-# Iniciamos el geocodificador.
-geolocator = Nominatim(user_agent="geoapi")
+ruta_catalogo = './catalogo.db'
+ubicacion_inicial = [40.4165, -3.70256] # Madrid, si aún no hay carpetas con GPS.
 
 # Función para obtener la lista de los directorios de la ruta principal.
 def cargar_directorios(ruta):
-    directorios = os.listdir(ruta)
-
-    # Inicializamos la localización inicial (Madrid, España).
-    location = geolocator.geocode('Madrid, España', timeout=10)
-
-    # Creamos un mapa centrado en España (Madrid).
-    mapa = folium.Map(location=[location.latitude, location.longitude], zoom_start=10)
-
-    for directorio in directorios:
-        archivos = os.listdir(f'{ruta_principal}/{directorio}')
-        numero = len(archivos)
-
+    # Directorios '(ciudad)(pais)(año-mes)' con su número de archivos, su
+    #   centro y sus límites. Los que no tienen fotos con GPS no se marcan.
+    with metricas.medir('catalogo', archivos=0):
+        catalogo = Catalogo(ruta_catalogo)
+        directorios = {d: i for d, i in catalogo.indice_carpetas().items() if i['latitud'] is not None}
+        catalogo.cerrar()
+    metricas.contar('archivos', len(directorios))
+
+    with metricas.medir('mapa', archivos=len(directorios)):
+        crear_mapa(directorios)
+
+# Creamos el mapa con una marca por carpeta.
+def crear_mapa(directorios):
+    mapa = folium.Map(location=ubicacion_inicial, zoom_start=10)
+
+    for directorio, indice in directorios.items():
         ciudad = extraer_ciudad(directorio)
 
-        lugar = f'{ciudad[0]}, {ciudad[1]}'
-        location = geolocator.geocode(lugar, timeout=10)
-
         folium.Marker(
-            [location.latitude, location.longitude],
-            popup=f'{ciudad[0]} - {numero} archivos',
+            [indice['latitud'], indice['longitud']],
+            popup=f'{ciudad[0]} - {indice["numero"]} archivos',
             tooltip='Haz clic para ver'
         ).add_to(mapa)
-        time.sleep(1) # Esperamos 1 segundo para dar tiempo al geolocalizador.
+
+    # Ajustamos el mapa a los límites de todas las carpetas.
+    if directorios:
+        mapa.fit_bounds(limites_totales(directorios.values()))
     
     mapa.save(f'{ruta_mapas}mapa_marca_directorio.html')
         
+# Límites [[lat_min, lon_min], [lat_max, lon_max]] de varias carpetas del índice.
+def limites_totales(indices):
+    limites = [i['limites'] for i in indices]
+    return [[min(l[0][0] for l in limites), min(l[0][1] for l in limites)],
+            [max(l[1][0] for l in limites), max(l[1][1] for l in limites)]]
+
 # Función para extraer el nombre de la ciudad.
 def extraer_ciudad(nombre):
     ciudad = nombre.split(')')[0][1:]
@@ -81,4 +90,4 @@ def main():
     webbrowser.open(os.path.abspath(f'{ruta_mapas}mapa_marca_directorio.html'))
 
 if __name__ == '__main__':
-    main()
+    metricas.ejecutar('mapa_marca_directorios', main)
@@ -3,40 +3,98 @@ Script en Python.
 Con este script vamos a crear un mapa con marcas de las fotos
 existentes en distintos directorios.
 Estas marcas pertenecerán a una fotográfia.
+
+En cada marca se ve una miniatura de la foto, de la caché de miniaturas
+('miniaturas.py'), en lugar de la foto entera codificada en base64. Las
+miniaturas que falten se crean en paralelo antes de hacer el mapa. Por
+defecto el HTML sólo enlaza las miniaturas (con una ruta relativa a la
+carpeta del mapa); con 'incrustar_miniaturas' van dentro del HTML en
+base64, para poder mover el mapa a otro sitio (unos pocos KB por foto).
+
+Con 'modo_escalable' (por defecto) las marcas no van dentro del HTML: se
+escriben agrupadas por zoom y en teselas en archivos aparte, que el mapa
+carga según lo que se está viendo (ver 'mapa_escalable.py'). Así se
+puede abrir un mapa con 100.000 fotos. Sin él, cada foto es un
+'folium.Marker' dentro del HTML, como antes.
+
+Al terminar se muestra el resumen de las métricas (lectura del catálogo,
+miniaturas y mapa) y se guarda en 'metricas.json' (ver 'metricas.py').
+Con '--perfil' se ejecuta además con 'cProfile'.
 '''
 
 import folium
 import base64
 import os
+import pathlib
 import webbrowser
-import json
-from PIL import Image
+import metricas
+from catalogo import Catalogo
+from miniaturas import generar_miniaturas
+from mapa_escalable import añadir_capas
 
 ruta_mapas = './modulo_folium/'
-ruta_duplicados = './duplicados.json'
+ruta_catalogo = './catalogo.db'
+incrustar_miniaturas = False
+modo_escalable = True
 
-# Función para cargar el json con los datos de las fotos.
-def cargar_json(ruta):
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+# Popup de las fotos en el modo escalable, hecho en el navegador a partir
+#   de las propiedades de cada foto: la miniatura y la fecha debajo.
+plantilla_popup = '''function (p) {
+    var imagen = p.miniatura ? "<img src='" + p.miniatura + "' width='100' height='80'><br>" : "";
+    return "<div style='text-align:center'>" + imagen +
+        "<span style='font-size:8pt; color:#333'>" + p.fecha + "</span></div>";
+}'''
+
+# Dirección de la miniatura para el 'src' de la imagen.
+def fuente_miniatura(miniatura):
+    if incrustar_miniaturas:
+        with open(miniatura, 'rb') as img_file:
+            return f'data:image/jpeg;base64,{base64.b64encode(img_file.read()).decode()}'
+    try:
+        return os.path.relpath(miniatura, ruta_mapas).replace(os.sep, '/')
+    except ValueError: # En Windows, si están en discos distintos.
+        return pathlib.Path(os.path.abspath(miniatura)).as_uri()
 
 # Función para crear el mapa con las marcas.
 def crear_mapa(registros):
     mapa = folium.Map(
         location=[registros[0]['latitud'], registros[0]['longitud']], 
         zoom_start=8)
-    
-    for r in registros:
-        # Añadimos marca con la imagen codificada en base64.
-        with open(r['ruta'], 'rb') as img_file:
-            encoded = base64.b64encode(img_file.read()).decode()
 
-        # Crear el HTML con la imagen embebida y la fecha de la misma debajo.
+    # Miniaturas de todas las fotos, creando las que falten.
+    with metricas.medir('miniaturas', archivos=len(registros)):
+        miniaturas = generar_miniaturas(registros)
+    ruta_html = f'{ruta_mapas}mapa_historial.html'
+    with metricas.medir('mapa', archivos=len(registros)):
+        escribir_mapa(mapa, registros, miniaturas, ruta_html)
+
+# Escribimos las marcas de las fotos en el mapa y lo guardamos.
+def escribir_mapa(mapa, registros, miniaturas, ruta_html):
+
+    if modo_escalable:
+        puntos = []
+        for r in registros:
+            miniatura = miniaturas.get(r['hash'])
+            puntos.append({
+                'latitud': r['latitud'],
+                'longitud': r['longitud'],
+                'fecha': r['fecha'],
+                'miniatura': fuente_miniatura(miniatura) if miniatura else None
+            })
+        añadir_capas(mapa, puntos, ruta_html, plantilla_popup)
+        mapa.fit_bounds([[min(r['latitud'] for r in registros), min(r['longitud'] for r in registros)],
+                         [max(r['latitud'] for r in registros), max(r['longitud'] for r in registros)]])
+        mapa.save(ruta_html)
+        return
+
+    for r in registros:
+        # Crear el HTML con la miniatura y la fecha de la misma debajo.
+        #   Si no hay miniatura (videos, fotos que ya no están), sólo la fecha.
+        miniatura = miniaturas.get(r['hash'])
+        imagen = f"<img src='{fuente_miniatura(miniatura)}' width='100' height='80'><br>" if miniatura else ''
         imagen_html = f"""
         <div style='text-align:center'>
-            <img src='data:image/jpeg;base64, {encoded}' width='100' height='80'><br>
+            {imagen}
             <span style='font-size:8pt; color:#333'>{r['fecha']}</span>
         </div>
         """
@@ -50,12 +108,16 @@ def crear_mapa(registros):
             icon=folium.Icon(color='red', icon='camera')
         ).add_to(mapa)
 
-    mapa.save(f'{ruta_mapas}mapa_historial.html')
+    mapa.save(ruta_html)
 
 # Función principal.
 def main():
-    # Cargamos los datos de los archivos a través de un json
-    historial = cargar_json(ruta_duplicados)
+    # Cargamos los datos de los archivos a través del catálogo, y nos
+    #   quedamos sólo con los que tienen coordenadas GPS.
+    with metricas.medir('catalogo', archivos=0):
+        catalogo = Catalogo(ruta_catalogo)
+        historial = [r for r in catalogo.registros if r.get('latitud') is not None]
+    metricas.contar('archivos', len(historial))
 
     # Llamamos a la función para crear el mapa, como parámetro le mandamos
     #   los datos de los registros del json.
@@ -64,6 +126,6 @@ def main():
     # Abrimos automáticamente el mapa en el navegador.
     webbrowser.open(os.path.abspath(f'{ruta_mapas}mapa_historial.html'))    
 
-# Ejecutamos el script.
+# Ejecutamos el script, con el resumen de sus métricas al terminar.
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    metricas.ejecutar('mapa_marca_fotos', main)
\ No newline at end of file
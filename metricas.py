@@ -0,0 +1,216 @@
+'''
+Script en Python. Contiene las métricas de rendimiento de los programas:
+cuánto tarda cada etapa, cuántos archivos y bytes pasan por ella, y
+cuántos aciertos tienen las cachés.
+
+Antes, cuando una importación iba lenta, 'main()' sólo mostraba una
+línea por archivo, y no había forma de saber si el tiempo se iba en el
+ADB, en Nominatim, en los hashes o en la copia.
+
+CLASE Metricas:
+Acumula los datos de una ejecución. Se puede usar desde varios hilos a
+    la vez (cada suma se hace con un 'threading.Lock').
+    - medir(etapa, bytes, archivos): bloque 'with' que suma a la etapa su
+        tiempo, sus bytes y sus archivos.
+    - anotar(etapa, segundos, bytes, archivos): lo mismo, con un tiempo
+        ya medido (por ejemplo en otro proceso).
+    - contar(contador, n): suma 'n' a un contador ('copiados',
+        'duplicados'...). Los contadores 'archivos' y 'bytes' son los
+        del total de la ejecución, para el rendimiento del resumen.
+    - cache(nombre, aciertos, fallos): aciertos y fallos de una caché.
+    - resumen(): todo en un diccionario, con los milisegundos por
+        archivo y los MB/s de cada etapa, y el porcentaje de aciertos de
+        cada caché.
+    Los segundos de una etapa son la suma de los de todos sus hilos (el
+    tiempo de trabajo, no el de reloj), así que con varios trabajadores
+    pueden sumar más que la duración total.
+
+El módulo tiene unas métricas globales ('actuales'), y las funciones
+'medir', 'anotar', 'contar' y 'cache' para usarlas sin pasarlas de
+función en función, como el 'geolocalizador' de la importación.
+
+Función (ejecutar):
+Ejecuta la función principal de un programa con las métricas. Al
+    terminar (aunque sea con un error) muestra el resumen y lo añade al
+    final de 'ruta_metricas' (JSON, con las últimas 'max_ejecuciones'
+    ejecuciones de todos los programas).
+    Con '--perfil' en la línea de comandos (o 'perfilar' a True) se
+    ejecuta además con 'cProfile': el perfil completo se guarda en
+    'perfil_<programa>.prof' (para 'snakeviz' o 'pstats') y se muestran
+    las 'lineas_perfil' funciones con más tiempo acumulado. Los hilos de
+    la tubería ('pipeline.py') se perfilan cada uno con 'perfil_hilo' y
+    se suman al perfil. Los procesos (hashes de la carga masiva,
+    miniaturas, verificación) no entran en 'cProfile': para ellos se
+    muestra el PID, para engancharse con
+    'py-spy record --subprocesses --pid <PID>'. Los hilos tienen el
+    nombre de su etapa, así que se distinguen en 'py-spy dump'.
+'''
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+from catalogo import cargar_json, guardar_json
+
+ruta_metricas = './metricas.json'
+max_ejecuciones = 200
+perfilar = False # O '--perfil' en la línea de comandos.
+lineas_perfil = 25
+
+class Metricas:
+    def __init__(self):
+        self.bloqueo = threading.Lock()
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.contadores = {}
+        self.caches = {}
+
+    @contextmanager
+    def medir(self, etapa, bytes=0, archivos=1):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.anotar(etapa, time.perf_counter() - inicio, bytes, archivos)
+
+    def anotar(self, etapa, segundos, bytes=0, archivos=1):
+        with self.bloqueo:
+            datos = self.etapas.setdefault(etapa, {'archivos': 0, 'bytes': 0, 'segundos': 0.0})
+            datos['archivos'] += archivos
+            datos['bytes'] += bytes or 0
+            datos['segundos'] += segundos
+
+    def contar(self, contador, n=1):
+        with self.bloqueo:
+            self.contadores[contador] = self.contadores.get(contador, 0) + n
+
+    def cache(self, nombre, aciertos, fallos):
+        with self.bloqueo:
+            self.caches[nombre] = {'aciertos': aciertos, 'fallos': fallos}
+
+    def resumen(self):
+        with self.bloqueo:
+            duracion = time.perf_counter() - self.inicio
+            etapas = {}
+            for etapa, datos in self.etapas.items():
+                etapas[etapa] = dict(datos, segundos=round(datos['segundos'], 4))
+                if datos['archivos']:
+                    etapas[etapa]['ms_por_archivo'] = round(datos['segundos'] / datos['archivos'] * 1000, 3)
+                if datos['bytes'] and datos['segundos']:
+                    etapas[etapa]['mb_por_segundo'] = round(datos['bytes'] / datos['segundos'] / 1024 / 1024, 1)
+            caches = {}
+            for nombre, datos in self.caches.items():
+                total = datos['aciertos'] + datos['fallos']
+                caches[nombre] = dict(datos, porcentaje=round(datos['aciertos'] / total * 100, 1) if total else None)
+            resumen = {
+                'duracion': round(duracion, 3),
+                'etapas': etapas,
+                'contadores': dict(self.contadores),
+                'caches': caches
+            }
+        if duracion and 'archivos' in resumen['contadores']:
+            resumen['archivos_por_segundo'] = round(resumen['contadores']['archivos'] / duracion, 1)
+        if duracion and 'bytes' in resumen['contadores']:
+            resumen['mb_por_segundo'] = round(resumen['contadores']['bytes'] / duracion / 1024 / 1024, 1)
+        return resumen
+
+# Métricas de la ejecución en curso.
+actuales = Metricas()
+
+def medir(etapa, bytes=0, archivos=1):
+    return actuales.medir(etapa, bytes, archivos)
+
+def anotar(etapa, segundos, bytes=0, archivos=1):
+    actuales.anotar(etapa, segundos, bytes, archivos)
+
+def contar(contador, n=1):
+    actuales.contar(contador, n)
+
+def cache(nombre, aciertos, fallos):
+    actuales.cache(nombre, aciertos, fallos)
+
+# Mostramos el resumen de una ejecución por consola.
+def mostrar(programa, resumen):
+    print(f'📊 {programa} en {resumen["duracion"]:.1f} s')
+    if resumen['etapas']:
+        print(f'    {"etapa":<18}{"archivos":>9}{"segundos":>11}{"ms/archivo":>12}{"MB/s":>9}')
+        for etapa, datos in resumen['etapas'].items():
+            ms = f'{datos["ms_por_archivo"]:.2f}' if 'ms_por_archivo' in datos else '-'
+            mb = f'{datos["mb_por_segundo"]:.1f}' if 'mb_por_segundo' in datos else '-'
+            print(f'    {etapa:<18}{datos["archivos"]:>9}{datos["segundos"]:>11.2f}{ms:>12}{mb:>9}')
+    if resumen['contadores']:
+        print('    ' + ', '.join(f'{nombre} {valor}' for nombre, valor in resumen['contadores'].items()
+                                 if nombre != 'bytes'))
+    for nombre, datos in resumen['caches'].items():
+        if datos['porcentaje'] is not None:
+            print(f'    caché {nombre}: {datos["porcentaje"]:.0f}% de aciertos '
+                  f'({datos["aciertos"]} de {datos["aciertos"] + datos["fallos"]})')
+    if resumen.get('archivos_por_segundo'):
+        mb = f', {resumen["mb_por_segundo"]:.1f} MB/s' if 'mb_por_segundo' in resumen else ''
+        print(f'    {resumen["archivos_por_segundo"]:.1f} archivos/s{mb}')
+
+# Añadimos el resumen de una ejecución al archivo de métricas.
+def guardar(programa, resumen, ruta=None):
+    ruta = ruta or ruta_metricas
+    try:
+        ejecuciones = cargar_json(ruta)
+    except ValueError: # Archivo a medio escribir de una ejecución cortada.
+        ejecuciones = []
+    ejecuciones.append(dict(programa=programa, fecha=datetime.now().isoformat(timespec='seconds'), **resumen))
+    guardar_json(ejecuciones[-max_ejecuciones:], ruta)
+
+# Perfiles de los hilos de la ejecución en curso (con '--perfil').
+perfil_activo = False
+perfiles_hilos = []
+
+# Perfilamos el hilo actual mientras dura el bloque 'with', si la
+#   ejecución se está perfilando.
+def perfil_hilo():
+    if not perfil_activo:
+        return nullcontext()
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Desde Python 3.12 sólo puede haber un perfil activo, y ya
+        #   recoge todos los hilos.
+        return nullcontext()
+    perfil.disable()
+    perfiles_hilos.append(perfil)
+    return perfil
+
+# Ejecutamos la función principal de un programa con sus métricas.
+def ejecutar(programa, funcion):
+    global actuales, perfil_activo
+    actuales = Metricas()
+    perfil_activo = perfilar or '--perfil' in sys.argv
+    perfil = cProfile.Profile() if perfil_activo else None
+    if perfil:
+        print(f'🔬 Perfilando {programa} (PID {os.getpid()})')
+        perfil.enable()
+
+    try:
+        return funcion()
+    finally:
+        if perfil:
+            perfil.disable()
+            guardar_perfil(programa, perfil)
+            perfiles_hilos.clear()
+            perfil_activo = False
+
+        resumen = actuales.resumen()
+        mostrar(programa, resumen)
+        guardar(programa, resumen)
+
+def guardar_perfil(programa, perfil):
+    estadisticas = pstats.Stats(perfil)
+    for perfil_hilo in perfiles_hilos:
+        estadisticas.add(perfil_hilo)
+    ruta_perfil = f'perfil_{programa}.prof'
+    estadisticas.dump_stats(ruta_perfil)
+    estadisticas.sort_stats('cumulative').print_stats(lineas_perfil)
+    print(f'🔬 Perfil completo en {ruta_perfil}')
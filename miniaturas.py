@@ -0,0 +1,89 @@
+'''
+Script en Python. Contiene la caché de miniaturas de las fotos, para los
+mapas ('mapa_marca_fotos.py') y la ventana de PyQt.
+
+Antes cada marca del mapa llevaba la foto entera codificada en base64
+dentro del HTML, sólo para enseñarla a 100x80. Con unos miles de fotos
+el HTML pesaba varios GB y el navegador no podía abrirlo.
+
+Las miniaturas se guardan por su contenido: el nombre del archivo es el
+hash de la foto (el mismo que la clave del catálogo), repartidas en
+subcarpetas por sus dos primeros caracteres:
+    miniaturas/e2/e234ddda4cdbe82ce90a247a2e71f385.jpg
+Así la misma foto nunca se reduce dos veces, aunque se mueva o se
+renombre, y una miniatura que ya existe siempre es la correcta.
+
+Para hacerlas usamos 'draft()' de Pillow, que le pide al decodificador
+JPEG la imagen ya reducida (1/2, 1/4 u 1/8) sin decodificarla entera, y
+después 'thumbnail()' para el tamaño exacto. Giramos la miniatura según
+la orientación EXIF, porque al guardarla se pierden los metadatos. Se
+escribe con un nombre temporal y un renombrado atómico.
+
+Función (generar_miniaturas):
+Recibe los registros del catálogo y crea en paralelo (varios procesos)
+    las miniaturas que falten. Devuelve un diccionario hash -> ruta de la
+    miniatura, sin los archivos que no se han podido leer (videos, fotos
+    que ya no están...). Las que ya existían son los aciertos de la caché
+    en las métricas (ver 'metricas.py').
+'''
+
+import os
+import metricas
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+ruta_miniaturas = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'miniaturas')
+tamaño_miniatura = (200, 160) # El doble de lo que se ve en el mapa, para pantallas de alta densidad.
+calidad_jpeg = 80
+procesos = None # Número de procesos; None = uno por núcleo.
+
+# Ruta de la miniatura de un hash. Los hashes con prefijo de algoritmo
+#   ('blake2b:...') no pueden llevar ':' en el nombre de un archivo.
+def ruta_miniatura(hash_archivo, carpeta=None):
+    nombre = hash_archivo.replace(':', '_')
+    hexadecimal = hash_archivo.rsplit(':', 1)[-1]
+    return os.path.join(carpeta or ruta_miniaturas, hexadecimal[:2], f'{nombre}.jpg')
+
+# Creamos la miniatura de una foto. Devuelve la ruta, o None si no se ha
+#   podido leer la foto.
+def crear_miniatura(ruta_foto, destino, tamaño=tamaño_miniatura):
+    try:
+        with Image.open(ruta_foto) as imagen:
+            imagen.draft('RGB', tamaño)
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.thumbnail(tamaño)
+            if imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            parcial = f'{destino}.parcial'
+            imagen.save(parcial, 'JPEG', quality=calidad_jpeg, optimize=True)
+        os.replace(parcial, destino)
+        return destino
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+# Creamos las miniaturas que falten de los registros del catálogo.
+def generar_miniaturas(registros, carpeta=None, tamaño=tamaño_miniatura, procesos=procesos):
+    miniaturas, pendientes = {}, []
+    for registro in registros:
+        destino = ruta_miniatura(registro['hash'], carpeta)
+        if os.path.exists(destino):
+            miniaturas[registro['hash']] = destino
+        elif registro['ruta'].lower().endswith(('.jpg', '.jpeg')):
+            pendientes.append((registro['hash'], registro['ruta'], destino))
+    metricas.cache('miniaturas', len(miniaturas), len(pendientes))
+
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            resultados = ejecutor.map(
+                crear_miniatura,
+                [ruta for _, ruta, _ in pendientes],
+                [destino for _, _, destino in pendientes],
+                [tamaño] * len(pendientes),
+                chunksize=16)
+            for (hash_archivo, _, _), destino in zip(pendientes, resultados):
+                if destino:
+                    miniaturas[hash_archivo] = destino
+
+    return miniaturas
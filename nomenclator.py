@@ -0,0 +1,114 @@
+'''
+Script en Python. Contiene un geocodificador inverso sin conexión, a
+partir de un nomenclátor local de lugares con el formato de GeoNames
+(por ejemplo 'cities1000.txt' de https://download.geonames.org/export/dump/).
+
+Aunque tengamos la caché de 'geocodificador.py', la primera vez que
+visitamos un sitio nuevo la importación se queda esperando a Nominatim,
+y sin red directamente no puede clasificar las fotos.
+
+CLASE Nomenclator:
+Carga el archivo TSV de GeoNames, del que sólo usamos las columnas:
+    1: nombre del lugar
+    4: latitud
+    5: longitud
+    8: código del país (ISO, por ejemplo 'ES')
+    14: población
+Los nombres de los países los sacamos de un segundo TSV con el código y
+    el nombre ('código<TAB>nombre'), para poder tenerlos en español como
+    los devuelve Nominatim. Si no está el país, usamos el código.
+Los lugares se guardan en una rejilla (diccionario de celdas de
+    'tamaño_celda' grados). Para buscar el lugar más cercano a unas
+    coordenadas se miran las celdas de alrededor, en anillos cada vez
+    más grandes, hasta que ningún lugar de fuera puede estar más cerca.
+    Así cada búsqueda tarda microsegundos, aunque el nomenclátor tenga
+    cientos de miles de lugares.
+Si el lugar más cercano está a más de 'distancia_maxima_km', se considera
+    que no lo conocemos (y se puede preguntar a Nominatim).
+'''
+
+import csv
+import math
+from collections import defaultdict
+
+km_por_grado = 111.2
+
+class Nomenclator:
+    def __init__(self, ruta, ruta_paises=None, tamaño_celda=0.5,
+                 poblacion_minima=0, distancia_maxima_km=30):
+        self.tamaño_celda = tamaño_celda
+        self.distancia_maxima_km = distancia_maxima_km
+        self.celdas = defaultdict(list)
+        self.paises = cargar_paises(ruta_paises) if ruta_paises else {}
+        self.total = 0
+
+        with open(ruta, 'r', encoding='utf-8', newline='') as f:
+            for columnas in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(columnas) < 15 or columnas[0].startswith('#'):
+                    continue
+
+                poblacion = int(columnas[14] or 0)
+                if poblacion < poblacion_minima:
+                    continue
+
+                lat, lon = float(columnas[4]), float(columnas[5])
+                pais = self.paises.get(columnas[8], columnas[8])
+                self.celdas[self.celda(lat, lon)].append((lat, lon, columnas[1], pais))
+                self.total += 1
+
+    def celda(self, lat, lon):
+        return (math.floor(lat / self.tamaño_celda), math.floor(lon / self.tamaño_celda))
+
+    # Devuelve (ciudad, pais) del lugar más cercano, o None.
+    def buscar(self, lat, lon):
+        i, j = self.celda(lat, lon)
+        # Las distancias las medimos en grados de latitud, corrigiendo la
+        #   longitud por el coseno de la latitud.
+        escala_lon = max(math.cos(math.radians(lat)), 0.01)
+        limite = self.distancia_maxima_km / km_por_grado
+        # Número máximo de anillos que hace falta mirar.
+        max_anillos = math.ceil(limite / (self.tamaño_celda * escala_lon)) + 1
+
+        mejor, mejor_distancia = None, float('inf')
+        for anillo in range(max_anillos + 1):
+            for celda in anillo_celdas(i, j, anillo):
+                for lugar in self.celdas.get(celda, ()):
+                    distancia = math.hypot(lugar[0] - lat, (lugar[1] - lon) * escala_lon)
+                    if distancia < mejor_distancia:
+                        mejor, mejor_distancia = lugar, distancia
+
+            # Cualquier lugar fuera de los anillos ya mirados está, como poco,
+            #   a 'anillo' celdas de distancia.
+            if mejor_distancia <= anillo * self.tamaño_celda * escala_lon:
+                break
+
+        if mejor is None or mejor_distancia > limite:
+            return None
+        return mejor[2], mejor[3]
+
+    # Devuelve la ubicación con el formato de las carpetas '(ciudad)(pais)'.
+    def ubicacion(self, lat, lon):
+        lugar = self.buscar(lat, lon)
+        return f'({lugar[0]})({lugar[1]})' if lugar else None
+
+# Celdas que forman el anillo 'n' alrededor de la celda (i, j).
+def anillo_celdas(i, j, n):
+    if n == 0:
+        yield (i, j)
+        return
+
+    for d in range(-n, n + 1):
+        yield (i - n, j + d)
+        yield (i + n, j + d)
+    for d in range(-n + 1, n):
+        yield (i + d, j - n)
+        yield (i + d, j + n)
+
+# Leemos el TSV 'código<TAB>nombre' de los países.
+def cargar_paises(ruta):
+    paises = {}
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        for columnas in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(columnas) >= 2 and not columnas[0].startswith('#'):
+                paises[columnas[0]] = columnas[1]
+    return paises
@@ -0,0 +1,108 @@
+'''
+Script en Python. Contiene una tubería (pipeline) de etapas que se
+ejecutan a la vez, cada una en sus propios hilos.
+
+Antes, en 'main()' cada archivo pasaba por todas las fases (descarga,
+lectura de metadatos, hash y copia final) antes de empezar con el
+siguiente, así que mientras se transfería por USB la CPU estaba parada,
+y mientras se calculaba el hash el disco estaba parado.
+
+CLASE Etapa:
+Define una fase de la tubería: su nombre, la función que se aplica a
+    cada elemento y el número de hilos (trabajadores) que la ejecutan.
+    La función recibe un elemento y devuelve el elemento para la etapa
+    siguiente, o None si el elemento se descarta.
+
+Función (ejecutar_pipeline):
+Une las etapas con colas limitadas ('queue.Queue(maxsize)'), de modo que
+    si una etapa va más lenta que la anterior, ésta se frena en lugar de
+    acumular archivos en memoria (o en la carpeta temporal).
+    Cuando los elementos de una etapa se acaban, el último trabajador
+    en terminar avisa a la etapa siguiente con una marca de fin por
+    cada uno de sus trabajadores.
+    Un error en un elemento se muestra por consola y sólo se descarta
+    ese elemento, el resto sigue su camino (y se cuenta en las métricas,
+    ver 'metricas.py').
+    Cada hilo se llama como su etapa ('hash-0', 'colocacion-0'...), y con
+    '--perfil' cada uno se perfila por separado.
+'''
+
+import threading
+from queue import Queue
+import metricas
+
+# Marca que indica a una etapa que ya no van a llegar más elementos.
+FIN = object()
+
+class Etapa:
+    def __init__(self, nombre, funcion, trabajadores=1):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.trabajadores = max(1, trabajadores)
+
+# Ejecuta todas las etapas sobre los elementos y espera a que terminen.
+def ejecutar_pipeline(elementos, etapas, tamaño_cola=8):
+    colas = [Queue(maxsize=tamaño_cola) for _ in range(len(etapas) + 1)]
+    hilos = []
+
+    for i, etapa in enumerate(etapas):
+        entrada, salida = colas[i], colas[i + 1]
+        # Contador de trabajadores que siguen vivos en esta etapa.
+        pendientes = [etapa.trabajadores]
+        bloqueo = threading.Lock()
+        # Marcas de fin que necesita la etapa siguiente (una por trabajador).
+        fines = etapas[i + 1].trabajadores if i + 1 < len(etapas) else 1
+
+        for n in range(etapa.trabajadores):
+            hilo = threading.Thread(
+                target=trabajador,
+                args=(etapa, entrada, salida, pendientes, bloqueo, fines),
+                name=f'{etapa.nombre}-{n}',
+                daemon=True)
+            hilo.start()
+            hilos.append(hilo)
+
+    # Consumimos la última cola para que la última etapa no se bloquee.
+    consumidor = threading.Thread(target=vaciar, args=(colas[-1],), daemon=True)
+    consumidor.start()
+
+    for elemento in elementos:
+        colas[0].put(elemento)
+    for _ in range(etapas[0].trabajadores if etapas else 1):
+        colas[0].put(FIN)
+
+    for hilo in hilos:
+        hilo.join()
+    consumidor.join()
+
+# Bucle de un hilo trabajador de una etapa.
+def trabajador(etapa, entrada, salida, pendientes, bloqueo, fines):
+    with metricas.perfil_hilo():
+        while True:
+            elemento = entrada.get()
+            if elemento is FIN:
+                break
+
+            try:
+                resultado = etapa.funcion(elemento)
+            except Exception as e:
+                print(f'Error en la etapa {etapa.nombre}: {e}')
+                metricas.contar(f'errores_{etapa.nombre}')
+                continue
+
+            if resultado is not None:
+                salida.put(resultado)
+
+    # El último trabajador de la etapa avisa a la etapa siguiente.
+    with bloqueo:
+        pendientes[0] -= 1
+        ultimo = pendientes[0] == 0
+
+    if ultimo:
+        for _ in range(fines):
+            salida.put(FIN)
+
+# La etapa siguiente a la última: descarta resultados hasta la marca de fin.
+def vaciar(cola):
+    while cola.get() is not FIN:
+        pass
@@ -0,0 +1,82 @@
+'''
+Script en Python. Es un 'adb' falso para probar la importación desde el
+movil sin tener un movil conectado.
+
+Las rutas del movil ('/sdcard/DCIM/Camera') se buscan dentro del
+directorio de la variable de entorno 'ADB_FALSO_RAIZ' (por defecto
+'./pruebas/datos/movil'). Si la variable 'ADB_FALSO_SIN_DISPOSITIVO'
+existe, 'devices' no devuelve ningún dispositivo.
+
+Para usarlo, en 'copia_clasificador_fotos.py' ponemos:
+    ruta_adb = [sys.executable, 'pruebas/adb_falso.py']
+
+Órdenes que entiende (las mismas que usa 'transporte_adb.py'):
+    devices
+    shell 'cd <directorio> && stat -c '%n|%s|%Y' *'
+    exec-out 'cd <directorio> && tar -cf - <archivos...>'
+    pull [-a] <archivos...> <destino>
+'''
+
+import os
+import sys
+import shlex
+import shutil
+import tarfile
+
+raiz = os.environ.get('ADB_FALSO_RAIZ', './pruebas/datos/movil')
+
+# Ruta del movil -> ruta local dentro de 'raiz'.
+def ruta_local(ruta_movil):
+    return os.path.join(raiz, ruta_movil.replace('\\', '/').lstrip('/'))
+
+def devices():
+    print('List of devices attached')
+    if 'ADB_FALSO_SIN_DISPOSITIVO' not in os.environ:
+        print('FALSO0001\tdevice')
+
+def shell(orden):
+    partes = shlex.split(orden)
+    if partes[0] == 'cd' and partes[3] == 'stat':
+        directorio = ruta_local(partes[1])
+        for nombre in sorted(os.listdir(directorio)):
+            info = os.stat(os.path.join(directorio, nombre))
+            print(f'{nombre}|{info.st_size}|{int(info.st_mtime)}')
+
+    else:
+        sys.exit(f'adb_falso: orden de shell no soportada: {orden}')
+
+def exec_out(orden):
+    salida = sys.stdout.buffer
+    if orden.startswith('cd '):
+        directorio, tar_orden = orden[3:].split(' && ', 1)
+        directorio = ruta_local(shlex.split(directorio)[0])
+        nombres = shlex.split(tar_orden)[3:]
+        with tarfile.open(fileobj=salida, mode='w|') as tar:
+            for nombre in nombres:
+                tar.add(os.path.join(directorio, nombre), arcname=nombre)
+
+    else:
+        sys.exit(f'adb_falso: orden de exec-out no soportada: {orden}')
+    salida.flush()
+
+def pull(argumentos):
+    argumentos = [a for a in argumentos if a != '-a']
+    *origenes, destino = argumentos
+    for origen in origenes:
+        shutil.copy2(ruta_local(origen), destino)
+
+def main():
+    orden, argumentos = sys.argv[1], sys.argv[2:]
+    if orden == 'devices':
+        devices()
+    elif orden == 'shell':
+        shell(' '.join(argumentos))
+    elif orden == 'exec-out':
+        exec_out(' '.join(argumentos))
+    elif orden == 'pull':
+        pull(argumentos)
+    else:
+        sys.exit(f'adb_falso: orden no soportada: {orden}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Script en Python.
+Es una prueba para comparar el lector EXIF que sólo lee la cabecera
+('lector_exif.py') con la lectura de siempre con PIL
+('Image.open(...)._getexif()'), sobre una carpeta de fotos JPEG reales.
+
+Para cada foto leemos la fecha original y el GPS con los dos métodos,
+medimos el tiempo de cada uno y comprobamos que den lo mismo. Al final
+mostramos el tiempo total y por foto de cada método, y las fotos en las
+que no coinciden.
+'''
+
+import os
+import sys
+import time
+import math
+
+# Los módulos del programa están en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lector_exif import leer_exif
+from copia_clasificador_fotos import obtener_datos_exif_pil
+
+ruta_corpus = 'E:/BackupFotos'
+max_fotos = 2000
+
+# Lista de las fotos JPEG de la carpeta y sus subcarpetas.
+def buscar_fotos(ruta, maximo):
+    fotos = []
+    for raiz, _, archivos in os.walk(ruta):
+        for archivo in archivos:
+            if archivo.lower().endswith(('.jpg', '.jpeg')):
+                fotos.append(os.path.join(raiz, archivo))
+                if len(fotos) >= maximo:
+                    return fotos
+    return fotos
+
+# Pasamos los valores a float para poder comparar los dos métodos.
+def normalizar(gps_info, fecha):
+    normalizado = {}
+    for clave, valor in gps_info.items():
+        if isinstance(valor, tuple):
+            valor = tuple(round(float(v), 6) if not math.isnan(float(v)) else None for v in valor)
+        normalizado[clave] = valor
+    return normalizado, fecha
+
+def medir(funcion, fotos):
+    resultados = {}
+    inicio = time.perf_counter()
+    for foto in fotos:
+        try:
+            resultados[foto] = funcion(foto)
+        except Exception as e:
+            resultados[foto] = ('error', str(e))
+    return time.perf_counter() - inicio, resultados
+
+def main():
+    fotos = buscar_fotos(ruta_corpus, max_fotos)
+    if not fotos:
+        print(f'No hay fotos JPEG en {ruta_corpus}')
+        return
+
+    tiempo_cabecera, cabecera = medir(leer_exif, fotos)
+    tiempo_pil, pil = medir(obtener_datos_exif_pil, fotos)
+
+    distintas = [f for f in fotos if normalizar(*cabecera[f]) != normalizar(*pil[f])]
+
+    print(f'Fotos: {len(fotos)}')
+    print(f'Cabecera (lector_exif): {tiempo_cabecera:.3f} s - {tiempo_cabecera / len(fotos) * 1000:.3f} ms/foto')
+    print(f'PIL (_getexif):         {tiempo_pil:.3f} s - {tiempo_pil / len(fotos) * 1000:.3f} ms/foto')
+    print(f'Mejora: x{tiempo_pil / tiempo_cabecera:.1f}')
+    print(f'Fotos con resultados distintos: {len(distintas)}')
+    for foto in distintas[:20]:
+        print(f'  {foto}\n    cabecera: {cabecera[foto]}\n    PIL:      {pil[foto]}')
+
+if __name__ == '__main__':
+    main()
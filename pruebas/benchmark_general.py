@@ -0,0 +1,269 @@
+'''
+Script en Python.
+Es el banco de pruebas de rendimiento de la importación y de los mapas.
+A diferencia de las otras pruebas, no necesita las fotos de verdad: usa
+el corpus sintético de 'generar_corpus.py' (fotos con EXIF, videos MP4
+y duplicados), siempre el mismo para la misma semilla.
+
+Para cada escala (1.000, 10.000 y 100.000 archivos, o las de '--escalas')
+medimos por separado cada etapa de 'copia_clasificador_fotos.py':
+    - obtener_datos_exif: fecha y GPS de las fotos.
+    - obtener_datos_video: fecha y GPS de los videos.
+    - obtener_ubicación: geocodificación sin conexión, con el nomenclátor
+        de prueba y una caché nueva (sin consultas a Nominatim).
+    - huella_rapida y calcular_hash_md5: los hashes de los duplicados.
+    - deduplicado: la búsqueda de cada archivo en el catálogo
+        ('candidatos' y 'existe'), como en 'hashear' y 'colocar'.
+    - registro: el alta de los archivos nuevos en el catálogo.
+    - copia: la copia a su carpeta '(ciudad)(pais)(año-mes)' (como mucho
+        'max_copias' archivos).
+y los constructores de los mapas:
+    - miniaturas: las miniaturas de las fotos con GPS ('miniaturas.py').
+    - mapa_fotos: el mapa de las fotos ('mapa_marca_fotos.py').
+    - mapa_carpetas: el mapa de las carpetas ('PyQt/generar_mapa.py').
+
+Los resultados se guardan en JSON ('--salida'), con la versión del
+código (el commit de git) y la máquina. Con '--comparar' se muestran al
+lado de los de otro JSON anterior, marcando las etapas que van más de
+un 'umbral_regresion' más lentas (si tardan al menos
+'minimo_regresion' segundos).
+
+Todo se escribe en una carpeta temporal (o en '--carpeta', para
+reutilizar el corpus entre ejecuciones).
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Los módulos del programa están en el directorio raíz, y el mapa de las
+#   carpetas en 'PyQt'.
+directorio_raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(directorio_raiz)
+sys.path.append(os.path.join(directorio_raiz, 'PyQt'))
+
+import huellas
+import catalogo as modulo_catalogo
+import miniaturas
+import mapa_marca_fotos
+import generar_mapa
+import copia_clasificador_fotos as clasificador
+from catalogo import Catalogo
+from geocodificador import Geocodificador, CacheGeocodificacion
+from nomenclator import Nomenclator
+from generar_corpus import generar_corpus
+
+escalas = (1000, 10000, 100000)
+max_copias = 5000
+umbral_regresion = 1.2 # Más de un 20% más lento.
+minimo_regresion = 0.05 # Segundos; por debajo, la diferencia es ruido.
+ruta_datos = os.path.join(directorio_raiz, 'pruebas', 'datos')
+
+# Ejecutamos 'funcion' sobre cada elemento y guardamos el tiempo de la etapa.
+def medir(etapas, nombre, funcion, elementos, mb=None):
+    inicio = time.perf_counter()
+    resultados = [funcion(elemento) for elemento in elementos]
+    segundos = time.perf_counter() - inicio
+    etapas[nombre] = resultado_etapa(len(elementos), segundos, mb)
+    mostrar(nombre, etapas[nombre])
+    return resultados
+
+def resultado_etapa(numero, segundos, mb=None):
+    resultado = {
+        'archivos': numero,
+        'segundos': round(segundos, 4),
+        'ms_por_archivo': round(segundos / numero * 1000, 4) if numero else None
+    }
+    if mb is not None:
+        resultado['mb_por_segundo'] = round(mb / segundos, 1) if segundos else None
+    return resultado
+
+def mostrar(nombre, resultado):
+    extra = f' - {resultado["mb_por_segundo"]} MB/s' if resultado.get('mb_por_segundo') else ''
+    por_archivo = f'{resultado["ms_por_archivo"]:8.3f} ms/archivo' if resultado['ms_por_archivo'] is not None else ''
+    print(f'    {nombre:<20} {resultado["archivos"]:7d} archivos {resultado["segundos"]:9.3f} s {por_archivo}{extra}')
+
+def megas(rutas):
+    return sum(os.path.getsize(ruta) for ruta in rutas) / 1024 / 1024
+
+# Medimos todas las etapas con un corpus de 'numero' archivos.
+def medir_escala(numero, carpeta):
+    etapas = {}
+    corpus = generar_corpus(os.path.join(carpeta, f'corpus_{numero}'), numero)
+    trabajo = os.path.join(carpeta, f'trabajo_{numero}')
+    shutil.rmtree(trabajo, ignore_errors=True)
+    os.makedirs(trabajo)
+
+    fotos = [r for r in corpus if r.endswith('.jpg')]
+    videos = [r for r in corpus if r.endswith('.mp4')]
+    metadatos = dict(zip(fotos, medir(etapas, 'obtener_datos_exif', clasificador.obtener_datos_exif, fotos)))
+    metadatos.update(zip(videos, medir(etapas, 'obtener_datos_video', clasificador.obtener_datos_video, videos)))
+
+    # Geocodificación sin conexión, con una caché nueva.
+    clasificador.geolocalizador = Geocodificador(
+        user_agent='benchmark_clasificador',
+        cache=CacheGeocodificacion(os.path.join(trabajo, 'cache_geo.db')),
+        nomenclator=Nomenclator(os.path.join(ruta_datos, 'nomenclator_prueba.tsv'),
+                                os.path.join(ruta_datos, 'paises.tsv')),
+        usar_red=False)
+    con_gps = [r for r in corpus if metadatos[r][0]]
+    ubicaciones = dict(zip(con_gps, medir(etapas, 'obtener_ubicación',
+                                          lambda r: clasificador.obtener_ubicación(metadatos[r][0]), con_gps)))
+    clasificador.geolocalizador.cache.cerrar()
+
+    mb_corpus = megas(corpus)
+    huellas_rapidas = dict(zip(corpus, medir(etapas, 'huella_rapida', huellas.huella_rapida, corpus, mb_corpus)))
+    hashes = dict(zip(corpus, medir(etapas, 'calcular_hash_md5', clasificador.calcular_hash_md5, corpus, mb_corpus)))
+
+    # Catálogo nuevo, sin importar los JSON del directorio actual.
+    modulo_catalogo.ruta_duplicados = os.path.join(trabajo, 'duplicados.json')
+    modulo_catalogo.ruta_eliminados = os.path.join(trabajo, 'eliminados.json')
+    ruta_catalogo = os.path.join(trabajo, 'catalogo.db')
+    catalogo = Catalogo(ruta_catalogo)
+
+    registros = []
+    for ruta in corpus:
+        ubicacion, lat, lon = ubicaciones.get(ruta, ('(Sin_GPS)', None, None))
+        fecha = metadatos[ruta][1]
+        registros.append({
+            'hash': hashes[ruta],
+            'ruta': os.path.join(trabajo, 'final', f'{ubicacion}{fecha.strftime("(%Y-%m)") if fecha else "(Sin_Fecha)"}',
+                                 os.path.basename(ruta)),
+            'ubicacion': ubicacion,
+            'fecha': fecha.strftime('(%Y-%m)') if fecha else '(Sin_Fecha)',
+            'latitud': lat,
+            'longitud': lon,
+            'tamaño': huellas_rapidas[ruta][0],
+            'hash_parcial': huellas_rapidas[ruta][1]
+        })
+
+    # Búsqueda y alta en el catálogo, archivo a archivo como en la importación.
+    nuevos, tiempo_busqueda, tiempo_registro = [], 0.0, 0.0
+    for ruta, registro in zip(corpus, registros):
+        inicio = time.perf_counter()
+        candidatos = catalogo.candidatos(registro['tamaño'], registro['hash_parcial'])
+        duplicado = bool(candidatos) and (catalogo.existe(registro['hash']) or catalogo.eliminado(registro['hash']))
+        tiempo_busqueda += time.perf_counter() - inicio
+        if duplicado:
+            continue
+        inicio = time.perf_counter()
+        with catalogo.transaccion():
+            catalogo.añadir(registro)
+        tiempo_registro += time.perf_counter() - inicio
+        nuevos.append((ruta, registro))
+    etapas['deduplicado'] = resultado_etapa(len(corpus), tiempo_busqueda)
+    mostrar('deduplicado', etapas['deduplicado'])
+    etapas['registro'] = resultado_etapa(len(nuevos), tiempo_registro)
+    mostrar('registro', etapas['registro'])
+
+    # Copia a la carpeta final, como 'colocar' (sin la copia directa).
+    copias = nuevos[:max_copias]
+    def copiar(nuevo):
+        ruta, registro = nuevo
+        os.makedirs(os.path.dirname(registro['ruta']), exist_ok=True)
+        shutil.copy2(ruta, registro['ruta'])
+    medir(etapas, 'copia', copiar, copias, megas([ruta for ruta, _ in copias]))
+
+    # Mapas, con los registros con GPS (las miniaturas salen de las copias).
+    con_coordenadas = [registro for _, registro in copias if registro['latitud'] is not None]
+    miniaturas.ruta_miniaturas = os.path.join(trabajo, 'miniaturas')
+    mapa_marca_fotos.ruta_mapas = os.path.join(trabajo, 'mapas') + os.sep
+    os.makedirs(mapa_marca_fotos.ruta_mapas, exist_ok=True)
+
+    inicio = time.perf_counter()
+    miniaturas.generar_miniaturas(con_coordenadas)
+    etapas['miniaturas'] = resultado_etapa(len(con_coordenadas), time.perf_counter() - inicio)
+    mostrar('miniaturas', etapas['miniaturas'])
+
+    con_coordenadas = [registro for _, registro in nuevos if registro['latitud'] is not None]
+    if con_coordenadas:
+        inicio = time.perf_counter()
+        mapa_marca_fotos.crear_mapa(con_coordenadas)
+        etapas['mapa_fotos'] = resultado_etapa(len(con_coordenadas), time.perf_counter() - inicio)
+        mostrar('mapa_fotos', etapas['mapa_fotos'])
+
+    carpetas = len(catalogo.carpetas())
+    catalogo.cerrar()
+    inicio = time.perf_counter()
+    generar_mapa.generar_mapa(ruta_catalogo, os.path.join(trabajo, 'mapas', 'mapa_fotos.html'), forzar=True)
+    etapas['mapa_carpetas'] = resultado_etapa(carpetas, time.perf_counter() - inicio)
+    mostrar('mapa_carpetas', etapas['mapa_carpetas'])
+
+    shutil.rmtree(trabajo, ignore_errors=True)
+    return {
+        'corpus': {'archivos': len(corpus), 'fotos': len(fotos), 'videos': len(videos),
+                   'mb': round(mb_corpus, 1), 'nuevos': len(nuevos), 'carpetas': carpetas},
+        'etapas': etapas
+    }
+
+# Commit de git del código medido, si lo hay.
+def version_codigo():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directorio_raiz,
+                                capture_output=True, text=True, check=True)
+        cambios = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directorio_raiz,
+                                 capture_output=True, text=True, check=True)
+        return salida.stdout.strip() + ('+cambios' if cambios.stdout.strip() else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Mostramos los resultados junto a los de una ejecución anterior.
+def comparar(anterior, actual):
+    print(f'\nComparación con {anterior.get("version")} ({anterior.get("fecha")}):')
+    for escala, datos in actual['escalas'].items():
+        previas = anterior.get('escalas', {}).get(escala, {}).get('etapas', {})
+        print(f'  {escala} archivos')
+        for etapa, resultado in datos['etapas'].items():
+            previa = previas.get(etapa)
+            if not previa or not previa['segundos']:
+                continue
+            relacion = resultado['segundos'] / previa['segundos']
+            lenta = relacion > umbral_regresion and resultado['segundos'] >= minimo_regresion
+            aviso = ' ⚠ más lento' if lenta else ''
+            print(f'    {etapa:<20} {previa["segundos"]:9.3f} s ➡ {resultado["segundos"]:9.3f} s  x{relacion:.2f}{aviso}')
+
+def main():
+    argumentos = argparse.ArgumentParser(description='Banco de pruebas de la importación y los mapas.')
+    argumentos.add_argument('--escalas', default=','.join(map(str, escalas)),
+                            help='Número de archivos de cada corpus, separados por comas.')
+    argumentos.add_argument('--carpeta', help='Carpeta para los corpus (se reutilizan entre ejecuciones).')
+    argumentos.add_argument('--salida', default=f'benchmark_{datetime.now():%Y%m%d_%H%M%S}.json')
+    argumentos.add_argument('--comparar', help='JSON de una ejecución anterior.')
+    opciones = argumentos.parse_args()
+
+    resultados = {
+        'version': version_codigo(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sistema': platform.platform(),
+        'nucleos': os.cpu_count(),
+        'escalas': {}
+    }
+
+    temporal = None if opciones.carpeta else tempfile.TemporaryDirectory()
+    carpeta = opciones.carpeta or temporal.name
+    try:
+        for numero in (int(n) for n in opciones.escalas.split(',')):
+            print(f'{numero} archivos')
+            resultados['escalas'][str(numero)] = medir_escala(numero, carpeta)
+            # Guardamos después de cada escala, por si la siguiente se corta.
+            with open(opciones.salida, 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+    finally:
+        if temporal:
+            temporal.cleanup()
+
+    print(f'Resultados en {opciones.salida}')
+    if opciones.comparar:
+        with open(opciones.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), resultados)
+
+if __name__ == '__main__':
+    main()
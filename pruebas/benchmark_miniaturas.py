@@ -0,0 +1,119 @@
+'''
+Script en Python.
+Es una prueba para comparar el mapa de fotos de 'mapa_marca_fotos.py'
+con las miniaturas de 'miniaturas.py' frente a lo que hacíamos antes:
+meter cada foto entera en el HTML codificada en base64.
+
+Medimos el tiempo y el tamaño del HTML de:
+    - base64: la foto entera dentro del HTML (como antes).
+    - miniaturas (en frío): creando todas las miniaturas en paralelo.
+    - miniaturas (caché): con las miniaturas ya creadas.
+    - miniaturas incrustadas: las miniaturas en base64 dentro del HTML.
+Las fotos salen de 'ruta_corpus', y si no existe se genera un corpus
+sintético de fotos JPEG de 12 megapíxeles en una carpeta temporal.
+'''
+
+import os
+import sys
+import time
+import base64
+import random
+import tempfile
+import folium
+from PIL import Image
+
+# Los módulos del programa están en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import huellas
+import miniaturas
+import mapa_marca_fotos
+
+ruta_corpus = 'E:/BackupFotos'
+max_fotos = 200
+fotos_sinteticas = 40
+tamaño_sintetico = (4000, 3000)
+
+# Lista de las fotos JPEG de la carpeta y sus subcarpetas.
+def buscar_fotos(ruta, maximo):
+    fotos = []
+    for raiz, _, archivos in os.walk(ruta):
+        for archivo in archivos:
+            if archivo.lower().endswith(('.jpg', '.jpeg')):
+                fotos.append(os.path.join(raiz, archivo))
+                if len(fotos) >= maximo:
+                    return fotos
+    return fotos
+
+# Fotos con degradados y ruido, para que pesen como las de un movil.
+def generar_corpus(carpeta, numero, tamaño):
+    fotos = []
+    for i in range(numero):
+        r = Image.linear_gradient('L').resize(tamaño)
+        g = Image.linear_gradient('L').rotate(90).resize(tamaño)
+        b = Image.effect_noise(tamaño, 30 + i)
+        foto = os.path.join(carpeta, f'IMG_{i:04d}.jpg')
+        Image.merge('RGB', (r, g, b)).save(foto, 'JPEG', quality=90)
+        fotos.append(foto)
+    return fotos
+
+# Registros como los del catálogo, con coordenadas al azar.
+def crear_registros(fotos):
+    return [
+        {
+            'hash': huellas.hash_completo(foto),
+            'ruta': foto,
+            'fecha': '(2024-01)',
+            'latitud': 40 + random.random(),
+            'longitud': -4 + random.random()
+        }
+        for foto in fotos
+    ]
+
+# El mapa como lo hacíamos antes: cada foto entera en base64.
+def crear_mapa_base64(registros, ruta_html):
+    mapa = folium.Map(location=[registros[0]['latitud'], registros[0]['longitud']], zoom_start=8)
+    for r in registros:
+        with open(r['ruta'], 'rb') as img_file:
+            encoded = base64.b64encode(img_file.read()).decode()
+        imagen_html = f"<img src='data:image/jpeg;base64, {encoded}' width='100' height='80'>"
+        folium.Marker(location=[r['latitud'], r['longitud']],
+                      popup=folium.Popup(imagen_html, max_width=120)).add_to(mapa)
+    mapa.save(ruta_html)
+
+def medir(nombre, funcion, ruta_html, resultados):
+    inicio = time.perf_counter()
+    funcion()
+    tiempo = time.perf_counter() - inicio
+    resultados.append((nombre, tiempo, os.path.getsize(ruta_html)))
+
+def tamaño_carpeta(carpeta):
+    return sum(os.path.getsize(os.path.join(raiz, a)) for raiz, _, archivos in os.walk(carpeta) for a in archivos)
+
+def main():
+    with tempfile.TemporaryDirectory() as temporal:
+        fotos = buscar_fotos(ruta_corpus, max_fotos) if os.path.isdir(ruta_corpus) else []
+        if not fotos:
+            print(f'No hay fotos en {ruta_corpus}, generamos {fotos_sinteticas} fotos sintéticas...')
+            os.makedirs(os.path.join(temporal, 'corpus'))
+            fotos = generar_corpus(os.path.join(temporal, 'corpus'), fotos_sinteticas, tamaño_sintetico)
+        registros = crear_registros(fotos)
+
+        mapa_marca_fotos.ruta_mapas = os.path.join(temporal, 'mapas') + os.sep
+        miniaturas.ruta_miniaturas = os.path.join(temporal, 'miniaturas')
+        os.makedirs(mapa_marca_fotos.ruta_mapas)
+        ruta_html = os.path.join(mapa_marca_fotos.ruta_mapas, 'mapa_historial.html')
+
+        resultados = []
+        medir('base64 (antes)', lambda: crear_mapa_base64(registros, ruta_html), ruta_html, resultados)
+        medir('miniaturas (en frío)', lambda: mapa_marca_fotos.crear_mapa(registros), ruta_html, resultados)
+        medir('miniaturas (caché)', lambda: mapa_marca_fotos.crear_mapa(registros), ruta_html, resultados)
+        mapa_marca_fotos.incrustar_miniaturas = True
+        medir('miniaturas incrustadas', lambda: mapa_marca_fotos.crear_mapa(registros), ruta_html, resultados)
+
+        print(f'Fotos: {len(fotos)} - {sum(os.path.getsize(f) for f in fotos) / 1024 / 1024:.1f} MB')
+        print(f'Caché de miniaturas: {tamaño_carpeta(miniaturas.ruta_miniaturas) / 1024:.0f} KB')
+        for nombre, tiempo, tamaño in resultados:
+            print(f'{nombre:<24} {tiempo:8.2f} s {tamaño / 1024 / 1024:10.2f} MB de HTML')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Script en Python.
+Es una prueba de la detección de fotos parecidas de 'similares.py'.
+
+Primero medimos la distancia entre la huella visual de una foto y la de
+sus copias (recomprimida, reducida como WhatsApp, con más brillo y
+recortada), y la de otra foto distinta, para elegir 'distancia_saltar' y
+'distancia_informar' en 'copia_clasificador_fotos.py'.
+
+Después comparamos la búsqueda en 'IndiceSimilares' con la de antes
+de tener índice: comparar la huella con todas las del catálogo. Para
+cada tamaño de biblioteca en 'tamaños' medimos el tiempo medio de una
+búsqueda con cada radio de 'radios', con huellas al azar.
+'''
+
+import os
+import sys
+import time
+import random
+import tempfile
+from PIL import Image, ImageDraw
+
+# Los módulos del programa están en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from similares import IndiceSimilares, huella_visual, distancia
+
+tamaños = (1000, 10000, 100000)
+radios = (3, 6, 10)
+busquedas = 200
+tamaño_foto = (4000, 3000)
+
+# Foto sintética con elipses de colores al azar.
+def crear_foto(semilla):
+    azar = random.Random(semilla)
+    foto = Image.new('RGB', tamaño_foto)
+    dibujo = ImageDraw.Draw(foto)
+    for _ in range(40):
+        x, y = azar.randrange(tamaño_foto[0]), azar.randrange(tamaño_foto[1])
+        dibujo.ellipse([x, y, x + azar.randrange(200, 1500), y + azar.randrange(200, 1200)],
+                       fill=tuple(azar.randrange(256) for _ in range(3)))
+    return foto
+
+def probar_copias(carpeta):
+    foto = crear_foto(1)
+    copias = {
+        'original': lambda ruta: foto.save(ruta, quality=92),
+        'recomprimida': lambda ruta: foto.save(ruta, quality=40),
+        'whatsapp': lambda ruta: foto.resize((1600, 1200)).save(ruta, quality=70),
+        'brillo': lambda ruta: foto.point(lambda v: min(255, int(v * 1.1))).save(ruta, quality=85),
+        'recortada': lambda ruta: foto.crop((40, 30, 3960, 2970)).save(ruta, quality=85),
+        'otra foto': lambda ruta: crear_foto(2).save(ruta, quality=92),
+    }
+    huellas = {}
+    for nombre, guardar in copias.items():
+        ruta = os.path.join(carpeta, f'{nombre}.jpg')
+        guardar(ruta)
+        inicio = time.perf_counter()
+        huellas[nombre] = huella_visual(ruta)
+        print(f'{nombre:<13} distancia {distancia(huellas["original"], huellas[nombre]):2d} - '
+              f'huella en {(time.perf_counter() - inicio) * 1000:5.1f} ms')
+
+def probar_indice():
+    azar = random.Random(0)
+    for tamaño in tamaños:
+        huellas = [azar.getrandbits(64) for _ in range(tamaño)]
+        inicio = time.perf_counter()
+        indice = IndiceSimilares((huella, i) for i, huella in enumerate(huellas))
+        creacion = time.perf_counter() - inicio
+
+        # Buscamos huellas del catálogo con un bit cambiado.
+        consultas = [azar.choice(huellas) ^ (1 << azar.randrange(64)) for _ in range(busquedas)]
+        print(f'{tamaño} huellas - índice creado en {creacion:.2f} s')
+        for radio in radios:
+            inicio = time.perf_counter()
+            for huella in consultas:
+                indice.buscar(huella, radio)
+            con_indice = (time.perf_counter() - inicio) / busquedas
+
+            inicio = time.perf_counter()
+            for huella in consultas[:20]:
+                [i for i, otra in enumerate(huellas) if distancia(huella, otra) <= radio]
+            sin_indice = (time.perf_counter() - inicio) / 20
+            print(f'    radio {radio:2d}: índice {con_indice * 1000:7.3f} ms - '
+                  f'todas {sin_indice * 1000:7.3f} ms por búsqueda')
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        probar_copias(carpeta)
+    probar_indice()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+'''
+Script en Python.
+Es una prueba para comparar la tabla del listado de archivos de
+'PyQt/main.py' con el modelo y el delegado de 'componentes/controles.py'
+('ModeloArchivos' y 'DelegadoAcciones') frente a lo que hacíamos antes:
+un 'QTableWidget' con dos 'QTableWidgetItem' y un QWidget con tres
+'Button' por cada archivo.
+
+Para cada forma medimos, con una carpeta de 'numero_archivos' archivos
+vacíos en una carpeta temporal:
+    - apertura: lo que tarda en rellenar la tabla y pintarla.
+    - widgets: cuántos widgets quedan vivos en la aplicación.
+    - memoria: lo que crece la memoria del proceso (sólo en Linux).
+    - ordenar y filtrar: ordenar por el nombre y filtrar por un texto.
+Cada forma se mide en un proceso aparte, para que la memoria de una no
+cuente en la otra. La ventana no se ve (plataforma 'offscreen').
+'''
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Los componentes están en 'PyQt/componentes'.
+directorio_raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(directorio_raiz, 'PyQt'))
+
+from PyQt5.QtWidgets import QApplication, QTableWidget, QTableView, QTableWidgetItem, QWidget, QHBoxLayout
+from PyQt5.QtCore import Qt
+from componentes.controles import Button, ModeloArchivos, DelegadoAcciones
+from componentes.listado_carpetas import leer_entrada
+
+numero_archivos = 5000
+texto_filtro = '12'
+
+# Memoria del proceso en MB, o None si no se puede saber.
+def memoria():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def crear_carpeta(carpeta, numero):
+    for i in range(numero):
+        open(os.path.join(carpeta, f'IMG_{(i * 7919) % numero:05d}.jpg'), 'wb').close()
+
+# La tabla como la hacíamos antes.
+def botones_accion():
+    widget = QWidget()
+    layout = QHBoxLayout()
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.setSpacing(5)
+    for icono, color in (('copy', '#d3d3d3'), ('share', '#add8e6'), ('delete', '#f08080')):
+        layout.addWidget(Button(icono, color))
+    widget.setLayout(layout)
+    return widget
+
+def abrir_widgets(tabla, ruta):
+    archivos = os.listdir(ruta)
+    tabla.setRowCount(len(archivos))
+    tabla.setColumnCount(3)
+    tabla.setColumnHidden(1, True)
+    for i, nombre in enumerate(archivos):
+        tabla.setItem(i, 0, QTableWidgetItem(nombre))
+        tabla.setItem(i, 1, QTableWidgetItem(os.path.join(ruta, nombre)))
+        tabla.setCellWidget(i, 2, botones_accion())
+        tabla.setRowHeight(i, 30)
+
+def filtrar_widgets(tabla, texto):
+    for i in range(tabla.rowCount()):
+        tabla.setRowHidden(i, texto.lower() not in tabla.item(i, 0).text().lower())
+
+# Medimos una forma ('widgets' o 'modelo') y devolvemos los resultados.
+def medir(forma, ruta):
+    app = QApplication.instance() or QApplication(sys.argv)
+    memoria_inicial = memoria()
+    widgets_iniciales = len(app.allWidgets())
+
+    inicio = time.perf_counter()
+    if forma == 'widgets':
+        tabla = QTableWidget()
+        tabla.resize(351, 600)
+        abrir_widgets(tabla, ruta)
+    else:
+        tabla = QTableView()
+        tabla.resize(351, 600)
+        modelo = ModeloArchivos()
+        tabla.setModel(modelo)
+        tabla.setItemDelegateForColumn(2, DelegadoAcciones(tabla))
+        tabla.setColumnHidden(1, True)
+        tabla.verticalHeader().setDefaultSectionSize(30)
+        with os.scandir(ruta) as entradas:
+            modelo.cargar([leer_entrada(entrada) for entrada in entradas])
+    tabla.show()
+    app.processEvents()
+    apertura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    tabla.sortByColumn(0, Qt.DescendingOrder)
+    app.processEvents()
+    ordenar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    if forma == 'widgets':
+        filtrar_widgets(tabla, texto_filtro)
+    else:
+        modelo.filtrar(texto_filtro)
+    app.processEvents()
+    filtrar = time.perf_counter() - inicio
+
+    memoria_final = memoria()
+    return {
+        'forma': forma,
+        'apertura': apertura,
+        'ordenar': ordenar,
+        'filtrar': filtrar,
+        'widgets': len(app.allWidgets()) - widgets_iniciales,
+        'memoria': memoria_final - memoria_inicial if memoria_inicial is not None else None
+    }
+
+def main():
+    # Proceso hijo: mide una forma y escribe el resultado en JSON.
+    if len(sys.argv) == 3:
+        print(json.dumps(medir(sys.argv[1], sys.argv[2])))
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        crear_carpeta(carpeta, numero_archivos)
+        print(f'Carpeta con {numero_archivos} archivos')
+        for forma in ('widgets', 'modelo'):
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), forma, carpeta],
+                                    capture_output=True, text=True, check=True, cwd=directorio_raiz)
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+            memoria_texto = f'{r["memoria"]:7.1f} MB' if r['memoria'] is not None else '    n/d'
+            print(f'{r["forma"]:<8} apertura {r["apertura"]:7.3f} s - ordenar {r["ordenar"]:6.3f} s - '
+                  f'filtrar {r["filtrar"]:6.3f} s - {r["widgets"]:6d} widgets - {memoria_texto}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+'''
+Script en Python.
+Genera un corpus sintético y reproducible de fotos y videos para las
+pruebas de rendimiento ('benchmark_general.py'), sin necesitar la
+biblioteca real de 'E:/BackupFotos'.
+
+Con la misma 'semilla' y los mismos parámetros, el corpus es siempre el
+mismo byte a byte:
+    - Fotos JPEG con EXIF de verdad: fecha original (DateTimeOriginal),
+        GPS en grados, minutos y segundos, modelo de la cámara y un
+        identificador único (ImageUniqueID), para que no haya dos iguales.
+        Las coordenadas caen cerca de los lugares del nomenclátor de
+        prueba ('datos/nomenclator_prueba.tsv'), así se pueden
+        geocodificar sin conexión. Una parte no lleva GPS, y otra no
+        lleva fecha. Las imágenes salen de unas pocas imágenes base ya
+        codificadas, con el EXIF de cada foto insertado detrás del SOI.
+    - Videos MP4 de varios tamaños ('tamaños_video_mb'), con la fecha en
+        'moov/mvhd' y las coordenadas en 'moov/udta/©xyz', como los de
+        los móviles Android, y la caja 'mdat' (el video) delante de 'moov'.
+    - Duplicados: una 'proporcion_duplicados' de los archivos son copias
+        exactas de otros anteriores, con otro nombre.
+Los archivos se reparten en subcarpetas de 1000 ('DCIM_000', 'DCIM_001'...).
+En la carpeta se guarda 'corpus.json' con los parámetros y la lista de
+archivos; si ya existe con los mismos parámetros, no se vuelve a generar.
+
+Se puede ejecutar directamente: generar_corpus.py <carpeta> <numero>
+'''
+
+import os
+import io
+import sys
+import json
+import random
+import struct
+from datetime import datetime, timedelta
+from PIL import Image
+
+ruta_nomenclator = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos', 'nomenclator_prueba.tsv')
+semilla = 520
+proporcion_duplicados = 0.1
+proporcion_videos = 0.01
+max_videos = 200
+tamaños_video_mb = (0.25, 1, 4)
+proporcion_sin_gps = 0.15
+proporcion_sin_fecha = 0.05
+tamaño_foto = (320, 240)
+imagenes_base = 16
+modelos = ('SM-A336B', 'Pixel 7', 'iPhone 12', 'Redmi Note 8')
+epoca_mp4 = datetime(1904, 1, 1)
+
+# Coordenadas de los lugares del nomenclátor de prueba.
+def cargar_lugares(ruta=ruta_nomenclator):
+    lugares = []
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            campos = linea.rstrip('\n').split('\t')
+            if len(campos) > 5:
+                lugares.append((float(campos[4]), float(campos[5])))
+    return lugares
+
+# Grados decimales a (grados, minutos, segundos).
+def a_dms(valor):
+    valor = abs(valor)
+    grados = int(valor)
+    minutos = int((valor - grados) * 60)
+    segundos = round(((valor - grados) * 60 - minutos) * 60, 4)
+    return grados, minutos, segundos
+
+# Imágenes base ya codificadas en JPEG: degradados con ruido.
+def crear_imagenes_base(azar, numero=imagenes_base, tamaño=tamaño_foto):
+    imagenes = []
+    for i in range(numero):
+        r = Image.linear_gradient('L').rotate(azar.randrange(360)).resize(tamaño)
+        g = Image.linear_gradient('L').rotate(azar.randrange(360)).resize(tamaño)
+        b = Image.effect_noise(tamaño, 10 + i * 3)
+        salida = io.BytesIO()
+        Image.merge('RGB', (r, g, b)).save(salida, 'JPEG', quality=85)
+        imagenes.append(salida.getvalue())
+    return imagenes
+
+# Segmento APP1 con el EXIF de una foto.
+def segmento_exif(numero, modelo, fecha, lat, lon):
+    exif = Image.Exif()
+    exif[0x0110] = modelo
+    exif_ifd = {0xA420: f'{numero:032x}'} # ImageUniqueID
+    if fecha:
+        exif_ifd[0x9003] = fecha.strftime('%Y:%m:%d %H:%M:%S')
+    exif[0x8769] = exif_ifd
+    if lat is not None:
+        exif[0x8825] = {
+            1: 'N' if lat >= 0 else 'S', 2: a_dms(lat),
+            3: 'E' if lon >= 0 else 'W', 4: a_dms(lon),
+            29: fecha.strftime('%Y:%m:%d') if fecha else '2020:01:01'
+        }
+    datos = exif.tobytes()
+    return b'\xff\xe1' + struct.pack('>H', len(datos) + 2) + datos
+
+def crear_foto(ruta, base, numero, modelo, fecha, lat, lon):
+    with open(ruta, 'wb') as f:
+        f.write(base[:2] + segmento_exif(numero, modelo, fecha, lat, lon) + base[2:])
+
+# Caja MP4: tamaño, tipo y contenido.
+def caja(tipo, contenido):
+    return struct.pack('>I4s', len(contenido) + 8, tipo) + contenido
+
+def crear_video(ruta, azar, tamaño, fecha, lat, lon):
+    segundos = int((fecha - epoca_mp4).total_seconds()) if fecha else 0
+    mvhd = struct.pack('>I5I', 0, segundos, segundos, 1000, 10000, 0x00010000) + bytes(76)
+    udta = b''
+    if lat is not None:
+        texto = f'{lat:+08.4f}{lon:+09.4f}/'.encode()
+        udta = caja(b'udta', caja(b'\xa9xyz', struct.pack('>HH', len(texto), 0x15c7) + texto))
+    with open(ruta, 'wb') as f:
+        f.write(caja(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41'))
+        f.write(caja(b'mdat', azar.randbytes(tamaño)))
+        f.write(caja(b'moov', caja(b'mvhd', mvhd) + udta))
+
+def parametros_corpus(numero):
+    return {
+        'numero': numero,
+        'semilla': semilla,
+        'proporcion_duplicados': proporcion_duplicados,
+        'proporcion_videos': proporcion_videos,
+        'max_videos': max_videos,
+        'tamaños_video_mb': list(tamaños_video_mb),
+        'proporcion_sin_gps': proporcion_sin_gps,
+        'proporcion_sin_fecha': proporcion_sin_fecha,
+        'tamaño_foto': list(tamaño_foto)
+    }
+
+# Generamos el corpus en la carpeta (si no estaba ya) y devolvemos la
+#   lista de rutas de sus archivos.
+def generar_corpus(carpeta, numero):
+    parametros = parametros_corpus(numero)
+    ruta_indice = os.path.join(carpeta, 'corpus.json')
+    if os.path.exists(ruta_indice):
+        with open(ruta_indice, encoding='utf-8') as f:
+            indice = json.load(f)
+        rutas = [os.path.join(carpeta, archivo) for archivo in indice['archivos']]
+        if indice['parametros'] == parametros and all(os.path.exists(r) for r in rutas):
+            return rutas
+
+    azar = random.Random(semilla)
+    lugares = cargar_lugares()
+    bases = crear_imagenes_base(azar)
+    videos = min(max_videos, round(numero * proporcion_videos))
+    es_video = set(azar.sample(range(numero), videos))
+    inicio_fechas = datetime(2015, 1, 1)
+
+    archivos = []
+    for i in range(numero):
+        subcarpeta = f'DCIM_{i // 1000:03d}'
+        os.makedirs(os.path.join(carpeta, subcarpeta), exist_ok=True)
+        extension = '.mp4' if i in es_video else '.jpg'
+        relativa = f'{subcarpeta}/{"VID" if i in es_video else "IMG"}_{i:06d}{extension}'
+        ruta = os.path.join(carpeta, relativa)
+
+        # Copia exacta de un archivo anterior del mismo tipo.
+        anteriores = [a for a in archivos[-50:] if a.endswith(extension)]
+        if anteriores and azar.random() < proporcion_duplicados:
+            with open(os.path.join(carpeta, azar.choice(anteriores)), 'rb') as f:
+                contenido = f.read()
+            with open(ruta, 'wb') as f:
+                f.write(contenido)
+            archivos.append(relativa)
+            continue
+
+        fecha = None
+        if azar.random() >= proporcion_sin_fecha:
+            fecha = inicio_fechas + timedelta(seconds=azar.randrange(10 * 365 * 24 * 3600))
+        lat = lon = None
+        if azar.random() >= proporcion_sin_gps:
+            lat, lon = azar.choice(lugares)
+            lat += azar.uniform(-0.02, 0.02)
+            lon += azar.uniform(-0.02, 0.02)
+
+        if i in es_video:
+            tamaño = int(azar.choice(tamaños_video_mb) * 1024 * 1024)
+            crear_video(ruta, azar, tamaño, fecha, lat, lon)
+        else:
+            crear_foto(ruta, azar.choice(bases), i, azar.choice(modelos), fecha, lat, lon)
+        archivos.append(relativa)
+
+    with open(ruta_indice, 'w', encoding='utf-8') as f:
+        json.dump({'parametros': parametros, 'archivos': archivos}, f, indent=1)
+    return [os.path.join(carpeta, archivo) for archivo in archivos]
+
+def main():
+    if len(sys.argv) != 3:
+        print('Uso: generar_corpus.py <carpeta> <numero>')
+        return
+    rutas = generar_corpus(sys.argv[1], int(sys.argv[2]))
+    print(f'✅ {len(rutas)} archivos en {sys.argv[1]}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+'''
+Script en Python. Es un servidor Nominatim falso, para probar los
+geocodificadores sin red y sin gastar la cuota de Nominatim.
+
+Sirve en local las dos consultas que usamos, con el formato 'jsonv2':
+    /search?q=<ciudad, pais>  -> [{'lat', 'lon', 'display_name'}]
+    /reverse?lat=..&lon=..    -> {'display_name'} del lugar más cercano
+Los lugares salen del nomenclátor de prueba ('datos/nomenclator_prueba.tsv',
+ver 'nomenclator.py'). Las direcciones tienen la misma forma que las de
+Nominatim ('calle, ciudad, provincia, código postal, país'), para que
+'ubicacion_desde_direccion' saque bien la ciudad.
+
+CLASE ServidorNominatimFalso:
+Arranca el servidor en un hilo, en un puerto libre ('url'). Cuenta las
+    consultas que recibe y guarda el momento de cada una ('instantes'),
+    para comprobar el limitador. Con 'retardo' simula lo que tarda el
+    servidor de verdad en contestar, y con 'limite' contesta 429 a las
+    consultas que lleguen con menos de un segundo entre ellas, como hace
+    Nominatim.
+
+Ejecutando este script directamente, arranca el servidor y geocodifica
+con 'GeocodificadorAsincrono' una lista de lugares con muchos repetidos,
+mostrando el tiempo, las consultas que llegan al servidor y las que se
+han juntado con otra igual en curso. Después hace lo mismo que la
+importación: busca la ubicación de fotos repetidas desde varios hilos
+con 'Geocodificador', que pregunta a Nominatim a través del asíncrono,
+y comprueba que cada zona sólo se consulta una vez.
+'''
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Los módulos del programa están en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nomenclator import Nomenclator
+from geocodificador import CacheGeocodificacion, Geocodificador
+from geocodificador_asincrono import GeocodificadorAsincrono
+
+directorio_datos = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+ruta_nomenclator = os.path.join(directorio_datos, 'nomenclator_prueba.tsv')
+ruta_paises = os.path.join(directorio_datos, 'paises.tsv')
+
+class ServidorNominatimFalso:
+    def __init__(self, retardo=0.0, limite=False):
+        self.nomenclator = Nomenclator(ruta_nomenclator, ruta_paises)
+        # Nombre '<ciudad>, <pais>' en minúsculas -> (lat, lon, ciudad, pais).
+        self.lugares = {
+            f'{ciudad}, {pais}'.lower(): (lat, lon, ciudad, pais)
+            for celda in self.nomenclator.celdas.values()
+            for lat, lon, ciudad, pais in celda
+        }
+        self.retardo = retardo
+        self.limite = limite
+        self.instantes = []
+        self.bloqueo = threading.Lock()
+
+        servidor = self
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor.atender(self)
+
+            def log_message(self, *argumentos):
+                pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f'http://127.0.0.1:{self.http.server_address[1]}'
+        self.hilo = threading.Thread(target=self.http.serve_forever, daemon=True)
+
+    @property
+    def consultas(self):
+        return len(self.instantes)
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.http.shutdown()
+        self.http.server_close()
+
+    def atender(self, peticion):
+        with self.bloqueo:
+            ahora = time.monotonic()
+            demasiado_pronto = self.limite and bool(self.instantes) and ahora - self.instantes[-1] < 1.0
+            self.instantes.append(ahora)
+
+        if demasiado_pronto:
+            self.responder(peticion, 429, {'error': 'Too Many Requests'})
+            return
+
+        time.sleep(self.retardo)
+        url = urllib.parse.urlparse(peticion.path)
+        parametros = dict(urllib.parse.parse_qsl(url.query))
+
+        if url.path == '/search':
+            lugar = self.lugares.get(parametros.get('q', '').strip().lower())
+            self.responder(peticion, 200, [self.direccion(*lugar)] if lugar else [])
+
+        elif url.path == '/reverse':
+            lat, lon = float(parametros['lat']), float(parametros['lon'])
+            lugar = self.nomenclator.buscar(lat, lon)
+            if lugar is None:
+                self.responder(peticion, 200, {'error': 'Unable to geocode'})
+            else:
+                self.responder(peticion, 200, self.direccion(lat, lon, *lugar))
+
+        else:
+            self.responder(peticion, 404, {'error': 'No encontrado'})
+
+    def direccion(self, lat, lon, ciudad, pais):
+        return {
+            'lat': str(lat),
+            'lon': str(lon),
+            'display_name': f'Calle Mayor, {ciudad}, Provincia, 00000, {pais}'
+        }
+
+    def responder(self, peticion, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        peticion.send_response(codigo)
+        peticion.send_header('Content-Type', 'application/json; charset=utf-8')
+        peticion.send_header('Content-Length', str(len(cuerpo)))
+        peticion.end_headers()
+        peticion.wfile.write(cuerpo)
+
+# Geocodificamos lugares repetidos contra el servidor falso.
+def main():
+    with ServidorNominatimFalso(retardo=0.3) as servidor:
+        lugares = [f'{ciudad}, {pais}' for _, _, ciudad, pais in servidor.lugares.values()]
+        # Varias carpetas de la misma ciudad (distintos meses) y un lugar que no existe.
+        lugares = lugares * 5 + ['Ningunsitio, España']
+
+        with tempfile.TemporaryDirectory() as directorio:
+            cache = CacheGeocodificacion(os.path.join(directorio, 'cache_geo.db'))
+            geocodificador = GeocodificadorAsincrono('prueba-nominatim-falso', cache=cache, url=servidor.url)
+
+            inicio = time.perf_counter()
+            coordenadas = asyncio.run(geocodificador.directas(lugares))
+            tiempo = time.perf_counter() - inicio
+            cache.cerrar()
+
+        separaciones = [b - a for a, b in zip(servidor.instantes, servidor.instantes[1:])]
+        print(f'Lugares pedidos: {len(lugares)} ({len(coordenadas)} distintos)')
+        print(f'Consultas al servidor: {servidor.consultas} - coalescidas: {geocodificador.coalescidas}')
+        print(f'Separación mínima entre consultas: {min(separaciones, default=0):.3f} s')
+        print(f'Tiempo: {tiempo:.2f} s')
+        for lugar, valor in coordenadas.items():
+            print(f'  {lugar}: {valor}')
+
+        # Fotos de los mismos sitios desde varios hilos, como en la importación.
+        fotos = [(lat, lon) for lat, lon, _, _ in servidor.lugares.values()] * 5
+        antes = servidor.consultas
+        with tempfile.TemporaryDirectory() as directorio:
+            cache = CacheGeocodificacion(os.path.join(directorio, 'cache_geo.db'))
+            geocodificador = Geocodificador('prueba-nominatim-falso', cache=cache, url=servidor.url)
+            with ThreadPoolExecutor(max_workers=8) as hilos:
+                ubicaciones = list(hilos.map(lambda foto: geocodificador.ubicacion(*foto), fotos))
+            cache.cerrar()
+
+        zonas = len(set(fotos))
+        print(f'Fotos: {len(fotos)} de {zonas} zonas - consultas al servidor: {servidor.consultas - antes}'
+              f' - coalescidas: {geocodificador.coalescidas}')
+        assert servidor.consultas - antes == zonas, 'una zona se ha consultado más de una vez'
+        assert all(ubicaciones), 'alguna foto se ha quedado sin ubicación'
+
+if __name__ == '__main__':
+    main()
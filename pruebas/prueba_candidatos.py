@@ -0,0 +1,99 @@
+'''
+Script en Python.
+Es una prueba de la comprobación de duplicados por niveles con un
+catálogo antiguo: un eliminado de 'eliminados.json' sin tamaño, y un
+archivo copiado sin tamaño que ya no está en su sitio (así que
+'completar_huellas' no puede completarlo).
+
+Comprobamos que:
+    - Un archivo nuevo, de otro tamaño, no tiene candidatos y no se lee
+        entero antes de copiarlo (su hash completo sale de la copia).
+    - Un archivo con el mismo contenido que el eliminado antiguo se
+        descarta igualmente, con el hash completo de la copia, y no se
+        queda en su carpeta.
+'''
+
+import os
+import sys
+import tempfile
+
+# Los módulos del programa están en el directorio raíz.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import huellas
+import catalogo as modulo_catalogo
+import copia_clasificador_fotos as clasificador
+from catalogo import Catalogo
+
+# Contamos los hashes completos calculados leyendo el archivo aparte.
+lecturas_completas = []
+hash_completo = huellas.hash_completo
+def contar_hash_completo(ruta, algoritmo=None):
+    lecturas_completas.append(ruta)
+    return hash_completo(ruta, algoritmo)
+huellas.hash_completo = contar_hash_completo
+
+def crear_archivo(ruta, contenido):
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return ruta
+
+# Datos de un archivo del PC como los prepara 'main()', ya leídos sus metadatos.
+def datos_archivo(ruta):
+    return {
+        'archivo': os.path.basename(ruta),
+        'ruta_origen': ruta,
+        'ruta_local': ruta,
+        'temporal': False,
+        'origen': 'prueba',
+        'estado_origen': (os.path.getsize(ruta), 0),
+        'descargado': True,
+        'ubicacion': '(Sin_GPS)',
+        'latitud': None,
+        'longitud': None,
+        'fecha': '(Sin_Fecha)',
+        'nombre_carpeta': '(Sin_GPS)(Sin_Fecha)'
+    }
+
+def importar(ruta, catalogo):
+    datos = clasificador.hashear(datos_archivo(ruta), catalogo)
+    return clasificador.colocar(datos, catalogo)
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        modulo_catalogo.ruta_duplicados = os.path.join(carpeta, 'duplicados.json')
+        modulo_catalogo.ruta_eliminados = os.path.join(carpeta, 'eliminados.json')
+        clasificador.ruta_final = os.path.join(carpeta, 'final')
+        clasificador.modo_copia_directa = False
+        origen = os.path.join(carpeta, 'pc')
+        os.makedirs(origen)
+
+        # Catálogo antiguo: un eliminado y un copiado sin tamaño.
+        eliminada = crear_archivo(os.path.join(origen, 'eliminada.jpg'), b'borrada' * 1000)
+        catalogo = Catalogo(os.path.join(carpeta, 'catalogo.db'))
+        catalogo.añadir_eliminado(hash_completo(eliminada))
+        catalogo.añadir({'hash': hash_completo(crear_archivo(os.path.join(carpeta, 'vieja.jpg'), b'vieja')),
+                         'ruta': os.path.join(carpeta, 'ya_no_esta.jpg'),
+                         'ubicacion': '(Sin_GPS)', 'fecha': '(Sin_Fecha)'})
+        catalogo.completar_huellas(huellas.huella_rapida)
+        clasificador.algoritmos_antiguos = catalogo.algoritmos_sin_tamaño()
+        assert clasificador.algoritmos_antiguos == {'md5'}
+
+        # 1º Archivo nuevo de otro tamaño: ni candidatos ni lectura aparte.
+        nueva = crear_archivo(os.path.join(origen, 'nueva.jpg'), b'nueva' * 3000)
+        tamaño, hash_parcial = huellas.huella_rapida(nueva)
+        assert catalogo.candidatos(tamaño, hash_parcial) == set(), 'el registro sin tamaño es candidato'
+        lecturas_completas.clear()
+        assert importar(nueva, catalogo) is not None
+        assert lecturas_completas == [], f'hash completo aparte de: {lecturas_completas}'
+        assert catalogo.existe(hash_completo(nueva))
+        print('✅ Archivo nuevo copiado sin leerlo entero antes')
+
+        # 2º El mismo contenido que el eliminado antiguo: no se queda.
+        assert importar(eliminada, catalogo) is None
+        assert not os.path.exists(os.path.join(clasificador.ruta_final, '(Sin_GPS)(Sin_Fecha)', 'eliminada.jpg'))
+        assert not catalogo.existe(hash_completo(eliminada))
+        print('✅ Eliminado antiguo sin tamaño descartado por su hash completo')
+        catalogo.cerrar()
+
+if __name__ == '__main__':
+    main()
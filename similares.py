@@ -0,0 +1,131 @@
+'''
+Script en Python. Contiene la detección de fotos casi iguales (parecidas)
+para la importación ('copia_clasificador_fotos.py').
+
+El hash MD5 (o el de 'huellas.py') sólo detecta los archivos idénticos
+byte a byte. Las fotos de una ráfaga, o la misma foto recomprimida por
+WhatsApp o reducida, tienen un contenido distinto y se copiaban todas a
+'ruta_final'.
+
+Función (huella_visual):
+Calcula el 'dHash' de una foto: la reducimos a 9x8 píxeles en gris y
+    comparamos cada píxel con el de su derecha, lo que da 64 bits que
+    apenas cambian al recomprimir, reducir o retocar un poco la foto.
+    Como en 'miniaturas.py', 'draft()' le pide al decodificador JPEG la
+    imagen ya reducida, sin decodificarla entera, y la giramos según la
+    orientación EXIF. Se guarda en el catálogo en hexadecimal.
+    Las fotos que ya estaban en el catálogo se completan en paralelo
+    (varios procesos) con 'calcular_huellas'.
+
+La 'distancia' entre dos huellas es el número de bits distintos (distancia
+de Hamming): 0 es la misma imagen, y dos fotos distintas suelen estar a
+más de 20.
+
+CLASE IndiceSimilares:
+Busca las huellas del catálogo a menos de una distancia de la de una foto
+    nueva sin compararla con toda la biblioteca (índice de Hamming por
+    trozos). Cada huella se parte en 'partes_indice' trozos de 16 bits, y
+    cada trozo va a su tabla. Si dos huellas están a 'radio' bits o menos,
+    alguno de sus trozos está a radio // partes_indice bits o menos, así
+    que basta con mirar en cada tabla los trozos vecinos del de la foto
+    (uno solo hasta radio 3, 137 hasta radio 11) y comprobar la distancia
+    completa de los que salgan.
+    Lo probamos con un árbol BK, pero con radios de más de 4 bits acaba
+    recorriendo casi todo el árbol y es más lento que compararlas todas.
+    Se puede usar desde varios hilos a la vez.
+'''
+
+import threading
+from functools import lru_cache
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+lado_huella = 8 # La huella es de lado_huella * lado_huella bits.
+procesos = None # Número de procesos; None = uno por núcleo.
+partes_indice = 4 # Trozos de la huella en el índice (tablas de 16 bits).
+
+# Huella visual (dHash) de una foto, como entero, o None si no se puede leer.
+def huella_visual(ruta, lado=lado_huella):
+    try:
+        with Image.open(ruta) as imagen:
+            imagen.draft('L', (lado * 8, lado * 8))
+            imagen = ImageOps.exif_transpose(imagen)
+            pixeles = imagen.convert('L').resize((lado + 1, lado), Image.LANCZOS).tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    huella = 0
+    for fila in range(lado):
+        for columna in range(lado):
+            i = fila * (lado + 1) + columna
+            huella = (huella << 1) | (pixeles[i] > pixeles[i + 1])
+    return huella
+
+# Huella en hexadecimal para el catálogo, y al revés.
+def a_texto(huella):
+    return f'{huella:016x}'
+
+def de_texto(texto):
+    return int(texto, 16)
+
+# Huella en hexadecimal de una foto, o '' si no se puede leer.
+def huella_texto(ruta):
+    huella = huella_visual(ruta)
+    return a_texto(huella) if huella is not None else ''
+
+# Huellas en hexadecimal de muchas fotos, en paralelo.
+def calcular_huellas(rutas, procesos=procesos):
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        return list(ejecutor.map(huella_texto, rutas, chunksize=16))
+
+# Número de bits distintos entre dos huellas.
+def distancia(a, b):
+    return (a ^ b).bit_count()
+
+class IndiceSimilares:
+    def __init__(self, huellas=(), partes=partes_indice):
+        self.partes = partes
+        self.bits = 64 // partes
+        self.mascara = (1 << self.bits) - 1
+        self.tablas = [{} for _ in range(partes)] # trozo -> [(huella, clave)]
+        self.numero = 0
+        self.bloqueo = threading.Lock()
+        for huella, clave in huellas:
+            self.añadir(huella, clave)
+
+    def trozos(self, huella):
+        return [(huella >> (n * self.bits)) & self.mascara for n in range(self.partes)]
+
+    # Añadimos una huella con la clave de su archivo (el hash del catálogo).
+    def añadir(self, huella, clave):
+        with self.bloqueo:
+            self.numero += 1
+            for tabla, trozo in zip(self.tablas, self.trozos(huella)):
+                tabla.setdefault(trozo, []).append((huella, clave))
+
+    # Claves de las huellas a 'radio' bits o menos, como una lista de
+    #   (distancia, clave) de la más parecida a la menos.
+    def buscar(self, huella, radio):
+        cambios = mascaras(self.bits, radio // self.partes)
+        encontradas = {}
+        with self.bloqueo:
+            for tabla, trozo in zip(self.tablas, self.trozos(huella)):
+                for cambio in cambios:
+                    for otra, clave in tabla.get(trozo ^ cambio, ()):
+                        if clave not in encontradas:
+                            d = distancia(huella, otra)
+                            if d <= radio:
+                                encontradas[clave] = d
+        return sorted((d, clave) for clave, d in encontradas.items())
+
+    def __len__(self):
+        return self.numero
+
+# Máscaras de 'bits' bits con 'radio' bits a 1 o menos: los trozos que hay
+#   que mirar alrededor de uno para encontrar los que están a 'radio' o menos.
+@lru_cache(maxsize=None)
+def mascaras(bits, radio):
+    return tuple(sum(1 << b for b in unos)
+                 for k in range(radio + 1)
+                 for unos in combinations(range(bits), k))
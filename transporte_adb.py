@@ -0,0 +1,131 @@
+'''
+Script en Python. Contiene la capa de transporte con el movil a través
+de 'adb'.
+
+Antes el bucle principal lanzaba un 'adb pull' por cada archivo, y
+además un 'adb devices' por cada archivo para saber si seguía el movil
+conectado. Eran cientos de procesos y de negociaciones USB en cada
+ejecución.
+
+CLASE TransporteAdb:
+Comprueba una sola vez, al crearse, si hay un dispositivo conectado
+    ('conectado').
+Con 'listar_con_stat' obtenemos los nombres de los archivos de un
+    directorio del movil con su tamaño y fecha de modificación, con un
+    solo 'stat' en el movil.
+Con 'traer' descargamos de golpe una lista de archivos de un directorio:
+    - Modo 'tar' (por defecto): un solo 'adb exec-out' que ejecuta 'tar'
+        en el movil y nos envía todos los archivos seguidos por la salida
+        estándar. Los vamos extrayendo según llegan, calculando a la vez
+        su hash completo (ver 'huellas.py').
+    - Modo 'pull': un 'adb pull' con muchos archivos a la vez, para los
+        móviles cuyo 'tar' no funcione.
+    En los dos casos se piden en lotes de 'tamaño_lote' archivos, para no
+    pasarnos de la longitud máxima de la línea de comandos.
+    'traer' es un generador: devuelve cada archivo en cuanto está en el
+    disco, así la tubería de importación puede empezar con él mientras
+    siguen llegando los demás. Si le pasamos una función 'progreso', la
+    llama por cada archivo con (nombre, número, total, bytes).
+
+El comando 'adb' puede ser una ruta o una lista, por ejemplo
+[sys.executable, 'pruebas/adb_falso.py'] para probarlo sin movil.
+'''
+
+import os
+import shlex
+import tarfile
+import subprocess
+import huellas
+
+tamaño_bloque = 1024 * 1024
+
+class TransporteAdb:
+    def __init__(self, ruta_adb, modo='tar', tamaño_lote=200):
+        self.comando = [ruta_adb] if isinstance(ruta_adb, str) else list(ruta_adb)
+        self.modo = modo
+        self.tamaño_lote = tamaño_lote
+        self.dispositivo = None
+        self.conectado = self.hay_dispositivo()
+
+    def ejecutar(self, *argumentos, **opciones):
+        return subprocess.run([*self.comando, *argumentos], **opciones)
+
+    # Ejecuta 'adb devices' y verifica si hay algún dispositivo conectado.
+    def hay_dispositivo(self):
+        try:
+            resultado = self.ejecutar('devices', capture_output=True, text=True)
+        except OSError:
+            return False
+        lineas = resultado.stdout.strip().split('\n')
+        # Ignora la cabecera y busca líneas con 'device' al final.
+        dispositivos = [l.split()[0] for l in lineas[1:] if l.strip().endswith('device')]
+        self.dispositivo = dispositivos[0] if dispositivos else None
+        return len(dispositivos) > 0
+
+    # Nombres de los archivos de un directorio del movil, con su tamaño y
+    #   fecha de modificación, todo con un solo 'stat'. Diccionario
+    #   nombre -> (tamaño, mtime).
+    def listar_con_stat(self, ruta_remota):
+        orden = f"cd {shlex.quote(ruta_remota)} && stat -c '%n|%s|%Y' *"
+        resultado = self.ejecutar('shell', orden, capture_output=True, text=True)
+
+        listado = {}
+        for linea in resultado.stdout.strip().split('\n'):
+            partes = linea.strip().rsplit('|', 2)
+            if len(partes) == 3 and partes[1].isdigit():
+                listado[partes[0]] = (int(partes[1]), int(partes[2]))
+        return listado
+
+    # Descargamos los archivos 'nombres' de 'ruta_remota' a 'destino'.
+    #   Devuelve (nombre, ruta_local, hash) por cada archivo descargado; el
+    #   hash es None en el modo 'pull'.
+    def traer(self, ruta_remota, nombres, destino, algoritmo=None, progreso=None):
+        total = len(nombres)
+        numero = 0
+        traer_lote = self.traer_tar if self.modo == 'tar' else self.traer_pull
+
+        for inicio in range(0, total, self.tamaño_lote):
+            lote = nombres[inicio:inicio + self.tamaño_lote]
+            for nombre, ruta_local, hash_archivo in traer_lote(ruta_remota, lote, destino, algoritmo):
+                numero += 1
+                if progreso:
+                    progreso(nombre, numero, total, os.path.getsize(ruta_local))
+                yield nombre, ruta_local, hash_archivo
+
+    # Un lote por 'tar' sobre 'adb exec-out'.
+    def traer_tar(self, ruta_remota, nombres, destino, algoritmo=None):
+        algoritmo = algoritmo or huellas.algoritmo_hash
+        orden = f'cd {shlex.quote(ruta_remota)} && tar -cf - {" ".join(shlex.quote(n) for n in nombres)}'
+        proceso = subprocess.Popen([*self.comando, 'exec-out', orden], stdout=subprocess.PIPE)
+
+        try:
+            with tarfile.open(fileobj=proceso.stdout, mode='r|') as tar:
+                for miembro in tar:
+                    if not miembro.isfile():
+                        continue
+
+                    nombre = os.path.basename(miembro.name)
+                    ruta_local = os.path.join(destino, nombre)
+                    h = huellas.algoritmos[algoritmo]()
+                    origen = tar.extractfile(miembro)
+
+                    with open(ruta_local, 'wb') as f:
+                        for bloque in iter(lambda: origen.read(tamaño_bloque), b''):
+                            h.update(bloque)
+                            f.write(bloque)
+                    os.utime(ruta_local, (miembro.mtime, miembro.mtime))
+
+                    yield nombre, ruta_local, huellas.clave_hash(algoritmo, h.hexdigest())
+        finally:
+            proceso.stdout.close()
+            proceso.wait()
+
+    # Un lote con un solo 'adb pull' de varios archivos.
+    def traer_pull(self, ruta_remota, nombres, destino, algoritmo=None):
+        origenes = [f'{ruta_remota}/{nombre}' for nombre in nombres]
+        self.ejecutar('pull', '-a', *origenes, destino, capture_output=True)
+
+        for nombre in nombres:
+            ruta_local = os.path.join(destino, nombre)
+            if os.path.exists(ruta_local):
+                yield nombre, ruta_local, None
@@ -0,0 +1,229 @@
+'''
+Script en Python. Verifica que los archivos de la copia ('ruta_final')
+siguen existiendo y siguen siendo los mismos que registramos en el
+catálogo.
+
+El catálogo (antes 'duplicados.json') guarda el hash y la ruta de cada
+archivo copiado, pero nadie comprobaba después que el archivo siguiera
+ahí y sin cambios. En un disco USB externo un archivo se puede corromper
+sin que nos enteremos, y sólo lo veríamos al abrir la foto años después.
+
+Función (verificar_biblioteca):
+1º Para cada archivo del catálogo miramos su tamaño y su fecha de
+    modificación (sin leerlo). Si no existe, va a 'faltan'. Si su tamaño
+    no es el del catálogo, va a 'corruptos' sin necesidad de leerlo.
+2º Sólo volvemos a calcular el hash de los archivos que han cambiado
+    (tamaño o fecha de modificación) desde la última verificación, de los
+    que nunca se han verificado, y de los que se verificaron hace más de
+    'dias_reverificacion' días. El resto mantiene el resultado anterior
+    (guardado en la tabla 'verificaciones' del catálogo). Con
+    '--completa' se verifican todos.
+3º Los hashes se calculan en paralelo ('procesos' procesos), con el mismo
+    algoritmo con el que se guardó cada uno (ver 'huellas.py'), y
+    leyendo como mucho 'mb_por_segundo' MB por segundo entre todos, para
+    no acaparar el disco mientras lo usamos. Los resultados se guardan en
+    el catálogo por lotes, así que si se corta a mitad, la siguiente vez
+    sigue por donde iba.
+4º Recorremos 'ruta_final' buscando las fotos y videos que no están en
+    el catálogo ('sin_catalogar').
+Al terminar mostramos un resumen y guardamos el informe completo en
+'ruta_informe' (JSON), y las métricas de cada paso en 'metricas.json'
+(ver 'metricas.py').
+'''
+
+import os
+import sys
+import time
+import metricas
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import huellas
+from catalogo import Catalogo, guardar_json
+
+ruta_final = 'E:\\BackupFotos'
+ruta_catalogo = './catalogo.db'
+ruta_informe = './verificacion.json'
+dias_reverificacion = 90
+procesos = 2 # En un disco USB, más lecturas a la vez no van más rápido.
+mb_por_segundo = 40 # Límite de lectura entre todos los procesos; None = sin límite.
+tamaño_lote = 100 # Verificaciones que se guardan en el catálogo de una vez.
+extensiones = ('.jpg', '.jpeg', '.mp4')
+
+# Hash completo de un archivo, leyendo como mucho 'limite' bytes por
+#   segundo (None = sin límite).
+def hash_limitado(ruta, algoritmo, limite=None):
+    h = huellas.algoritmos[algoritmo]()
+    inicio = time.monotonic()
+    leidos = 0
+
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(huellas.tamaño_bloque), b''):
+            h.update(bloque)
+            leidos += len(bloque)
+            if limite:
+                espera = leidos / limite - (time.monotonic() - inicio)
+                if espera > 0:
+                    time.sleep(espera)
+
+    return huellas.clave_hash(algoritmo, h.hexdigest())
+
+# Verificamos un archivo en un proceso del grupo. Devuelve (hash del
+#   catálogo, tamaño, mtime, estado, hash actual), con el estado
+#   'correcto', 'corrupto', 'falta' o 'ilegible'.
+def verificar_archivo(tarea):
+    hash_esperado, ruta, limite = tarea
+    try:
+        info = os.stat(ruta)
+        hash_actual = hash_limitado(ruta, huellas.algoritmo_de(hash_esperado), limite)
+    except FileNotFoundError:
+        return hash_esperado, None, None, 'falta', None
+    except OSError:
+        return hash_esperado, None, None, 'ilegible', None
+
+    estado = 'correcto' if hash_actual == hash_esperado else 'corrupto'
+    return hash_esperado, info.st_size, info.st_mtime_ns, estado, hash_actual
+
+# Fotos y videos de 'ruta_final' que no están en el catálogo. Nos
+#   saltamos las carpetas y archivos ocultos (como '.parciales').
+def archivos_sin_catalogar(ruta_final, rutas_catalogo):
+    conocidas = {os.path.normcase(os.path.abspath(ruta)) for ruta in rutas_catalogo}
+    sin_catalogar = []
+    pendientes = [ruta_final]
+    while pendientes:
+        try:
+            with os.scandir(pendientes.pop()) as entradas:
+                for entrada in entradas:
+                    if entrada.name.startswith('.'):
+                        continue
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(entrada.path)
+                    elif (entrada.name.lower().endswith(extensiones)
+                          and os.path.normcase(os.path.abspath(entrada.path)) not in conocidas):
+                        sin_catalogar.append(entrada.path)
+        except OSError:
+            continue
+    return sorted(sin_catalogar)
+
+# Verificamos la biblioteca y devolvemos el informe.
+def verificar_biblioteca(catalogo, ruta_final=ruta_final, dias=dias_reverificacion,
+                         completa=False, procesos=procesos, mb_por_segundo=mb_por_segundo):
+    registros = catalogo.registros
+    anteriores = catalogo.verificaciones()
+    caducidad = time.time() - dias * 24 * 3600
+    ahora = time.time()
+    informe = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'archivos': len(registros),
+        'verificados': 0,
+        'correctos': 0,
+        'sin_cambios': 0,
+        'faltan': [],
+        'corruptos': [],
+        'ilegibles': [],
+        'sin_catalogar': []
+    }
+    rutas = {registro['hash']: registro['ruta'] for registro in registros}
+
+    def corrupto(hash_archivo, hash_actual):
+        informe['corruptos'].append({'ruta': rutas[hash_archivo], 'hash': hash_archivo, 'hash_actual': hash_actual})
+
+    # 1º y 2º: qué archivos hay que volver a leer.
+    inicio = time.perf_counter()
+    pendientes, anotaciones = [], []
+    for registro in registros:
+        hash_archivo, ruta = registro['hash'], registro['ruta']
+        try:
+            info = os.stat(ruta)
+        except FileNotFoundError:
+            informe['faltan'].append(ruta)
+            continue
+        except OSError:
+            informe['ilegibles'].append(ruta)
+            continue
+
+        anterior = anteriores.get(hash_archivo)
+        if registro['tamaño'] is not None and info.st_size != registro['tamaño']:
+            corrupto(hash_archivo, None)
+            anotaciones.append((hash_archivo, info.st_size, info.st_mtime_ns, ahora, 'corrupto', None))
+        elif (completa or anterior is None or anterior['fecha'] < caducidad
+                or (anterior['tamaño'], anterior['mtime']) != (info.st_size, info.st_mtime_ns)):
+            pendientes.append((hash_archivo, ruta))
+        else:
+            informe['sin_cambios'] += 1
+            if anterior['estado'] == 'corrupto':
+                corrupto(hash_archivo, anterior['hash_actual'])
+    if anotaciones:
+        catalogo.anotar_verificaciones(anotaciones)
+    metricas.anotar('estado', time.perf_counter() - inicio, archivos=len(registros))
+    metricas.cache('verificaciones', informe['sin_cambios'], len(pendientes))
+
+    # 3º Leemos los pendientes en orden de ruta, para que el disco lea
+    #   las carpetas seguidas.
+    pendientes.sort(key=lambda pendiente: pendiente[1])
+    procesos = procesos or os.cpu_count() or 1
+    limite = mb_por_segundo * 1024 * 1024 / procesos if mb_por_segundo else None
+    print(f'🔍 {len(pendientes)} archivos a verificar ({informe["sin_cambios"]} sin cambios)')
+
+    if pendientes:
+        lote, leidos = [], 0
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            tareas = [(hash_archivo, ruta, limite) for hash_archivo, ruta in pendientes]
+            for numero, (hash_archivo, tamaño, mtime, estado, hash_actual) in enumerate(
+                    ejecutor.map(verificar_archivo, tareas), 1):
+                if estado == 'falta':
+                    informe['faltan'].append(rutas[hash_archivo])
+                elif estado == 'ilegible':
+                    informe['ilegibles'].append(rutas[hash_archivo])
+                else:
+                    informe['verificados'] += 1
+                    leidos += tamaño
+                    if estado == 'corrupto':
+                        corrupto(hash_archivo, hash_actual)
+                    lote.append((hash_archivo, tamaño, mtime, time.time(), estado, hash_actual))
+
+                if len(lote) >= tamaño_lote:
+                    catalogo.anotar_verificaciones(lote)
+                    lote = []
+                if numero % 500 == 0:
+                    print(f'🔍 {numero}/{len(pendientes)}')
+        if lote:
+            catalogo.anotar_verificaciones(lote)
+        metricas.anotar('verificacion', time.perf_counter() - inicio, leidos, informe['verificados'])
+        metricas.contar('bytes', leidos)
+
+    informe['correctos'] = (informe['archivos'] - len(informe['faltan'])
+                            - len(informe['corruptos']) - len(informe['ilegibles']))
+
+    # 4º Archivos que no están en el catálogo.
+    inicio = time.perf_counter()
+    informe['sin_catalogar'] = archivos_sin_catalogar(ruta_final, rutas.values())
+    metricas.anotar('sin_catalogar', time.perf_counter() - inicio, archivos=0)
+
+    metricas.contar('archivos', informe['archivos'])
+    metricas.contar('correctos', informe['correctos'])
+    for clave in ('faltan', 'corruptos', 'ilegibles', 'sin_catalogar'):
+        metricas.contar(clave, len(informe[clave]))
+    return informe
+
+# Función principal.
+def main():
+    catalogo = Catalogo(ruta_catalogo)
+    inicio = time.perf_counter()
+    informe = verificar_biblioteca(catalogo, completa='--completa' in sys.argv)
+    catalogo.cerrar()
+    guardar_json(informe, ruta_informe)
+
+    print(f'✅ {informe["correctos"]} correctos de {informe["archivos"]} '
+          f'({informe["verificados"]} verificados, {informe["sin_cambios"]} sin cambios) '
+          f'en {time.perf_counter() - inicio:.1f} s')
+    for clave, texto in (('faltan', '❓ Faltan'), ('corruptos', '❌ Corruptos'),
+                         ('ilegibles', '⚠ No se pueden leer'), ('sin_catalogar', '📂 Sin catalogar')):
+        if informe[clave]:
+            print(f'{texto}: {len(informe[clave])}')
+            for elemento in informe[clave][:10]:
+                print(f'    {elemento["ruta"] if isinstance(elemento, dict) else elemento}')
+    print(f'Informe completo en {ruta_informe}')
+
+if __name__ == '__main__':
+    metricas.ejecutar('verificador', main)